@@ -0,0 +1,20 @@
+-- Migration: 07_user_paints_unique.sql
+-- Description: Bulk inventory import upserts into user_paints and relies on
+-- (user_id, paint_id) being unique to skip paints the user already owns.
+
+-- 1. add_to_owned used to insert without checking, so a pair may already be
+--    owned more than once; keep the oldest row of each pair
+delete from public.user_paints
+where id in (
+    select id from (
+        select id, row_number() over (
+            partition by user_id, paint_id order by created_at, id
+        ) as duplicate_no
+        from public.user_paints
+    ) ranked
+    where duplicate_no > 1
+);
+
+-- 2. Unique pair
+create unique index if not exists unique_user_paint
+on public.user_paints (user_id, paint_id);
@@ -0,0 +1,11 @@
+-- Migration: 08_guide_image_gallery.sql
+-- Description: Guides hold a gallery of reference images. image_drive_id is
+-- kept as the cover image (first entry of the gallery) for exports and thumbnails.
+
+alter table public.painting_guides
+add column if not exists image_drive_ids text[] not null default '{}';
+
+update public.painting_guides
+set image_drive_ids = array[image_drive_id]
+where image_drive_id is not null
+  and cardinality(image_drive_ids) = 0;
@@ -0,0 +1,27 @@
+-- Migration: 09_guide_layer_order.sql
+-- Description: Guides load as stored, without client-side fix-ups.
+-- Legacy 'midtone' roles become 'layer_0', each detail stores how many layer
+-- slots it has (layer_count), and ordered embeds get matching indexes.
+
+-- 1. Legacy role name (pre-layer guides)
+update public.guide_paints
+set role = 'layer_0'
+where role = 'midtone';
+
+-- 2. Layer slots per detail, backfilled from the highest layer_N role
+alter table public.guide_details
+add column if not exists layer_count integer not null default 1;
+
+update public.guide_details d
+set layer_count = greatest(1, coalesce((
+    select max(substring(p.role from '^layer_([0-9]+)$')::int) + 1
+    from public.guide_paints p
+    where p.detail_id = d.id
+), 1));
+
+-- 3. Embedded resource ordering (guide_details.order / guide_paints.order)
+create index if not exists guide_details_guide_order
+on public.guide_details (guide_id, order_index);
+
+create index if not exists guide_paints_detail_order
+on public.guide_paints (detail_id, order_index);
@@ -0,0 +1,6 @@
+-- Migration: 10_guide_image_palettes.sql
+-- Description: Dominant colours extracted from each reference image on upload,
+-- keyed by image id: {"<image id>": ["#RRGGBB", ...]}, most common colour first.
+
+alter table public.painting_guides
+add column if not exists image_palettes jsonb not null default '{}'::jsonb;
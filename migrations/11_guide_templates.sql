@@ -0,0 +1,100 @@
+-- Migration: 11_guide_templates.sql
+-- Description: Guide duplication and a shared template library.
+-- Templates are guides with is_template = true: readable by every signed-in
+-- user, editable only by their author. clone_painting_guide() copies a guide
+-- the caller can read (their own or a template) with all details and paints
+-- in one call (three set-based inserts), replacing the client-side save loop.
+
+-- 1. Template flag
+alter table public.painting_guides
+add column if not exists is_template boolean not null default false;
+
+create index if not exists painting_guides_templates_idx
+on public.painting_guides (created_at desc)
+where is_template;
+
+-- 2. Templates are readable by everyone signed in (the existing policies still
+--    limit writes to the author)
+create policy "Signed-in users read guide templates"
+on public.painting_guides for select
+to authenticated
+using (is_template);
+
+create policy "Signed-in users read template details"
+on public.guide_details for select
+to authenticated
+using (
+    exists (
+        select 1 from public.painting_guides
+        where public.painting_guides.id = guide_details.guide_id
+        and public.painting_guides.is_template
+    )
+);
+
+create policy "Signed-in users read template paints"
+on public.guide_paints for select
+to authenticated
+using (
+    exists (
+        select 1 from public.guide_details
+        join public.painting_guides on public.painting_guides.id = public.guide_details.guide_id
+        where public.guide_details.id = guide_paints.detail_id
+        and public.painting_guides.is_template
+    )
+);
+
+-- 3. Clone a guide tree. Runs as the caller (security invoker), so RLS decides
+--    which guides can be copied and the copy always belongs to the caller.
+create or replace function public.clone_painting_guide(
+    source_guide_id uuid,
+    new_name text default null,
+    as_template boolean default false
+)
+returns uuid
+language plpgsql
+security invoker
+as $$
+declare
+    new_guide_id uuid;
+    detail_ids jsonb;
+begin
+    insert into public.painting_guides (
+        user_id, name, note, guide_type, primer_paint_id, is_airbrush, is_slapchop,
+        slapchop_note, image_drive_id, image_drive_ids, image_palettes, is_template
+    )
+    select
+        auth.uid(), coalesce(nullif(trim(new_name), ''), g.name), g.note, g.guide_type, g.primer_paint_id,
+        g.is_airbrush, g.is_slapchop, g.slapchop_note, g.image_drive_id, g.image_drive_ids,
+        g.image_palettes, as_template
+    from public.painting_guides g
+    where g.id = source_guide_id
+    returning id into new_guide_id;
+
+    if new_guide_id is null then
+        raise exception 'Guide % not found', source_guide_id using errcode = 'P0002';
+    end if;
+
+    -- New detail ids are picked up front, so details and paints are each
+    -- copied with one set-based insert. (Paints cannot share a statement
+    -- with their details: the RLS check would not see the new details yet.)
+    select coalesce(jsonb_object_agg(d.id, uuid_generate_v4()), '{}'::jsonb)
+    into detail_ids
+    from public.guide_details d
+    where d.guide_id = source_guide_id;
+
+    insert into public.guide_details (id, guide_id, name, description, category, order_index, layer_count)
+    select (detail_ids ->> d.id::text)::uuid, new_guide_id, d.name, d.description, d.category, d.order_index, d.layer_count
+    from public.guide_details d
+    where d.guide_id = source_guide_id;
+
+    insert into public.guide_paints (detail_id, paint_name, paint_color_hex, paint_id, role, ratio, note, order_index)
+    select (detail_ids ->> p.detail_id::text)::uuid, p.paint_name, p.paint_color_hex, p.paint_id, p.role, p.ratio, p.note, p.order_index
+    from public.guide_paints p
+    join public.guide_details d on d.id = p.detail_id
+    where d.guide_id = source_guide_id;
+
+    return new_guide_id;
+end;
+$$;
+
+grant execute on function public.clone_painting_guide(uuid, text, boolean) to authenticated;
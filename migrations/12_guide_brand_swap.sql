@@ -0,0 +1,68 @@
+-- Migration: 12_guide_brand_swap.sql
+-- Description: clone_painting_guide() takes paint_overrides, so a guide can be
+-- copied with some of its paints replaced (brand swap) in the same call.
+-- The 3-argument version from migration 11 is replaced; existing callers
+-- keep working through the parameter default.
+
+drop function if exists public.clone_painting_guide(uuid, text, boolean);
+
+create or replace function public.clone_painting_guide(
+    source_guide_id uuid,
+    new_name text default null,
+    as_template boolean default false,
+    paint_overrides jsonb default '{}'::jsonb
+)
+returns uuid
+language plpgsql
+security invoker
+as $$
+declare
+    new_guide_id uuid;
+    detail_ids jsonb;
+begin
+    insert into public.painting_guides (
+        user_id, name, note, guide_type, primer_paint_id, is_airbrush, is_slapchop,
+        slapchop_note, image_drive_id, image_drive_ids, image_palettes, is_template
+    )
+    select
+        auth.uid(), coalesce(nullif(trim(new_name), ''), g.name), g.note, g.guide_type, g.primer_paint_id,
+        g.is_airbrush, g.is_slapchop, g.slapchop_note, g.image_drive_id, g.image_drive_ids,
+        g.image_palettes, as_template
+    from public.painting_guides g
+    where g.id = source_guide_id
+    returning id into new_guide_id;
+
+    if new_guide_id is null then
+        raise exception 'Guide % not found', source_guide_id using errcode = 'P0002';
+    end if;
+
+    -- New detail ids are picked up front, so details and paints are each
+    -- copied with one set-based insert. (Paints cannot share a statement
+    -- with their details: the RLS check would not see the new details yet.)
+    select coalesce(jsonb_object_agg(d.id, uuid_generate_v4()), '{}'::jsonb)
+    into detail_ids
+    from public.guide_details d
+    where d.guide_id = source_guide_id;
+
+    insert into public.guide_details (id, guide_id, name, description, category, order_index, layer_count)
+    select (detail_ids ->> d.id::text)::uuid, new_guide_id, d.name, d.description, d.category, d.order_index, d.layer_count
+    from public.guide_details d
+    where d.guide_id = source_guide_id;
+
+    -- paint_overrides: {"<guide_paints.id>": {"paint_name", "paint_color_hex", "paint_id"}}
+    insert into public.guide_paints (detail_id, paint_name, paint_color_hex, paint_id, role, ratio, note, order_index)
+    select
+        (detail_ids ->> p.detail_id::text)::uuid,
+        coalesce(paint_overrides -> p.id::text ->> 'paint_name', p.paint_name),
+        case when paint_overrides ? p.id::text then paint_overrides -> p.id::text ->> 'paint_color_hex' else p.paint_color_hex end,
+        case when paint_overrides ? p.id::text then (paint_overrides -> p.id::text ->> 'paint_id')::uuid else p.paint_id end,
+        p.role, p.ratio, p.note, p.order_index
+    from public.guide_paints p
+    join public.guide_details d on d.id = p.detail_id
+    where d.guide_id = source_guide_id;
+
+    return new_guide_id;
+end;
+$$;
+
+grant execute on function public.clone_painting_guide(uuid, text, boolean, jsonb) to authenticated;
@@ -0,0 +1,43 @@
+-- Migration: 13_guide_shares.sql
+-- Description: Public read-only guide links. Each shared guide has one row
+-- holding an unguessable token and a denormalised JSON snapshot of the guide,
+-- rewritten by the app whenever the guide is saved. Anonymous viewers read a
+-- snapshot only through get_shared_guide(token), so the table itself cannot
+-- be listed.
+
+create table if not exists public.guide_shares (
+    token text primary key,
+    guide_id uuid not null unique references public.painting_guides(id) on delete cascade,
+    user_id uuid not null default auth.uid() references auth.users,
+    snapshot jsonb not null,
+    updated_at timestamp with time zone not null default now()
+);
+
+alter table public.guide_shares enable row level security;
+
+create policy "Users manage shares of their own guides"
+on public.guide_shares for all
+using (auth.uid() = user_id)
+with check (
+    auth.uid() = user_id
+    and exists (
+        select 1 from public.painting_guides
+        where public.painting_guides.id = guide_shares.guide_id
+        and public.painting_guides.user_id = auth.uid()
+    )
+);
+
+create or replace function public.get_shared_guide(share_token text)
+returns table (snapshot jsonb, updated_at timestamp with time zone)
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    select s.snapshot, s.updated_at
+    from public.guide_shares s
+    where s.token = share_token;
+$$;
+
+revoke all on function public.get_shared_guide(text) from public;
+grant execute on function public.get_shared_guide(text) to anon, authenticated;
@@ -0,0 +1,21 @@
+-- Migration: 14_guide_share_versions.sql
+-- Description: Cheap freshness check for cached share pages. App instances
+-- keep snapshots in memory and call get_shared_guide_version(token) every few
+-- seconds on a cache hit, so a changed, unshared or deleted guide shows on
+-- every instance without re-reading the whole snapshot. Returns no row when
+-- the token is no longer shared.
+
+create or replace function public.get_shared_guide_version(share_token text)
+returns table (updated_at timestamp with time zone)
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    select s.updated_at
+    from public.guide_shares s
+    where s.token = share_token;
+$$;
+
+revoke all on function public.get_shared_guide_version(text) from public;
+grant execute on function public.get_shared_guide_version(text) to anon, authenticated;
@@ -1,34 +1,171 @@
-import httpx
-from fastapi import Response, APIRouter
+import asyncio
+import os
+import secrets
+from datetime import date
+from email.utils import parsedate_to_datetime
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
 
-async def proxy_google_drive_image(file_id: str):
+from .services import export_service, guide_share, image_cache, upload_worker
+from .services.supabase import client_for_token
+
+# Custom backend routes, mounted in front of the Reflex app (see minipaint.py)
+api = FastAPI()
+
+SHARE_PAGE_CSP = "default-src 'none'; img-src 'self'; style-src 'unsafe-inline'; base-uri 'none'; form-action 'none'; frame-ancestors 'none'"
+
+
+@api.get("/api/export/{dataset}")
+async def export_user_data(dataset: str, ticket: str = "", format: str = "csv"):
+    """
+    Streams a user's data as CSV or JSON Lines.
+
+    The ticket is issued by DashboardState.export_data and is single use;
+    queries run with the user's own token so RLS still applies.
+    """
+    try:
+        export_service.validate_request(dataset, format)
+    except export_service.ExportError as e:
+        return Response(content=str(e), status_code=404, media_type="text/plain")
+    try:
+        entry = export_service.redeem_ticket(ticket, dataset, format)
+    except export_service.ExportError as e:
+        return Response(content=str(e), status_code=403, media_type="text/plain")
+
+    client = client_for_token(entry["access_token"])
+    filename = f"minipaint_{dataset}_{date.today().isoformat()}.{format}"
+    return StreamingResponse(
+        export_service.stream_export(client, dataset, entry["user_id"], format),
+        media_type=export_service.EXPORT_FORMATS[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@api.get("/api/metrics/uploads")
+async def upload_metrics(request: Request):
+    """
+    Queue depth and totals of the image upload worker pool.
+
+    Operators only: send `Authorization: Bearer $METRICS_TOKEN`. Without
+    METRICS_TOKEN set the route answers 404.
+    """
+    expected = os.environ.get("METRICS_TOKEN", "")
+    if not expected:
+        return Response(status_code=404)
+    supplied = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+    if not secrets.compare_digest(supplied.encode(), expected.encode()):
+        return Response(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return JSONResponse(upload_worker.queue_stats(), headers={"Cache-Control": "no-store"})
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that always runs on_close when it ends: after the last
+    chunk, on a client disconnect, or when the body was never iterated at all.
+    """
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Closing a started generator runs its own cleanup first (e.g. dropping a partial temp file)
+            await self.body_iterator.aclose()
+            await self.on_close()
+
+
+def _not_modified(request: Request, entry: dict) -> bool:
+    """Evaluates If-None-Match / If-Modified-Since against a cached image or share."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or entry["etag"].removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(entry.get("last_modified")) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@api.get("/api/image_proxy/{file_id}")
+async def proxy_google_drive_image(file_id: str, request: Request, w: int = 0):
     """
     Proxies image requests to Google Drive to bypass referrer policies.
+
+    Images are served from a disk cache (see services/image_cache.py) and
+    answer conditional requests with 304. Misses are streamed, never
+    buffered in memory. `w` asks for the smallest rendition at least that
+    many pixels wide (see image_validator.RENDITION_WIDTHS).
     """
-    if not file_id:
+    if not image_cache.is_valid_file_id(file_id):
         return Response(status_code=400)
-        
-    url = f"https://drive.google.com/uc?export=view&id={file_id}"
-    
+
     try:
-        async with httpx.AsyncClient() as client:
-            # Fetch from Google Drive
-            # We follow redirects because the download URL usually redirects to actual content
-            resp = await client.get(url, follow_redirects=True)
-            
-            if resp.status_code != 200:
-                print(f"Failed to fetch image {file_id}: {resp.status_code}")
-                return Response(status_code=resp.status_code)
-            
-            # Forward the content and correct content-type
-            return Response(
-                content=resp.content,
-                media_type=resp.headers.get("content-type", "image/jpeg"),
-                headers={
-                    "Cache-Control": "public, max-age=31536000" # Cache for 1 year
-                }
-            )
-            
+        if w > 0:
+            entry = await image_cache.open_rendition(file_id, w)
+        else:
+            entry = await image_cache.open_image(file_id)
     except Exception as e:
         print(f"Proxy error for {file_id}: {e}")
-        return Response(status_code=500)
+        return Response(status_code=502)
+
+    if "status" in entry:
+        return Response(status_code=entry["status"])
+
+    headers = {"Cache-Control": "public, max-age=31536000, immutable"} # Drive ids never change content
+    if entry.get("etag"):
+        headers["ETag"] = entry["etag"]
+    if entry.get("last_modified"):
+        headers["Last-Modified"] = entry["last_modified"]
+
+    if "stream" in entry:
+        # Cache miss: relay the upstream body chunk by chunk (teed into the cache)
+        if entry["size"] is not None:
+            headers["Content-Length"] = str(entry["size"])
+        return ClosingStreamingResponse(
+            entry["stream"], on_close=entry["close"], media_type=entry["content_type"], headers=headers
+        )
+
+    if _not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(entry["path"], media_type=entry["content_type"], headers=headers)
+
+
+@api.get("/api/share/{token}")
+async def shared_guide(token: str, request: Request, format: str = "html"):
+    """
+    Read-only view of a shared guide, as a static HTML page or its JSON snapshot.
+
+    Served from guide_share's in-process cache (one anonymous RPC on a
+    miss, a tiny version check every few seconds on a hit), so viewers never
+    open a Reflex session or read the snapshot per view.
+    """
+    if format not in ("html", "json") or not guide_share.is_valid_token(token):
+        return Response(status_code=404)
+    try:
+        share = await asyncio.to_thread(guide_share.get_shared, token)
+    except Exception as e:
+        print(f"Share lookup error for {token}: {e}")
+        return Response(status_code=502)
+    if share is None:
+        return Response(content="This guide is no longer shared.", status_code=404, media_type="text/plain")
+
+    # Caches must revalidate (a cheap 304 by ETag), so saves and unshares show on the next load
+    headers = {"Cache-Control": "public, no-cache", "ETag": share["etag"]}
+    if share.get("last_modified"):
+        headers["Last-Modified"] = share["last_modified"]
+    if _not_modified(request, share):
+        return Response(status_code=304, headers=headers)
+    if format == "json":
+        return JSONResponse(share["snapshot"], headers=headers)
+    # The page is hand-built from user text: no script may run even if a field slips through unescaped
+    headers["Content-Security-Policy"] = SHARE_PAGE_CSP
+    return HTMLResponse(guide_share.render_page(share), headers=headers)
@@ -4,6 +4,7 @@ import reflex as rx
 
 from rxconfig import config
 from .styles import global_style
+from .api import api
 
 
 class State(rx.State):
@@ -25,14 +26,10 @@ app = rx.App(
         rx.el.link(rel="icon", href="/favicon.png"),
         rx.el.title("Quills Hub"),
     ],
+    # Custom FastAPI routes (exports, image proxy) are served alongside the Reflex backend
+    api_transformer=api,
 )
 
-# from .api import proxy_google_drive_image
-# # Register custom API route for image proxying
-# if hasattr(app, "_api"):
-#    # app._api.add_route("/api/image_proxy/{file_id}", proxy_google_drive_image, methods=["GET"])
-#    pass
-
 from .pages.registration import registration_page
 # from .pages.admin import admin_page
 from .pages.login import login_page
@@ -1,13 +1,14 @@
-from .batch import Batch, PrintJob, PrintJobItem, BatchReprint
+from .batch import Batch, PrintJob, PrintJobItem, BatchReprint, BATCH_LIST
 from .paint import (
     PaintDict,
     OwnedPaintDict,
     CustomPaintDict,
     WishlistPaintDict,
+    ShoppingListItemDict,
     PaintSetDict,
     BrandDict,
 )
-from .guide import PaintingGuide, GuideDetail, GuidePaint
+from .guide import PaintingGuide, GuideDetail, GuidePaint, GUIDE_LIST
 
 __all__ = [
     # Batch models
@@ -15,15 +16,18 @@ __all__ = [
     "PrintJob",
     "PrintJobItem",
     "BatchReprint",
+    "BATCH_LIST",
     # Paint models
     "PaintDict",
     "OwnedPaintDict",
     "CustomPaintDict",
     "WishlistPaintDict",
+    "ShoppingListItemDict",
     "PaintSetDict",
     "BrandDict",
     # Guide models
     "PaintingGuide",
     "GuideDetail",
     "GuidePaint",
+    "GUIDE_LIST",
 ]
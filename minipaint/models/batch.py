@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, field_validator
 
 
 class BatchReprint(BaseModel):
@@ -18,6 +18,11 @@ class PrintJobItem(BaseModel):
     link_url: str = ""  # Enforce string, default empty
     quantity: int
 
+    @field_validator("link_url", mode="before")
+    @classmethod
+    def _null_link_to_empty(cls, value):
+        return "" if value is None else value
+
 
 class PrintJob(BaseModel):
     """Represents a print job with multiple items"""
@@ -43,3 +48,7 @@ class Batch(BaseModel):
     print_jobs: list[PrintJob]
     batch_reprints: list[BatchReprint]
     progress: int = 0
+
+
+# Validates a whole fetch_batches response in one pydantic-core call (see scripts/bench_models.py)
+BATCH_LIST = TypeAdapter(list[Batch])
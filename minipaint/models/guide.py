@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, model_validator
 
 
 class GuidePaint(BaseModel):
@@ -22,9 +22,20 @@ class GuideDetail(BaseModel):
     description: str | None = None
     category: str | None = None  # Basecoat, Layer, Highlight, Drybrush, Shading, Wash
     order_index: int = 0
+    layer_count: int = 1  # Stored layer slots (layer_0 .. layer_{n-1})
     guide_paints: list[GuidePaint] = []  # Nested paints
     layer_roles: list[str] = ["layer_0"] # For UI state: list of active layer roles
     is_collapsed: bool = False # For UI state: toggle visibility of paints
+    mix_previews: dict[str, str] = {} # For UI state: role -> predicted colour of its paints mixed at their ratios
+
+    @model_validator(mode="before")
+    @classmethod
+    def _layer_roles_from_count(cls, data):
+        """Rows from the database carry layer_count only; expand it into layer_roles."""
+        if isinstance(data, dict) and "layer_roles" not in data:
+            count = max(1, data.get("layer_count") or 1)
+            data = {**data, "layer_roles": [f"layer_{i}" for i in range(count)]}
+        return data
 
 
 class PaintingGuide(BaseModel):
@@ -38,6 +49,15 @@ class PaintingGuide(BaseModel):
     is_airbrush: bool = False
     is_slapchop: bool = False
     slapchop_note: str | None = None
-    image_drive_id: str | None = None
+    image_drive_id: str | None = None  # Cover image (first of image_drive_ids)
+    image_drive_ids: list[str] = []  # Reference image gallery, in display order
+    image_palettes: dict[str, list[str]] = {}  # Image id -> dominant colours, most common first
+    is_template: bool = False  # Shared in the template library (readable by every user)
     created_at: str = ""
+    detail_count: int = 0  # Filled by the summary list, where guide_details is not loaded
     guide_details: list[GuideDetail] = []
+
+
+# Validates a whole guide list response in one pydantic-core call (see scripts/bench_models.py)
+GUIDE_LIST = TypeAdapter(list[PaintingGuide])
+
@@ -46,3 +46,18 @@ class WishlistPaintDict(TypedDict):
     custom_paint_id: Optional[str]
     catalog_paints: Optional[PaintDict]
     custom_paints: Optional[CustomPaintDict]
+
+
+class ShoppingListItemDict(TypedDict):
+    """Paint used by a guide that the user does not own"""
+    paint_id: str
+    name: str
+    brand: str
+    code: str
+    color: str
+    guides: str
+    guide_count: int
+    in_wishlist: bool
+    substitute: str
+    substitute_color: str
+    substitute_detail: str
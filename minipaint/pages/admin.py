@@ -1,6 +1,7 @@
 import reflex as rx
 import os
 from ..state import BaseState
+from ..state.base import invalidate_ban_cache, reload_admin_emails
 from ..services.supabase import supabase_admin
 
 ADMIN_EMAIL = os.environ.get("ADMIN_EMAIL")
@@ -45,6 +46,12 @@ class AdminState(BaseState):
         supabase_admin.table("access_tokens").update({"status": "revoked"}).eq("id", token_id).execute()
         await self.fetch_tokens()
 
+    def reload_admin_config(self):
+        """Forces the admin list to be re-read from admin_config.json / env."""
+        if not self.is_admin: return
+        admins = reload_admin_emails()
+        return rx.toast(f"Admin list reloaded ({len(admins)} admins).")
+
     async def fetch_banned_users(self):
         if not supabase_admin: return
         try:
@@ -64,6 +71,7 @@ class AdminState(BaseState):
                 "reason": self.ban_reason,
                 "banned_by": self.user.get("id")
             }).execute()
+            invalidate_ban_cache()
             
             # 2. To strictly enforce immediate lockout, we could invalidate sessions, 
             # but standard auth check on page load handles it reasonably well for this scope.
@@ -78,6 +86,7 @@ class AdminState(BaseState):
     async def unban_user(self, user_id):
         if not supabase_admin: return
         supabase_admin.table("banned_users").delete().eq("id", user_id).execute()
+        invalidate_ban_cache()
         await self.fetch_banned_users()
 
 
@@ -140,7 +149,13 @@ def render_admin_view():
             ),
             rx.tabs.content(
                 rx.vstack(
-                    rx.heading("Banned Users", size="5"),
+                    rx.hstack(
+                        rx.heading("Banned Users", size="5"),
+                        rx.spacer(),
+                        rx.button("Reload Admin List", on_click=AdminState.reload_admin_config, variant="outline"),
+                        width="100%",
+                        align_items="center"
+                    ),
                     rx.hstack(
                         rx.input(placeholder="Email to ban", value=AdminState.ban_email, on_change=AdminState.set_ban_email),
                         rx.input(placeholder="Reason", value=AdminState.ban_reason, on_change=AdminState.set_ban_reason),
@@ -1,6 +1,5 @@
 import reflex as rx
 from ..state import BaseState
-from ..services.supabase import supabase
 from ..services import drive_service
 
 class CallbackState(BaseState):
@@ -43,7 +42,7 @@ class CallbackState(BaseState):
             user_id = self.user.get("id")
             
             # Check if settings exist
-            existing = supabase.table("user_settings").select("*").eq("user_id", user_id).execute()
+            existing = self._db().table("user_settings").select("*").eq("user_id", user_id).execute()
             
             data = {
                 "user_id": user_id,
@@ -57,9 +56,10 @@ class CallbackState(BaseState):
             # For now, just save.
             
             if existing.data:
-                supabase.table("user_settings").update(data).eq("user_id", user_id).execute()
+                self._db().table("user_settings").update(data).eq("user_id", user_id).execute()
             else:
-                supabase.table("user_settings").insert(data).execute()
+                self._db().table("user_settings").insert(data).execute()
+            drive_service.forget_user(user_id)  # Drop credentials cached for an older token
                 
             yield rx.redirect("/dashboard")
             
@@ -4,16 +4,16 @@ from pydantic import BaseModel
 import os
 
 from ..state import BaseState
-from ..services.supabase import supabase
-from ..services import drive_service
+from ..services import drive_service, guide_share, guide_transform, paint_index
+from ..utils.mixing import mix_colors
 import asyncio
 from ..styles import THEME_COLORS
 
 # Import models from dedicated modules
 from ..models import (
     Batch, PrintJob, PrintJobItem, BatchReprint,
-    PaintDict, OwnedPaintDict, CustomPaintDict, WishlistPaintDict, PaintSetDict, BrandDict,
-    PaintingGuide, GuideDetail, GuidePaint
+    PaintDict, OwnedPaintDict, CustomPaintDict, WishlistPaintDict, ShoppingListItemDict, PaintSetDict, BrandDict,
+    PaintingGuide, GuideDetail, GuidePaint, BATCH_LIST, GUIDE_LIST
 )
 
 # Import UI components
@@ -23,6 +23,39 @@ from ..components import sidebar, create_batch_modal, add_job_modal
 from ..views import print_jobs_tab, paints_tab, painting_guides_tab, render_settings_view
 from .admin import render_admin_view
 
+MAX_GUIDE_IMAGES = 12 # Reference images per guide gallery
+# Columns for the guides list; details and paints load when a guide is opened
+GUIDE_SUMMARY_COLUMNS = "id, user_id, name, guide_type, image_drive_id, image_drive_ids, is_template, created_at, guide_details(count)"
+TEMPLATE_LIBRARY_LIMIT = 200
+
+
+def _unproxy(value):
+    """The plain object behind a Reflex MutableProxy (state vars hand those out)."""
+    return getattr(value, "__wrapped__", value)
+
+
+def _guide_summaries(rows: list[dict]) -> list[PaintingGuide]:
+    """Validates GUIDE_SUMMARY_COLUMNS rows, turning the embedded detail count into detail_count."""
+    for g in rows:
+        # guide_details(count) comes back as [{"count": n}]
+        counts = g.pop("guide_details", None) or [{}]
+        g["detail_count"] = counts[0].get("count", 0)
+    return GUIDE_LIST.validate_python(rows)
+
+
+def _set_mix_previews(guide: PaintingGuide):
+    """Fills each detail's mix_previews for roles with two or more paints, one mixing call per guide."""
+    slots = []
+    for detail in guide.guide_details:
+        by_role: dict[str, list[tuple[str, int]]] = {}
+        for p in detail.guide_paints:
+            by_role.setdefault(p.role or "", []).append((p.paint_color_hex, p.ratio))
+        slots.extend((detail, role, paints) for role, paints in by_role.items() if len(paints) > 1)
+    mixed = mix_colors([paints for _, _, paints in slots])
+    for (detail, role, _), hex_str in zip(slots, mixed):
+        if hex_str:
+            detail.mix_previews[role] = hex_str
+
     
 # --- State ---
 class DashboardState(BaseState):
@@ -30,6 +63,7 @@ class DashboardState(BaseState):
     
     # --- Common ---
     is_drive_connected: bool = False
+    is_republishing_images: bool = False
     
     # --- Batches & Print Jobs Section ---
     active_tab: str = "print_jobs"
@@ -93,7 +127,19 @@ class DashboardState(BaseState):
     
     # Sets available for selected brand (for custom paint modal)
     custom_brand_sets: list[dict] = []
-    
+
+    # Inventory Import Modal
+    is_import_modal_open: bool = False
+    is_importing: bool = False
+    import_accept_suggestions: bool = True
+    import_total: int = 0
+    import_matched_count: int = 0
+    import_ambiguous_count: int = 0
+    import_custom_count: int = 0
+    import_skipped_count: int = 0
+    import_ambiguous_rows: list[dict] = []  # Preview rows for review (capped)
+    _import_plan: dict = {}  # Resolved plan, backend only
+
     # View modes
     library_view_mode: str = "card"  # "card" or "table"
     owned_view_mode: str = "card"  # "card" or "table"
@@ -187,7 +233,9 @@ class DashboardState(BaseState):
         return paints
 
     # --- Painting Guides Section ---
-    painting_guides: list[PaintingGuide] = []
+    painting_guides: list[PaintingGuide] = [] # Summaries only (see fetch_painting_guides)
+    _guide_cache: dict[str, PaintingGuide] = {} # guide_id -> full guide tree, filled on open
+    is_loading_guide: bool = False
     
     # Guide Creation Form (Staged)
     is_guide_modal_open: bool = False
@@ -199,9 +247,13 @@ class DashboardState(BaseState):
     new_guide_slapchop: bool = False
     new_guide_slapchop_note: str = ""
     new_guide_image_file: list[str] = [] # For rx.upload, stores file list
+    new_guide_image_palettes: dict[str, list[str]] = {} # Image id -> dominant colours (from the upload worker)
+    is_uploading_guide_image: bool = False
+    guide_image_uploads: list[dict[str, str]] = [] # Per-file progress: name, status, state (pending/done/error)
     
     # Paint Selection state
-    owned_paints_for_guide: list[dict] = [] # Filtered list for selection dialog
+    owned_paints_for_guide: list[dict] = [] # Ranked picker results: name, id, color, brand, source, detail
+    paint_search_include_catalog: bool = False
     
     # Staged Details for new guide
     # We use a dict structure for the form: {"name": "Armor", "paints": [{"name": "Blue", "color": "#...", "ratio": 1}]}
@@ -219,7 +271,31 @@ class DashboardState(BaseState):
     
     # Guide Detail View State
     selected_guide: PaintingGuide | None = None
+    selected_guide_image: str = "" # Gallery image shown large in the detail modal
     is_detail_modal_open: bool = False
+
+    # Shopping list: guide paints the user does not own (see services/shopping_list.py)
+    is_shopping_list_open: bool = False
+    is_resolving_shopping_list: bool = False
+    shopping_list_items: list[ShoppingListItemDict] = []
+    shopping_list_guide_count: int = 0
+
+    # Template library (guides with is_template, shared by all users)
+    is_template_library_open: bool = False
+    guide_templates: list[PaintingGuide] = []
+    is_cloning_guide: bool = False
+
+    # Brand swap of the selected guide (see services/guide_transform.py)
+    is_brand_swap_open: bool = False
+    is_brand_swap_loading: bool = False
+    brand_swap_target: str = ""
+    brand_swap_name: str = ""
+    brand_swap_rows: list[dict[str, str]] = [] # Per paint: step, role, from_*, to_*, delta_e, quality
+
+    # Public read-only link of the selected guide (see services/guide_share.py)
+    is_share_open: bool = False
+    is_sharing: bool = False
+    share_url: str = ""
     
     def set_new_guide_image_file(self, value: list[str]):
         """Setter for new_guide_image_file to fix deprecation warning"""
@@ -263,7 +339,7 @@ class DashboardState(BaseState):
         # User requested "number of paints" under brand.
         
         # 1. Fetch Brands
-        brands_res = supabase.table("paint_brands").select("*").order("name").execute()
+        brands_res = self._db().table("paint_brands").select("*").order("name").execute()
         brands = brands_res.data
         
         # 2. Fetch Paint Counts (Group by brand_id)
@@ -294,12 +370,12 @@ class DashboardState(BaseState):
     async def fetch_brand_paints(self, brand_id):
         # Fetch all paints for the brand (we'll filter client side or server side?)
         # 11k paints total, a brand might have hundreds. Fetching all for a brand is fine.
-        query = supabase.table("catalog_paints").select("*, paint_sets(name)").eq("brand_id", brand_id)
+        query = self._db().table("catalog_paints").select("*, paint_sets(name)").eq("brand_id", brand_id)
         res = query.execute()
         self.brand_paints = res.data
 
     async def fetch_brand_sets(self, brand_id):
-        res = supabase.table("paint_sets").select("*").eq("brand_id", brand_id).order("name").execute()
+        res = self._db().table("paint_sets").select("*").eq("brand_id", brand_id).order("name").execute()
         self.paint_sets = res.data
 
     # --- Owned Paints logic ---
@@ -307,7 +383,7 @@ class DashboardState(BaseState):
         if not self.user: return
         try:
              # Select catalog_paints with brand name too for Stats/Display
-             res = supabase.table("user_paints").select(
+             res = self._db().table("user_paints").select(
                  "id, paint_id, catalog_paints(id, name, color_hex, product_code, paint_sets(name), paint_brands(name))"
              ).eq("user_id", self.user.get("id")).order("created_at", desc=True).execute()
              self.owned_paints = res.data
@@ -320,7 +396,7 @@ class DashboardState(BaseState):
     async def fetch_custom_paints(self):
         if not self.user: return
         try:
-             res = supabase.table("custom_paints").select("*").eq("user_id", self.user.get("id")).order("created_at", desc=True).execute()
+             res = self._db().table("custom_paints").select("*").eq("user_id", self.user.get("id")).order("created_at", desc=True).execute()
              self.custom_paints = res.data
         except Exception as e:
              print(f"Error fetching custom paints: {e}")
@@ -411,7 +487,7 @@ class DashboardState(BaseState):
     async def fetch_custom_brand_sets(self, brand_id: str):
         """Fetch paint sets for selected brand in custom paint modal"""
         try:
-            res = supabase.table("paint_sets").select("*").eq("brand_id", brand_id).order("name").execute()
+            res = self._db().table("paint_sets").select("*").eq("brand_id", brand_id).order("name").execute()
             self.custom_brand_sets = res.data
         except Exception as e:
             print(f"Error fetching sets: {e}")
@@ -437,7 +513,7 @@ class DashboardState(BaseState):
             brand = next((b for b in self.library_brands if b["name"] == brand_name), None)
             if brand:
                 try:
-                    res = supabase.table("paint_sets").select("*").eq("brand_id", brand["id"]).order("name").execute()
+                    res = self._db().table("paint_sets").select("*").eq("brand_id", brand["id"]).order("name").execute()
                     self.owned_filter_brand_sets = res.data
                 except Exception as e:
                     print(f"Error fetching sets: {e}")
@@ -449,7 +525,7 @@ class DashboardState(BaseState):
         if not self.user: return
         try:
             # Fetch both library paints and custom paints in wishlist
-            res = supabase.table("paint_wishlist").select(
+            res = self._db().table("paint_wishlist").select(
                 "id, paint_id, custom_paint_id, catalog_paints(id, name, color_hex, product_code, paint_sets(name), paint_brands(name)), custom_paints(*)"
             ).eq("user_id", self.user.get("id")).order("created_at", desc=True).execute()
             self.wishlist_paints = res.data
@@ -467,7 +543,7 @@ class DashboardState(BaseState):
             else:
                 return # Should not happen
 
-            supabase.table("paint_wishlist").insert(payload).execute()
+            self._db().table("paint_wishlist").insert(payload).execute()
             
             msg = f"🛒 Added '{paint_name}' to Shopping List" if paint_name else "🛒 Added to Shopping List"
             yield rx.toast(msg)
@@ -481,7 +557,7 @@ class DashboardState(BaseState):
     
     async def remove_from_wishlist(self, wishlist_id: str):
         try:
-            supabase.table("paint_wishlist").delete().eq("id", wishlist_id).execute()
+            self._db().table("paint_wishlist").delete().eq("id", wishlist_id).execute()
             yield rx.toast("✅ Removed from shopping list")
             await self.fetch_wishlist()
         except Exception as e:
@@ -504,10 +580,10 @@ class DashboardState(BaseState):
              }
              
              if self.is_edit_mode and self.editing_paint_id:
-                 supabase.table("custom_paints").update(payload).eq("id", self.editing_paint_id).execute()
+                 self._db().table("custom_paints").update(payload).eq("id", self.editing_paint_id).execute()
                  yield rx.toast(f"✅ Updated custom paint '{self.custom_name}'")
              else:
-                 supabase.table("custom_paints").insert(payload).execute()
+                 self._db().table("custom_paints").insert(payload).execute()
                  yield rx.toast(f"✅ Created custom paint '{self.custom_name}'")
                  
              self.toggle_custom_modal()
@@ -518,18 +594,114 @@ class DashboardState(BaseState):
 
     async def delete_custom_paint(self, custom_paint_id: str):
         try:
-             supabase.table("custom_paints").delete().eq("id", custom_paint_id).execute()
+             self._db().table("custom_paints").delete().eq("id", custom_paint_id).execute()
              yield rx.toast("✅ Deleted custom paint")
              await self.fetch_custom_paints()
         except Exception as e:
              yield rx.toast(f"❌ Error deleting: {e}")
-             
+
+    # --- Inventory Import ---
+    def toggle_import_modal(self):
+        self.is_import_modal_open = not self.is_import_modal_open
+        if not self.is_import_modal_open:
+            self._reset_import()
+
+    def _reset_import(self):
+        self.is_importing = False
+        self.import_accept_suggestions = True
+        self.import_total = 0
+        self.import_matched_count = 0
+        self.import_ambiguous_count = 0
+        self.import_custom_count = 0
+        self.import_skipped_count = 0
+        self.import_ambiguous_rows = []
+        self._import_plan = {}
+
+    def set_import_accept_suggestions(self, val: bool):
+        self.import_accept_suggestions = val
+
+    async def handle_import_upload(self, files: list[rx.UploadFile]):
+        """Parses the uploaded CSV and resolves it into a preview (nothing is written yet)."""
+        from ..services.paint_import import build_import_plan, PaintImportError, IMPORT_PREVIEW_LIMIT
+
+        if not self.user or not files:
+            return
+
+        self._reset_import()
+        self.is_importing = True
+        yield
+
+        try:
+            file_data = await files[0].read()
+            plan = build_import_plan(self._db(), file_data)
+        except PaintImportError as e:
+            self.is_importing = False
+            yield rx.toast.error(f"Import failed: {str(e)}")
+            return
+        except Exception as e:
+            print(f"Import error: {e}")
+            self.is_importing = False
+            yield rx.toast.error("Import failed. Please check the file and try again.")
+            return
+
+        self._import_plan = plan
+        self.import_total = plan["total"]
+        self.import_matched_count = len(plan["matched"])
+        self.import_ambiguous_count = len(plan["ambiguous"])
+        self.import_custom_count = len(plan["custom"])
+        self.import_skipped_count = len(plan["skipped"])
+        self.import_ambiguous_rows = [
+            {
+                "row": amb["row"]["row"],
+                "input": " ".join(v for v in (amb["row"]["brand"], amb["row"]["name"], amb["row"]["code"]) if v),
+                "input_hex": amb["row"]["hex"],
+                "suggestion": amb["suggestions"][0]["name"] if amb["suggestions"] else "",
+                "suggestion_detail": " ".join(
+                    v for v in (amb["suggestions"][0]["product_code"], amb["suggestions"][0]["set_name"]) if v
+                ) if amb["suggestions"] else "",
+                "suggestion_hex": amb["suggestions"][0]["color_hex"] if amb["suggestions"] else "",
+                "reason": amb["reason"],
+            }
+            for amb in plan["ambiguous"][:IMPORT_PREVIEW_LIMIT]
+        ]
+        self.is_importing = False
+
+    async def confirm_import(self):
+        """Writes the previewed import in batches."""
+        from ..services.paint_import import commit_import
+
+        if not self.user or not self._import_plan:
+            return
+
+        self.is_importing = True
+        yield
+
+        try:
+            counts = commit_import(
+                self._db(),
+                self.user.get("id"),
+                self._import_plan,
+                accept_suggestions=self.import_accept_suggestions,
+                existing_custom=self.custom_paints,
+            )
+            self.is_import_modal_open = False
+            self._reset_import()
+            yield rx.toast.success(
+                f"✅ Imported {counts['owned']} owned paints and {counts['custom']} custom paints"
+            )
+            await self.fetch_owned_paints()
+        except Exception as e:
+            print(f"Error committing import: {e}")
+            self.is_importing = False
+            yield rx.toast.error(f"❌ Import failed: {e}")
+
+
     async def add_to_owned(self, paint_id: str, paint_name: str = ""):
         if not self.user: return
         try:
             # print(f"DEBUG: Adding paint {paint_id} ({paint_name})")
             payload = {"user_id": self.user.get("id"), "paint_id": paint_id}
-            supabase.table("user_paints").insert(payload).execute()
+            self._db().table("user_paints").insert(payload).execute()
             
             msg = f"✅ Added '{paint_name}' to Owned" if paint_name else "✅ Added to Owned"
             yield rx.toast(msg)
@@ -545,7 +717,7 @@ class DashboardState(BaseState):
 
     async def remove_from_owned(self, user_paint_id: str):
         try:
-             supabase.table("user_paints").delete().eq("id", user_paint_id).execute()
+             self._db().table("user_paints").delete().eq("id", user_paint_id).execute()
              yield rx.toast("Removed from Owned")
              await self.fetch_owned_paints()
         except Exception as e:
@@ -599,7 +771,7 @@ class DashboardState(BaseState):
     async def fetch_batches(self):
         if not self.user: return
         # Recursive select for deep nesting
-        query = supabase.table("batches").select(
+        query = self._db().table("batches").select(
             "*, print_jobs(*, print_job_items(*)), batch_reprints(*)"
         ).eq("user_id", self.user.get("id"))
         
@@ -608,8 +780,7 @@ class DashboardState(BaseState):
             
         res = query.order("created_at", desc=True).execute()
         
-        # Explicit conversion to Models with sanitation and calculation
-        clean_batches = []
+        # Derived fields, then conversion to Models
         for b in res.data:
             # 1. Process Jobs
             print_jobs = b.get("print_jobs", [])
@@ -623,13 +794,9 @@ class DashboardState(BaseState):
             # We assume the list is in chronological order from DB recursion.
             for idx, job in enumerate(print_jobs):
                 job["display_number"] = idx + 1
-                for item in job.get("print_job_items", []):
-                    if item.get("link_url") is None:
-                        item["link_url"] = ""
-            
-            clean_batches.append(Batch(**b))
             
-        self.batches = clean_batches
+        # One validation call for the whole tree (null link_url -> "" in the model)
+        self.batches = BATCH_LIST.validate_python(res.data)
         
     async def add_batch(self):
         if not self.new_batch_name: return
@@ -639,14 +806,14 @@ class DashboardState(BaseState):
             "tag": self.new_batch_tag,
             "due_date": self.new_batch_due_date if self.new_batch_due_date else None
         }
-        supabase.table("batches").insert(params).execute()
+        self._db().table("batches").insert(params).execute()
         self.new_batch_name = ""
         self.new_batch_due_date = ""
         self.create_batch_modal_open = False
         await self.fetch_batches()
 
     async def archive_batch(self, batch_id, archive=True):
-        supabase.table("batches").update({"is_archived": archive}).eq("id", batch_id).execute()
+        self._db().table("batches").update({"is_archived": archive}).eq("id", batch_id).execute()
         await self.fetch_batches()
 
     async def delete_batch(self, batch_id):
@@ -656,20 +823,20 @@ class DashboardState(BaseState):
         # Actually, simpler: delete children by Reference if possible, but without Cascade DB rule, we must do it manually.
         
         # A. Delete Reprints
-        supabase.table("batch_reprints").delete().eq("batch_id", batch_id).execute()
+        self._db().table("batch_reprints").delete().eq("batch_id", batch_id).execute()
         
         # B. Get Jobs to delete items
-        jobs = supabase.table("print_jobs").select("id").eq("batch_id", batch_id).execute()
+        jobs = self._db().table("print_jobs").select("id").eq("batch_id", batch_id).execute()
         job_ids = [j["id"] for j in jobs.data]
         
         if job_ids:
             # C. Delete Items
-            supabase.table("print_job_items").delete().in_("print_job_id", job_ids).execute()
+            self._db().table("print_job_items").delete().in_("print_job_id", job_ids).execute()
             # D. Delete Jobs
-            supabase.table("print_jobs").delete().eq("batch_id", batch_id).execute()
+            self._db().table("print_jobs").delete().eq("batch_id", batch_id).execute()
 
         # E. Delete Batch
-        supabase.table("batches").delete().eq("id", batch_id).execute()
+        self._db().table("batches").delete().eq("id", batch_id).execute()
         await self.fetch_batches()
 
     # --- Job & Items Logic ---
@@ -741,12 +908,12 @@ class DashboardState(BaseState):
             # We don't change batch_id in edit mode for now
             
             # Delete existing items to replace them
-            supabase.table("print_job_items").delete().eq("print_job_id", job_id).execute()
+            self._db().table("print_job_items").delete().eq("print_job_id", job_id).execute()
         else:
             # Create Mode
             if not self.active_batch_id_for_add_job: return
             
-            job_res = supabase.table("print_jobs").insert({
+            job_res = self._db().table("print_jobs").insert({
                 "user_id": self.user.get("id"),
                 "batch_id": self.active_batch_id_for_add_job,
                 "name": f"Job {len(self.staging_job_items)} items",
@@ -765,7 +932,7 @@ class DashboardState(BaseState):
             for item in self.staging_job_items
         ]
         if items_payload:
-            supabase.table("print_job_items").insert(items_payload).execute()
+            self._db().table("print_job_items").insert(items_payload).execute()
         
         self.staging_job_items = []
         self.editing_job_id = ""
@@ -773,7 +940,7 @@ class DashboardState(BaseState):
         await self.fetch_batches()
 
     async def start_job(self, job_id):
-        supabase.table("print_jobs").update({"status": "printing", "started_at": "now()"}).eq("id", job_id).execute()
+        self._db().table("print_jobs").update({"status": "printing", "started_at": "now()"}).eq("id", job_id).execute()
         await self.fetch_batches()
 
     async def revert_job_status(self, job_id, current_status):
@@ -783,7 +950,7 @@ class DashboardState(BaseState):
         elif current_status == "printing":
             new_status = "planned"
             
-        supabase.table("print_jobs").update({"status": new_status, "progress_percent": 0}).eq("id", job_id).execute()
+        self._db().table("print_jobs").update({"status": new_status, "progress_percent": 0}).eq("id", job_id).execute()
         await self.fetch_batches()
 
     def open_file_location(self, path: str):
@@ -825,7 +992,7 @@ class DashboardState(BaseState):
         batch_id = job.batch_id
         
         # 1. Update Job Status
-        supabase.table("print_jobs").update({"status": "printed", "progress_percent": 100}).eq("id", job_id).execute()
+        self._db().table("print_jobs").update({"status": "printed", "progress_percent": 100}).eq("id", job_id).execute()
         
         # 2. Handle Misprints
         reprints = []
@@ -839,14 +1006,14 @@ class DashboardState(BaseState):
                 })
         
         if reprints:
-            supabase.table("batch_reprints").insert(reprints).execute()
+            self._db().table("batch_reprints").insert(reprints).execute()
             
         self.misprint_modal_open = False
         self.active_job_misprint = None
         await self.fetch_batches()
 
     async def delete_reprint(self, reprint_id):
-        supabase.table("batch_reprints").delete().eq("id", reprint_id).execute()
+        self._db().table("batch_reprints").delete().eq("id", reprint_id).execute()
         await self.fetch_batches()
 
     async def on_mount(self):
@@ -862,12 +1029,13 @@ class DashboardState(BaseState):
         await self.fetch_owned_paints()
         await self.fetch_wishlist()
         print("DEBUG: fetching guides in on_mount")
+        self._guide_cache = {} # Guides may have changed in another session
         await self.fetch_painting_guides()
 
     # --- Drive Logic ---
     async def check_drive_connection(self):
         if not self.user: return
-        res = supabase.table("user_settings").select("*").eq("user_id", self.user.get("id")).execute()
+        res = self._db().table("user_settings").select("*").eq("user_id", self.user.get("id")).execute()
         if res.data and res.data[0].get("drive_refresh_token"):
             self.is_drive_connected = True
         else:
@@ -883,16 +1051,85 @@ class DashboardState(BaseState):
         
         try:
             # Clear tokens from DB
-            supabase.table("user_settings").update({
+            self._db().table("user_settings").update({
                 "drive_refresh_token": None,
                 "drive_folder_id": None
             }).eq("user_id", self.user.get("id")).execute()
+            drive_service.forget_user(self.user.get("id"))
             
             self.is_drive_connected = False
             yield rx.toast("❌ Disconnected from Google Drive")
         except Exception as e:
             yield rx.toast(f"Error disconnecting: {e}")
 
+    async def republish_guide_images(self):
+        """Re-applies "anyone with link" access to every guide image (batched Drive calls)."""
+        from ..services import image_storage, upload_worker
+
+        if not self.user or not self.is_drive_connected: return
+        user_id = self.user.get("id")
+
+        try:
+            res = self._db().table("painting_guides").select("image_drive_id, image_drive_ids").eq(
+                "user_id", user_id
+            ).not_.is_("image_drive_id", "null").execute()
+            # Images kept by the local/S3 storage backends need no Drive permissions
+            file_ids = sorted({
+                file_id for r in res.data
+                for file_id in [r.get("image_drive_id"), *(r.get("image_drive_ids") or [])]
+                if image_storage.is_drive_id(file_id)
+            })
+            if not file_ids:
+                yield rx.toast("No guide images to republish.")
+                return
+
+            refresh_token = None
+            if not drive_service.has_cached_service(user_id):
+                settings_res = self._db().table("user_settings").select("drive_refresh_token").eq("user_id", user_id).execute()
+                if not settings_res.data or not settings_res.data[0].get("drive_refresh_token"):
+                    yield rx.toast.error("Google Drive not properly configured. Please reconnect.")
+                    return
+                refresh_token = settings_res.data[0]["drive_refresh_token"]
+
+            self.is_republishing_images = True
+            yield
+
+            result = None
+            async for event, value in upload_worker.run_job(upload_worker.republish_images, user_id, refresh_token, file_ids):
+                if event == "done":
+                    result = value
+
+            if result["failed"]:
+                print(f"Republish failures: {result['failed']}")
+                yield rx.toast.warning(f"Republished {len(result['published'])} images, {len(result['failed'])} failed.")
+            else:
+                yield rx.toast.success(f"✅ Republished {len(result['published'])} guide images")
+        except upload_worker.UploadQueueFull as e:
+            yield rx.toast.error(str(e))
+        except Exception as e:
+            print(f"Republish error: {e}")
+            yield rx.toast.error(f"Republish failed: {str(e)}")
+        finally:
+            self.is_republishing_images = False
+
+    # --- Data Export ---
+    def export_data(self, dataset: str, fmt: str = "csv"):
+        """Starts a streamed download of one dataset via the backend export route."""
+        from ..services import export_service
+
+        if not self.user: return
+        client = self._db()
+        if not client.access_token:
+            return rx.toast.error("Session expired. Please log in again.")
+
+        try:
+            ticket = export_service.issue_ticket(self.user.get("id"), client.access_token, dataset, fmt)
+        except export_service.ExportError as e:
+            return rx.toast.error(str(e))
+
+        api_url = rx.config.get_config().api_url.rstrip("/")
+        return rx.download(url=f"{api_url}/api/export/{dataset}?format={fmt}&ticket={ticket}")
+
 
     # --- Paints ---
 
@@ -933,55 +1170,124 @@ class DashboardState(BaseState):
     # --- Recipes ---
     # --- Painting Guides Logic ---
     async def fetch_painting_guides(self):
+        """
+        Loads guide summaries for the list (no details or paints).
+
+        The full tree is fetched when a guide is opened, see _load_guide().
+        """
         if not self.user: return
         try:
-            # Recursive fetch: Guide -> Details -> Paints
-            res = supabase.table("painting_guides").select(
-                "*, guide_details(*, guide_paints(*))"
-            ).eq("user_id", self.user.get("id")).order("created_at", desc=True).execute()
-            
-            # Explicit conversion to Models
-            guides = []
-            for g in res.data:
-                details = []
-                # Sort details by order_index just in case
-                g_details = g.get("guide_details", [])
-                g_details.sort(key=lambda x: x["order_index"])
-                
-                for d in g_details:
-                    paints = []
-                    d_paints = d.get("guide_paints", [])
-                    d_paints.sort(key=lambda x: x["order_index"])
-                    
-                    max_layer = 0
-                    has_layers = False
-                    for p in d_paints:
-                        if p.get("role") == "midtone":
-                            p["role"] = "layer_0" 
-                        
-                        role = p.get("role", "")
-                        if role and role.startswith("layer_"):
-                            try:
-                                l_idx = int(role.split("_")[1])
-                                max_layer = max(max_layer, l_idx)
-                                has_layers = True
-                            except: pass
-                        paints.append(GuidePaint(**p))
-                    
-                    d["guide_paints"] = paints
-                    d["layer_roles"] = [f"layer_{i}" for i in range(max_layer + 1)] if has_layers else ["layer_0"]
-                    d["is_collapsed"] = False # Default initial state
-                    details.append(GuideDetail(**d))
-                
-                
-                g["guide_details"] = details
-                
-                guides.append(PaintingGuide(**g))
-                
+            res = self._db().table("painting_guides").select(
+                GUIDE_SUMMARY_COLUMNS
+            ).eq("user_id", self.user.get("id")).eq("is_template", False).order("created_at", desc=True).execute()
+            guides = _guide_summaries(res.data)
+
             self.painting_guides = guides
-            print(f"DEBUG: Fetched {len(guides)} guides. First image: {guides[0].image_drive_id if guides else 'None'}")
+            # Forget trees of guides that no longer exist
+            ids = {g.id for g in guides}
+            self._guide_cache = {k: v for k, v in self._guide_cache.items() if k in ids}
+            print(f"DEBUG: Fetched {len(guides)} guide summaries. First image: {guides[0].image_drive_id if guides else 'None'}")
         except Exception as e:
             print(f"Error fetching guides: {e}")
+
+    async def _load_guide(self, guide_id: str) -> PaintingGuide | None:
+        """Full guide (details and paints) from the per-session cache, fetched on first open."""
+        cached = self._guide_cache.get(guide_id)
+        if cached:
+            return _unproxy(cached)
+        try:
+            # Recursive fetch: Guide -> Details -> Paints, ordered by the database
+            res = self._db().table("painting_guides").select(
+                "*, guide_details(*, guide_paints(*))"
+            ).eq("id", guide_id).order(
+                "order_index", foreign_table="guide_details"
+            ).order(
+                "order_index", foreign_table="guide_details.guide_paints"
+            ).execute()
+            if not res.data:
+                return None
+
+            # Roles and layer counts are stored normalized (migration 09)
+            guide = PaintingGuide.model_validate(res.data[0])
+            guide.detail_count = len(guide.guide_details)
+            _set_mix_previews(guide)
+            self._guide_cache[guide_id] = guide
+            return guide
+        except Exception as e:
+            print(f"Error loading guide {guide_id}: {e}")
+            return None
+
+    def set_is_shopping_list_open(self, value: bool):
+        self.is_shopping_list_open = value
+
+    @rx.var
+    def shopping_list_addable_count(self) -> int:
+        return sum(1 for item in self.shopping_list_items if not item["in_wishlist"])
+
+    async def check_missing_paints(self, guide_id: str = ""):
+        """
+        Opens the shopping list for one guide, or for every guide when no id is given.
+
+        Guides already in the per-session cache are read from it; the rest
+        are fetched in bulk.
+        """
+        from ..services import shopping_list
+
+        if not self.user: return
+        guide_ids = [guide_id] if guide_id else [g.id for g in self.painting_guides]
+        self.shopping_list_guide_count = len(guide_ids)
+        self.shopping_list_items = []
+        self.is_shopping_list_open = True
+        self.is_resolving_shopping_list = True
+        yield
+        try:
+            rows = []
+            uncached = []
+            for gid in guide_ids:
+                cached = self._guide_cache.get(gid)
+                if cached:
+                    rows.extend(shopping_list.guide_paint_rows(_unproxy(cached)))
+                else:
+                    uncached.append(gid)
+            db = self._db()
+            if uncached:
+                rows.extend(await asyncio.to_thread(shopping_list.fetch_guide_paints, db, uncached))
+
+            owned = _unproxy(self.owned_paints)
+            owned_ids = {p["paint_id"] for p in owned if p.get("paint_id")}
+            missing = shopping_list.missing_paint_ids(rows, owned_ids)
+            catalog = await asyncio.to_thread(shopping_list.fetch_catalog_paints, db, missing) if missing else {}
+            wishlist_ids = {w["paint_id"] for w in self.wishlist_paints if w.get("paint_id")}
+            guide_names = {g.id: g.name for g in self.painting_guides}
+            if self.selected_guide:
+                guide_names.setdefault(self.selected_guide.id, self.selected_guide.name)
+            user_index = paint_index.get_user_index(self.user.get("id"), owned, _unproxy(self.custom_paints))
+            self.shopping_list_items = shopping_list.resolve_missing(
+                rows, owned_ids, catalog, guide_names, wishlist_ids, user_index
+            )
+        except Exception as e:
+            print(f"Shopping list error: {e}")
+            yield rx.toast(f"❌ Could not check paints: {e}")
+        finally:
+            self.is_resolving_shopping_list = False
+
+    async def add_missing_to_wishlist(self):
+        """Adds every listed paint not yet on the shopping list, in one insert."""
+        from ..services import shopping_list
+
+        if not self.user: return
+        paint_ids = [item["paint_id"] for item in self.shopping_list_items if not item["in_wishlist"]]
+        if not paint_ids:
+            return
+        try:
+            added = await asyncio.to_thread(
+                shopping_list.add_missing_to_wishlist, self._db(), self.user.get("id"), paint_ids
+            )
+            self.shopping_list_items = [{**item, "in_wishlist": True} for item in _unproxy(self.shopping_list_items)]
+            yield rx.toast(f"🛒 Added {added} paints to Shopping List")
+            await self.fetch_wishlist()
+        except Exception as e:
+            yield rx.toast(f"❌ Error: {e}")
             
     # State for Confirmation Dialogs
     cancel_confirmation_open: bool = False
@@ -1030,6 +1336,8 @@ class DashboardState(BaseState):
         self.new_guide_slapchop = False
         self.new_guide_slapchop_note = ""
         self.new_guide_image_file = []
+        self.new_guide_image_palettes = {}
+        self.guide_image_uploads = []
         self.new_guide_details = []
         self.is_editing_guide = False
         self.editing_guide_id = ""
@@ -1067,7 +1375,13 @@ class DashboardState(BaseState):
 
     def set_new_detail_name(self, val): self.new_detail_name = val
     def set_new_detail_category(self, val): self.new_detail_category = val
-    def set_new_guide_paint_search(self, val): self.new_guide_paint_search = val
+    async def set_new_guide_paint_search(self, val):
+        self.new_guide_paint_search = val
+        await self.filter_owned_paints_for_selection(val)
+
+    async def set_paint_search_include_catalog(self, value: bool):
+        self.paint_search_include_catalog = value
+        await self.filter_owned_paints_for_selection(self.new_guide_paint_search)
     def set_new_guide_paint_ratio(self, val): self.new_guide_paint_ratio = int(val) if val else 1
     def set_new_guide_paint_note(self, val): self.new_guide_paint_note = val
     
@@ -1092,15 +1406,31 @@ class DashboardState(BaseState):
         self.new_guide_details.pop(idx)
         self.guide_form_is_dirty = True
 
-    def open_paint_selector(self, detail_idx: int, role: str = None):
+    def _form_detail(self, detail_idx: int) -> GuideDetail:
+        return _unproxy(self.new_guide_details)[detail_idx]
+
+    def _replace_form_detail(self, detail_idx: int, **changes):
+        """
+        Swaps one form detail for an updated shallow copy.
+
+        Form details are shared with the cached guide (see open_guide_for_edit),
+        so they are never mutated in place.
+        """
+        details = list(_unproxy(self.new_guide_details))
+        details[detail_idx] = details[detail_idx].model_copy(update=changes)
+        self.new_guide_details = details
+
+    async def open_paint_selector(self, detail_idx: int, role: str = None):
         self.active_detail_index_for_paint = detail_idx
         self.active_role_for_paint = role
-        self.filter_owned_paints_for_selection()  # Populate paint list
+        self.new_guide_paint_search = ""
+        if detail_idx >= 0:
+            await self.filter_owned_paints_for_selection()  # Populate paint list
         
     def add_paint_to_detail(self, paint_name: str, color: str, paint_id: str = None):
         if self.active_detail_index_for_paint < 0: return
         
-        detail = self.new_guide_details[self.active_detail_index_for_paint]
+        detail = self._form_detail(self.active_detail_index_for_paint)
         
         # If adding for a specific role (Contrast/Layering slots)
         if self.active_role_for_paint:
@@ -1108,23 +1438,22 @@ class DashboardState(BaseState):
              # For now, we append. The view interprets the first one as "the" paint for that role if necessary.
              pass
 
-        detail.guide_paints.append(GuidePaint(
+        self._replace_form_detail(self.active_detail_index_for_paint, guide_paints=[*detail.guide_paints, GuidePaint(
             paint_name=paint_name,
             paint_color_hex=color,
-            paint_id=paint_id,
+            paint_id=paint_id or None,
             role=self.active_role_for_paint,
             ratio=self.new_guide_paint_ratio,
             note=self.new_guide_paint_note
-        ))
-        
-        # Trigger update
-        self.new_guide_details = self.new_guide_details
+        )])
         self.guide_form_is_dirty = True
         
         # Reset paint inputs
         self.new_guide_paint_search = ""
         self.new_guide_paint_ratio = 1
         self.new_guide_paint_note = ""
+        self.active_detail_index_for_paint = -1  # Close selector
+        self.active_role_for_paint = ""
         
     def add_paint_from_owned(self, detail_idx: int, paint_id: str = None):
         """Add paint to detail from owned paints library"""
@@ -1150,18 +1479,15 @@ class DashboardState(BaseState):
         if not paint_match:
             return
             
-        detail = self.new_guide_details[detail_idx]
-        detail.guide_paints.append(GuidePaint(
+        detail = self._form_detail(detail_idx)
+        self._replace_form_detail(detail_idx, guide_paints=[*detail.guide_paints, GuidePaint(
             paint_name=paint_match["catalog_paints"]["name"],
             paint_color_hex=paint_match["catalog_paints"]["color_hex"],
             paint_id=paint_match["paint_id"],
             role=self.active_role_for_paint,
             ratio=self.new_guide_paint_ratio,
             note=self.new_guide_paint_note
-        ))
-        
-        # Trigger update
-        self.new_guide_details = self.new_guide_details
+        )])
         self.guide_form_is_dirty = True
         
         # Reset inputs
@@ -1174,17 +1500,19 @@ class DashboardState(BaseState):
         
     def remove_paint_from_detail(self, detail_idx: int, paint_idx: int):
         if 0 <= detail_idx < len(self.new_guide_details):
-             if 0 <= paint_idx < len(self.new_guide_details[detail_idx].guide_paints):
-                self.new_guide_details[detail_idx].guide_paints.pop(paint_idx)
-                self.new_guide_details = self.new_guide_details
+             paints = list(self._form_detail(detail_idx).guide_paints)
+             if 0 <= paint_idx < len(paints):
+                paints.pop(paint_idx)
+                self._replace_form_detail(detail_idx, guide_paints=paints)
                 self.guide_form_is_dirty = True
 
     def set_paint_ratio(self, detail_idx: int, paint_idx: int, val: str):
         if not val.isdigit(): return
         if 0 <= detail_idx < len(self.new_guide_details):
-             if 0 <= paint_idx < len(self.new_guide_details[detail_idx].guide_paints):
-                self.new_guide_details[detail_idx].guide_paints[paint_idx].ratio = int(val)
-                self.new_guide_details = self.new_guide_details
+             paints = list(self._form_detail(detail_idx).guide_paints)
+             if 0 <= paint_idx < len(paints):
+                paints[paint_idx] = paints[paint_idx].model_copy(update={"ratio": int(val)})
+                self._replace_form_detail(detail_idx, guide_paints=paints)
                 self.guide_form_is_dirty = True
         
     async def save_painting_guide(self):
@@ -1196,7 +1524,7 @@ class DashboardState(BaseState):
              if self.is_editing_guide:
                  # UPDATE MODE
                  # A. Update Guide
-                 supabase.table("painting_guides").update({
+                 self._db().table("painting_guides").update({
                      "name": self.new_guide_name,
                      "note": self.new_guide_note,
                      "guide_type": self.new_guide_type,
@@ -1204,18 +1532,20 @@ class DashboardState(BaseState):
                      "is_airbrush": self.new_guide_airbrush,
                      "is_slapchop": self.new_guide_slapchop,
                      "slapchop_note": self.new_guide_slapchop_note,
-                     "image_drive_id": self.new_guide_image_file[0] if self.new_guide_image_file else None
+                     "image_drive_id": self.new_guide_image_file[0] if self.new_guide_image_file else None,
+                     "image_drive_ids": self.new_guide_image_file,
+                     "image_palettes": self._form_image_palettes()
                  }).eq("id", self.editing_guide_id).execute()
                  
                  # B. Delete existing details and paints (cascade)
-                 supabase.table("guide_details").delete().eq("guide_id", self.editing_guide_id).execute()
+                 self._db().table("guide_details").delete().eq("guide_id", self.editing_guide_id).execute()
                  
                  guide_id = self.editing_guide_id
                  
              else:
                  # CREATE MODE
                  print(f"DEBUG: Saving guide (Create). User ID: {self.user.get('id')}")
-                 guide_res = supabase.table("painting_guides").insert({
+                 guide_res = self._db().table("painting_guides").insert({
                      "user_id": self.user.get("id"),
                      "name": self.new_guide_name,
                      "note": self.new_guide_note,
@@ -1224,7 +1554,9 @@ class DashboardState(BaseState):
                      "is_airbrush": self.new_guide_airbrush,
                      "is_slapchop": self.new_guide_slapchop,
                      "slapchop_note": self.new_guide_slapchop_note,
-                     "image_drive_id": self.new_guide_image_file[0] if self.new_guide_image_file else None
+                     "image_drive_id": self.new_guide_image_file[0] if self.new_guide_image_file else None,
+                     "image_drive_ids": self.new_guide_image_file,
+                     "image_palettes": self._form_image_palettes()
                  }).execute()
                  
                  print(f"DEBUG: Guide Insert Result: {guide_res.data}")
@@ -1238,11 +1570,12 @@ class DashboardState(BaseState):
               
              # B. Details (for both create and update)
              for i, d in enumerate(self.new_guide_details):
-                 d_res = supabase.table("guide_details").insert({
+                 d_res = self._db().table("guide_details").insert({
                      "guide_id": guide_id,
                      "name": d.name,
                      "description": d.description,
-                     "order_index": i
+                     "order_index": i,
+                     "layer_count": len(d.layer_roles)
                  }).execute()
                  detail_id = d_res.data[0]["id"]
                  
@@ -1261,8 +1594,10 @@ class DashboardState(BaseState):
                      })
                  
                  if paints_payload:
-                     supabase.table("guide_paints").insert(paints_payload).execute()
+                     self._db().table("guide_paints").insert(paints_payload).execute()
                      
+             self._guide_cache.pop(guide_id, None)
+             await self._refresh_share(guide_id)
              action_text = "Updated" if self.is_editing_guide else "Created"
              yield rx.toast(f"✅ Painting Guide {action_text}!")
              self.toggle_guide_modal()
@@ -1273,43 +1608,64 @@ class DashboardState(BaseState):
              yield rx.toast(f"❌ Error: {e}")
              
 
-    def open_guide_detail(self, guide: PaintingGuide):
+    async def open_guide_detail(self, guide: PaintingGuide):
+        # Show the summary right away, then fill in the steps
         self.selected_guide = guide
+        self.selected_guide_image = guide.image_drive_id or ""
         self.is_detail_modal_open = True
+        if guide.id not in self._guide_cache:
+            self.is_loading_guide = True
+            yield
+        full_guide = await self._load_guide(guide.id)
+        self.is_loading_guide = False
+        if not full_guide:
+            yield rx.toast.error("Could not load guide.")
+            return
+        if self.selected_guide and self.selected_guide.id == guide.id:
+            self.selected_guide = full_guide
         
     def close_guide_detail(self):
         self.is_detail_modal_open = False
         self.selected_guide = None
+        self.selected_guide_image = ""
+
+    def set_selected_guide_image(self, file_id: str):
+        self.selected_guide_image = file_id
         
     def add_layer_step(self, detail_idx: int):
         if 0 <= detail_idx < len(self.new_guide_details):
-            d = self.new_guide_details[detail_idx]
+            d = self._form_detail(detail_idx)
             n = len(d.layer_roles)
-            d.layer_roles.append(f"layer_{n}")
-            self.new_guide_details = self.new_guide_details
+            self._replace_form_detail(detail_idx, layer_roles=[*d.layer_roles, f"layer_{n}"])
             self.guide_form_is_dirty = True
 
     def toggle_detail_collapse(self, detail_idx: int):
         """Toggles the collapsed state of a guide step in the form"""
         if 0 <= detail_idx < len(self.new_guide_details):
-            self.new_guide_details[detail_idx].is_collapsed = not self.new_guide_details[detail_idx].is_collapsed
-            self.new_guide_details = self.new_guide_details
+            self._replace_form_detail(detail_idx, is_collapsed=not self._form_detail(detail_idx).is_collapsed)
 
     def update_detail_description(self, detail_idx: int, val: str):
         """Updates the description for a specific detail in the form"""
         if 0 <= detail_idx < len(self.new_guide_details):
-            self.new_guide_details[detail_idx].description = val
-            self.new_guide_details = self.new_guide_details
+            self._replace_form_detail(detail_idx, description=val)
             self.guide_form_is_dirty = True
 
     def toggle_selected_detail_collapse(self, detail_idx: int):
         """Toggles collapse for a detail in the selected guide (read-only view)"""
         if self.selected_guide and 0 <= detail_idx < len(self.selected_guide.guide_details):
-            self.selected_guide.guide_details[detail_idx].is_collapsed = not self.selected_guide.guide_details[detail_idx].is_collapsed
-            self.selected_guide = self.selected_guide # Trigger update
+            # Copy the path to the toggled detail; the guide object is shared with the cache
+            guide = _unproxy(self.selected_guide)
+            details = list(guide.guide_details)
+            details[detail_idx] = details[detail_idx].model_copy(update={"is_collapsed": not details[detail_idx].is_collapsed})
+            self.selected_guide = guide.model_copy(update={"guide_details": details})
 
     async def open_guide_for_edit(self, guide: PaintingGuide):
         """Opens guide in edit mode, populating the form"""
+        guide = await self._load_guide(guide.id)
+        if not guide:
+            yield rx.toast.error("Could not load guide.")
+            return
+
         self.is_editing_guide = True
         self.editing_guide_id = guide.id
         self.new_guide_name = guide.name
@@ -1320,14 +1676,18 @@ class DashboardState(BaseState):
         self.new_guide_slapchop = guide.is_slapchop
         self.new_guide_slapchop_note = guide.slapchop_note or ""
         
-        # Set image if exists
-        if guide.image_drive_id:
+        # Gallery (older guides only have the single cover image)
+        if guide.image_drive_ids:
+            self.new_guide_image_file = list(guide.image_drive_ids)
+        elif guide.image_drive_id:
             self.new_guide_image_file = [guide.image_drive_id]
         else:
             self.new_guide_image_file = []
+        self.new_guide_image_palettes = dict(guide.image_palettes)
+        self.guide_image_uploads = []
         
-        # Details are already normalized during fetch, but we copy them
-        self.new_guide_details = [d.copy(deep=True) for d in guide.guide_details]
+        # Shared with the cached guide; edits replace details instead of mutating them
+        self.new_guide_details = list(guide.guide_details)
         self.guide_form_is_dirty = False
         
         # Open modal
@@ -1338,7 +1698,8 @@ class DashboardState(BaseState):
         if self.selected_guide:
             guide_to_edit = self.selected_guide
             self.close_guide_detail()
-            await self.open_guide_for_edit(guide_to_edit)
+            async for event in self.open_guide_for_edit(guide_to_edit):
+                yield event
     
     def handle_delete_click(self, guide_id: str):
         """Sets the guide ID to delete and opens the confirmation modal"""
@@ -1360,121 +1721,474 @@ class DashboardState(BaseState):
     async def delete_guide(self, guide_id: str):
         """Delete a painting guide from the database"""
         try:
+            # Drop the share (and its cached page) before the guide goes
+            guide_share.unpublish(self._db(), guide_id)
+
             # Delete guide details first (cascade should handle this, but being explicit)
-            supabase.table("guide_details").delete().eq("guide_id", guide_id).execute()
+            self._db().table("guide_details").delete().eq("guide_id", guide_id).execute()
             
             # Delete the guide itself
-            supabase.table("painting_guides").delete().eq("id", guide_id).execute()
+            self._db().table("painting_guides").delete().eq("id", guide_id).execute()
             
             # Update local state
             self.painting_guides = [g for g in self.painting_guides if g.id != guide_id]
+            self._guide_cache.pop(guide_id, None)
             
         except Exception as e:
             print(f"Error deleting guide: {e}")
+
+    # --- Duplication & Templates ---
+    async def _clone_guide(self, guide_id: str, name: str = "", as_template: bool = False,
+                           paint_overrides: dict | None = None) -> PaintingGuide | None:
+        """
+        Copies a guide with all steps and paints in one database call
+        (clone_painting_guide, migrations 11/12) and returns the copy's summary.
+        paint_overrides replaces paints by guide_paints id while copying.
+        """
+        res = self._db().rpc("clone_painting_guide", {
+            "source_guide_id": guide_id, "new_name": name or None, "as_template": as_template,
+            "paint_overrides": paint_overrides or {},
+        }).execute()
+        new_id = res.data
+        summary = self._db().table("painting_guides").select(GUIDE_SUMMARY_COLUMNS).eq("id", new_id).execute()
+        guides = _guide_summaries(summary.data)
+        return guides[0] if guides else None
+
+    async def duplicate_guide(self, guide_id: str, name: str = ""):
+        """Adds a copy of one of the user's guides to the list."""
+        if not self.user or self.is_cloning_guide: return
+        source = next((g for g in self.painting_guides if g.id == guide_id), None)
+        self.is_cloning_guide = True
+        yield
+        try:
+            copy = await self._clone_guide(guide_id, name or (f"{source.name} (copy)" if source else ""))
+            if copy:
+                self.painting_guides = [copy, *self.painting_guides]
+            yield rx.toast.success(f"✅ Duplicated as '{copy.name}'" if copy else "✅ Guide duplicated")
+        except Exception as e:
+            print(f"Error duplicating guide: {e}")
+            yield rx.toast.error(f"Could not duplicate guide: {e}")
+        finally:
+            self.is_cloning_guide = False
+
+    async def save_guide_as_template(self, guide_id: str):
+        """Publishes a snapshot of a guide to the shared template library."""
+        if not self.user or self.is_cloning_guide: return
+        self.is_cloning_guide = True
+        yield
+        try:
+            template = await self._clone_guide(guide_id, as_template=True)
+            if template:
+                self.guide_templates = [template, *self.guide_templates]
+            yield rx.toast.success("✅ Saved to the template library")
+        except Exception as e:
+            print(f"Error saving template: {e}")
+            yield rx.toast.error(f"Could not save template: {e}")
+        finally:
+            self.is_cloning_guide = False
+
+    async def fetch_guide_templates(self):
+        try:
+            res = self._db().table("painting_guides").select(
+                GUIDE_SUMMARY_COLUMNS
+            ).eq("is_template", True).order("created_at", desc=True).limit(TEMPLATE_LIBRARY_LIMIT).execute()
+            self.guide_templates = _guide_summaries(res.data)
+        except Exception as e:
+            print(f"Error fetching templates: {e}")
+
+    async def open_template_library(self):
+        self.is_template_library_open = True
+        yield
+        await self.fetch_guide_templates()
+
+    def set_is_template_library_open(self, value: bool):
+        self.is_template_library_open = value
+
+    async def use_template(self, template_id: str):
+        """Creates a guide from a template and opens it in the editor."""
+        if not self.user or self.is_cloning_guide: return
+        self.is_cloning_guide = True
+        yield
+        try:
+            guide = await self._clone_guide(template_id)
+        except Exception as e:
+            print(f"Error creating guide from template: {e}")
+            yield rx.toast.error(f"Could not use template: {e}")
+            return
+        finally:
+            self.is_cloning_guide = False
+        if not guide:
+            return
+        self.painting_guides = [guide, *self.painting_guides]
+        self.is_template_library_open = False
+        yield rx.toast.success(f"✅ Created '{guide.name}' from template")
+        async for event in self.open_guide_for_edit(guide):
+            yield event
+
+    @rx.var
+    def brand_swap_targets(self) -> list[str]:
+        return [guide_transform.OWNED_TARGET] + [b["name"] for b in self.library_brands]
+
+    @rx.var
+    def brand_swap_summary(self) -> str:
+        deltas = [float(r["delta_e"]) for r in self.brand_swap_rows if r["delta_e"]]
+        if not deltas:
+            return ""
+        kept = len(self.brand_swap_rows) - len(deltas)
+        summary = f"{len(deltas)} paints swapped · average ΔE {sum(deltas) / len(deltas):.1f} · worst ΔE {max(deltas):.1f}"
+        return summary + (f" · {kept} kept (no colour)" if kept else "")
+
+    def open_brand_swap(self):
+        if not self.selected_guide: return
+        self.brand_swap_target = ""
+        self.brand_swap_rows = []
+        self.brand_swap_name = self.selected_guide.name
+        self.is_brand_swap_open = True
+
+    def set_is_brand_swap_open(self, value: bool):
+        self.is_brand_swap_open = value
+
+    def set_brand_swap_name(self, value: str):
+        self.brand_swap_name = value
+
+    async def set_brand_swap_target(self, target: str):
+        """Previews the selected guide with every paint matched to the target's closest paint."""
+        if not self.user or not self.selected_guide: return
+        self.brand_swap_target = target
+        self.brand_swap_name = f"{self.selected_guide.name} ({target})"
+        self.is_brand_swap_loading = True
+        yield
+        try:
+            guide = await self._load_guide(self.selected_guide.id)
+            if target == guide_transform.OWNED_TARGET:
+                target_index = paint_index.get_user_index(
+                    self.user.get("id"), _unproxy(self.owned_paints), _unproxy(self.custom_paints)
+                )
+            else:
+                # First use reads the whole catalog; keep that off the event loop
+                target_index = await asyncio.to_thread(paint_index.get_brand_index, self._db(), target)
+            self.brand_swap_rows = guide_transform.swap_preview(guide, target_index) if guide else []
+        except Exception as e:
+            print(f"Brand swap error: {e}")
+            yield rx.toast.error(f"Could not preview the swap: {e}")
+        finally:
+            self.is_brand_swap_loading = False
+
+    async def save_brand_swap(self):
+        """Saves the previewed swap as a new guide and opens it."""
+        if not self.selected_guide or not self.brand_swap_rows or self.is_cloning_guide: return
+        self.is_cloning_guide = True
+        yield
+        try:
+            guide = await self._clone_guide(
+                self.selected_guide.id, self.brand_swap_name,
+                paint_overrides=guide_transform.paint_overrides(_unproxy(self.brand_swap_rows)),
+            )
+        except Exception as e:
+            print(f"Error saving brand swap: {e}")
+            yield rx.toast.error(f"Could not save the swapped guide: {e}")
+            return
+        finally:
+            self.is_cloning_guide = False
+        if not guide:
+            return
+        self.painting_guides = [guide, *self.painting_guides]
+        self.is_brand_swap_open = False
+        yield rx.toast.success(f"✅ Saved '{guide.name}'")
+        async for event in self.open_guide_detail(guide):
+            yield event
+
+    # --- Share Links ---
+    def _primer_name(self, guide: PaintingGuide) -> str:
+        if not guide.primer_paint_id:
+            return ""
+        return next((name for paint_id, name in self.primer_options if paint_id == guide.primer_paint_id), "")
+
+    def _share_url(self, token: str) -> str:
+        return f"{rx.config.get_config().api_url.rstrip('/')}/api/share/{token}"
+
+    async def _refresh_share(self, guide_id: str):
+        """Rebuilds the public snapshot after a save; shared pages never read the live guide."""
+        try:
+            if not guide_share.share_token_for(self._db(), guide_id):
+                return
+            guide = await self._load_guide(guide_id)
+            if guide:
+                guide_share.refresh(self._db(), guide, self._primer_name(guide))
+        except Exception as e:
+            print(f"Error refreshing share of guide {guide_id}: {e}")
+
+    async def open_share_dialog(self):
+        if not self.selected_guide: return
+        self.share_url = ""
+        self.is_share_open = True
+        self.is_sharing = True
+        yield
+        try:
+            token = guide_share.share_token_for(self._db(), self.selected_guide.id)
+            self.share_url = self._share_url(token) if token else ""
+        except Exception as e:
+            print(f"Error reading share link: {e}")
+            yield rx.toast.error(f"Could not read the share link: {e}")
+        finally:
+            self.is_sharing = False
+
+    def set_is_share_open(self, value: bool):
+        self.is_share_open = value
+
+    async def create_share_link(self):
+        """Publishes a snapshot of the selected guide under a public link."""
+        if not self.user or not self.selected_guide or self.is_sharing: return
+        self.is_sharing = True
+        yield
+        try:
+            guide = await self._load_guide(self.selected_guide.id)
+            if not guide:
+                yield rx.toast.error("Could not load guide.")
+                return
+            token = guide_share.publish(self._db(), guide, self._primer_name(guide))
+            self.share_url = self._share_url(token)
+            yield rx.toast.success("✅ Share link created")
+        except Exception as e:
+            print(f"Error sharing guide: {e}")
+            yield rx.toast.error(f"Could not share guide: {e}")
+        finally:
+            self.is_sharing = False
+
+    async def stop_sharing(self):
+        """Deletes the public link; the old URL stops working."""
+        if not self.selected_guide or self.is_sharing: return
+        self.is_sharing = True
+        yield
+        try:
+            guide_share.unpublish(self._db(), self.selected_guide.id)
+            self.share_url = ""
+            yield rx.toast.success("✅ Guide is no longer shared")
+        except Exception as e:
+            print(f"Error unsharing guide: {e}")
+            yield rx.toast.error(f"Could not stop sharing: {e}")
+        finally:
+            self.is_sharing = False
+
+    async def delete_template(self, template_id: str):
+        """Removes one of the user's own templates from the library."""
+        if not self.user: return
+        try:
+            self._db().table("painting_guides").delete().eq("id", template_id).eq("user_id", self.user.get("id")).execute()
+            self.guide_templates = [t for t in self.guide_templates if t.id != template_id]
+            self._guide_cache.pop(template_id, None)
+            yield rx.toast.success("✅ Template removed")
+        except Exception as e:
+            yield rx.toast.error(f"Could not remove template: {e}")
     
     async def handle_guide_image_upload(self, files: list[rx.UploadFile]):
         """
-        Handles image upload with security validation, automatic optimization, and Drive upload.
+        Handles image uploads with security validation, automatic optimization, and storage.
         
         Security layers:
         1. Client-side: rx.upload accept filter (first line of defense)
         2. Server-side: Multi-layer validation via image_validator
         3. Automatic optimization: Resize + compress to fit requirements
-        4. Google Drive: Upload with restricted permissions
+        4. Storage: Google Drive app folder, or the local/S3 backend (image_storage)
+
+        Every selected file is processed on the upload worker pool, up to
+        UPLOAD_BATCH_PARALLELISM at a time; this handler only relays per-file
+        progress, so the event loop stays free. Successful uploads are
+        appended to the guide's gallery, failed ones are reported per file.
         """
-        from ..utils.image_validator import validate_and_optimize_image, ImageValidationError, get_safe_mime_type
+        from ..utils.image_validator import ImageValidationError
+        from ..services import image_storage, upload_worker
         import uuid
         
         if not files or len(files) == 0:
             return
-        
-        uploaded_file = files[0]
+
+        try:
+            storage = image_storage.get_storage()
+        except image_storage.ImageStorageError as e:
+            print(f"Image storage error: {e}")
+            yield rx.toast.error("Image storage is not configured. Please contact the admin.")
+            return
+
+        if storage.needs_drive and not self.is_drive_connected:
+            yield rx.toast.error("Please connect Google Drive first")
+            return
+
+        room = MAX_GUIDE_IMAGES - len(self.new_guide_image_file)
+        if room <= 0:
+            yield rx.toast.error(f"A guide can have at most {MAX_GUIDE_IMAGES} images.")
+            return
+        if len(files) > room:
+            yield rx.toast.warning(f"Only the first {room} images were added (limit {MAX_GUIDE_IMAGES} per guide).")
+            files = files[:room]
         
         try:
-            # Read file data
-            file_data = await uploaded_file.read()
-            
-            # CRITICAL: Multi-layer security validation + optimization
-            result = validate_and_optimize_image(file_data, uploaded_file.filename)
-            
-            if not result['valid']:
-                yield rx.toast.error(f"Invalid image: {result.get('error', 'Unknown error')}")
-                return
-            
-            # Build user feedback message
-            feedback_parts = ["Image uploaded!"]
-            if result['was_resized']:
-                feedback_parts.append(
-                    f"Resized {result['original_size'][0]}x{result['original_size'][1]} → "
-                    f"{result['final_size'][0]}x{result['final_size'][1]}px"
-                )
-            if result['was_compressed']:
-                feedback_parts.append(
-                    f"Compressed to {result['file_size']/1024:.0f}KB"
-                )
-            
-            # Generate safe filename
-            safe_filename = f"guide_{uuid.uuid4()}.{result['format']}"
-            mime_type = get_safe_mime_type(result['format'])
-            
-            # Upload to Google Drive
-            if self.is_drive_connected:
-                try:
-                    # Fetch Drive refresh token from user_settings
-                    user_id = self.user.get("id")
-                    settings_res = supabase.table("user_settings").select("drive_refresh_token").eq("user_id", user_id).execute()
-                    
-                    if not settings_res.data or not settings_res.data[0].get("drive_refresh_token"):
-                        yield rx.toast.error("Google Drive not properly configured. Please reconnect.")
-                        return
-                    
-                    refresh_token = settings_res.data[0]["drive_refresh_token"]
-                    
-                    # Get Drive service (will use refresh token to get access token)
-                    drive_svc = drive_service.get_drive_service(
-                        access_token=None,  # Will be obtained from refresh token
-                        refresh_token=refresh_token
-                    )
-                    
-                    # Upload file (no folder for now, can be added later)
-                    drive_file = drive_service.upload_file(
-                        drive_svc,
-                        result['cleaned_data'],
-                        safe_filename,
-                        folder_id=None,
-                        mime_type=mime_type
-                    )
-                    
-                    # Make file accessible via link
-                    drive_service.set_file_public(drive_svc, drive_file['id'])
-                    
-                    # Store Drive file ID in state
-                    self.new_guide_image_file = [drive_file['id']]
-                    
-                    # Show success message with optimization details
-                    yield rx.toast.success(" | ".join(feedback_parts))
-                    
-                except Exception as drive_error:
-                    print(f"Drive upload error: {drive_error}")
-                    yield rx.toast.error(f"Drive upload failed: {str(drive_error)}")
+            # Fetch Drive refresh token from user_settings (unless the Drive service is cached)
+            user_id = self.user.get("id")
+            refresh_token = None
+            folder_id = None
+            if storage.needs_drive and (not drive_service.has_cached_service(user_id) or not drive_service.get_cached_folder(user_id)):
+                settings_res = self._db().table("user_settings").select("drive_refresh_token, drive_folder_id").eq("user_id", user_id).execute()
+                
+                if not settings_res.data or not settings_res.data[0].get("drive_refresh_token"):
+                    yield rx.toast.error("Google Drive not properly configured. Please reconnect.")
+                    return
+                
+                refresh_token = settings_res.data[0]["drive_refresh_token"]
+                folder_id = settings_res.data[0].get("drive_folder_id")
+
+            # One job per file; safe filenames get their extension once the output format is known
+            jobs = []
+            for uploaded_file in files:
+                file_data = await uploaded_file.read()
+                jobs.append((file_data, uploaded_file.filename, user_id, refresh_token, folder_id, f"guide_{uuid.uuid4()}"))
+
+            self.guide_image_uploads = [
+                {"name": f.filename or f"Image {i + 1}", "status": "Waiting for a free worker...", "state": "pending"}
+                for i, f in enumerate(files)
+            ]
+            self.is_uploading_guide_image = True
+            yield
+
+            results = {}
+            async for index, event, value in upload_worker.run_batch(upload_worker.process_guide_image, jobs):
+                entry = dict(self.guide_image_uploads[index])
+                if event == "progress":
+                    entry["status"] = value
+                elif event == "done":
+                    results[index] = value
+                    entry["state"] = "done"
+                    entry["status"] = "Uploaded"
+                    if value['was_resized'] or value['was_compressed']:
+                        entry["status"] += f" ({value['final_size'][0]}x{value['final_size'][1]}px, {value['file_size']/1024:.0f}KB)"
+                else:
+                    if not isinstance(value, (ImageValidationError, upload_worker.UploadQueueFull)):
+                        print(f"Upload error for {entry['name']}: {value}")
+                    entry["state"] = "error"
+                    entry["status"] = str(value)
+                self.guide_image_uploads[index] = entry
+                yield
+
+            if any(r['folder_created'] for r in results.values()):
+                # Remember the app folder so it is only created once
+                folder_id = next(r['folder_id'] for r in results.values() if r['folder_created'])
+                self._db().table("user_settings").update({"drive_folder_id": folder_id}).eq("user_id", user_id).execute()
+
+            # Keep the selection order in the gallery
+            new_ids = [results[i]['file_id'] for i in sorted(results)]
+            if new_ids:
+                self.new_guide_image_file = self.new_guide_image_file + new_ids
+                self.new_guide_image_palettes = {
+                    **self.new_guide_image_palettes,
+                    **{r['file_id']: r['palette'] for r in results.values() if r.get('palette')},
+                }
+                self.guide_form_is_dirty = True
+
+            failed = len(files) - len(new_ids)
+            if failed:
+                yield rx.toast.warning(f"Uploaded {len(new_ids)} of {len(files)} images, {failed} failed.")
             else:
-                yield rx.toast.error("Please connect Google Drive first")
+                yield rx.toast.success(f"✅ {len(new_ids)} image{'s' if len(new_ids) != 1 else ''} uploaded")
         
-        except ImageValidationError as e:
-            yield rx.toast.error(f"Upload failed: {str(e)}")
         except Exception as e:
             print(f"Upload error: {e}")
-            yield rx.toast.error("Upload failed. Please try again.")
+            yield rx.toast.error(f"Upload failed: {str(e)}")
+        finally:
+            self.is_uploading_guide_image = False
+
+    def remove_guide_image(self, file_id: str):
+        """Removes an image from the guide gallery (the stored file is kept)."""
+        self.new_guide_image_file = [f for f in self.new_guide_image_file if f != file_id]
+        self.new_guide_image_palettes = {k: v for k, v in self.new_guide_image_palettes.items() if k != file_id}
+        self.guide_form_is_dirty = True
+
+    def _form_image_palettes(self) -> dict[str, list[str]]:
+        """Palettes of the images still in the form's gallery, for saving."""
+        palettes = _unproxy(self.new_guide_image_palettes)
+        return {f: list(palettes[f]) for f in self.new_guide_image_file if f in palettes}
+
+    def _palette_matches(self, colors: list[str]) -> list[dict[str, str]]:
+        """Each palette colour with the closest paint the user owns (or a custom paint)."""
+        if not colors or not self.user:
+            return []
+        user_index = paint_index.get_user_index(
+            self.user.get("id"), _unproxy(self.owned_paints), _unproxy(self.custom_paints)
+        )
+        indices, dists = user_index.colors.nearest(list(colors), k=1)
+        matches = []
+        for color, idx, dist in zip(colors, indices[:, 0], dists[:, 0]):
+            entry = user_index.entries[idx] if idx >= 0 else None
+            matches.append({
+                "color": color,
+                "paint": entry["name"] if entry else "",
+                "paint_color": entry["color"] if entry else "",
+                "paint_id": (entry["paint_id"] or "") if entry else "",
+                "detail": f"ΔE {dist:.1f}" if entry else "No owned paints",
+            })
+        return matches
+
+    @rx.var
+    def new_guide_palette(self) -> list[dict[str, str]]:
+        """Palette of the cover image being edited, matched to owned paints."""
+        if not self.new_guide_image_file:
+            return []
+        return self._palette_matches(self.new_guide_image_palettes.get(self.new_guide_image_file[0], []))
+
+    @rx.var
+    def selected_guide_palette(self) -> list[dict[str, str]]:
+        """Palette of the image shown in the detail modal, matched to owned paints."""
+        if not self.selected_guide or not self.selected_guide_image:
+            return []
+        return self._palette_matches(self.selected_guide.image_palettes.get(self.selected_guide_image, []))
+
+    def add_steps_from_palette(self):
+        """Starts the guide with one step per cover palette colour, based with its closest owned paint."""
+        role = "contrast" if self.new_guide_type == "contrast" else "base"
+        new_details = []
+        for i, match in enumerate(self.new_guide_palette):
+            paints = []
+            if match["paint"]:
+                paints.append(GuidePaint(
+                    paint_name=match["paint"],
+                    paint_color_hex=match["paint_color"],
+                    paint_id=match["paint_id"] or None,
+                    role=role,
+                ))
+            new_details.append(GuideDetail(
+                name=f"Colour {i + 1}",
+                description=f"Reference colour {match['color']}",
+                category="Basecoat",
+                guide_paints=paints,
+            ))
+        if new_details:
+            self.new_guide_details = [*self.new_guide_details, *new_details]
+            self.guide_form_is_dirty = True
+            return rx.toast(f"🎨 Added {len(new_details)} steps from the reference palette")
+
+    def make_guide_image_cover(self, file_id: str):
+        """Moves an image to the front of the gallery, making it the cover."""
+        self.new_guide_image_file = [file_id] + [f for f in self.new_guide_image_file if f != file_id]
+        self.guide_form_is_dirty = True
         
-    def filter_owned_paints_for_selection(self, query: str = ""):
-        """Filter owned paints for guide paint selection"""
-        if not query:
-            # Return all owned paints (limit to 50)
-            self.owned_paints_for_guide = [{"name": p["catalog_paints"]["name"], "id": p["paint_id"], "color": p["catalog_paints"]["color_hex"]} for p in self.owned_paints[:50]]
-        else:
-            # Filter by query
-            filtered = [p for p in self.owned_paints if query.lower() in p["catalog_paints"]["name"].lower()]
-            self.owned_paints_for_guide = [{"name": p["catalog_paints"]["name"], "id": p["paint_id"], "color": p["catalog_paints"]["color_hex"]} for p in filtered[:50]]
+    async def filter_owned_paints_for_selection(self, query: str = ""):
+        """
+        Ranked results for the guide paint picker (see services/paint_index.py).
+
+        Searches owned and custom paints, plus the full catalog when enabled.
+        Queries match names, product codes and "#hex" colours.
+        """
+        if not self.user: return
+        try:
+            user_index = paint_index.get_user_index(
+                self.user.get("id"), _unproxy(self.owned_paints), _unproxy(self.custom_paints)
+            )
+            catalog_index = None
+            if self.paint_search_include_catalog and query.strip():
+                # First use reads the whole catalog; keep that off the event loop
+                catalog_index = await asyncio.to_thread(paint_index.get_catalog_index, self._db())
+            self.owned_paints_for_guide = paint_index.search_paints(user_index, catalog_index, query)
+        except Exception as e:
+            print(f"Paint search error: {e}")
 
 
 
@@ -2012,52 +2726,186 @@ def render_create_custom_modal():
         on_open_change=DashboardState.toggle_custom_modal
     )
 
-def render_custom_paint_card(paint: CustomPaintDict):
-    return rx.card(
-        rx.box(
-            rx.vstack(
-                rx.icon_button(
-                    rx.icon("trash-2", size=16),
-                    size="1",
-                    variant="solid",
-                    radius="full",
-                    color_scheme="red",
-                    on_click=lambda: DashboardState.delete_custom_paint(paint["id"]),
-                    style={"boxShadow": "0 2px 4px rgba(0,0,0,0.3)"}
-                ),
-                rx.icon_button(
-                    rx.icon("pencil", size=14),
-                    size="1",
-                    variant="solid",
-                    radius="full",
-                    color_scheme="gray",
-                    on_click=lambda: DashboardState.open_edit_custom_paint_modal(paint),
-                    style={"boxShadow": "0 2px 4px rgba(0,0,0,0.3)"}
-                ),
-                rx.icon_button(
-                    rx.icon("shopping-cart", size=14),
-                    size="1",
-                    variant="solid",
-                    radius="full",
-                    color_scheme="blue",
-                    on_click=lambda: DashboardState.add_to_wishlist(custom_paint_id=paint["id"], paint_name=paint["name"]),
-                    style={"boxShadow": "0 2px 4px rgba(0,0,0,0.3)"}
-                ),
-                spacing="2"
-            ),
-            position="absolute",
-            top="10px",
-            right="10px",
-            z_index="2"
-        ),
-        rx.vstack(
-            rx.box(
-                width="100%", 
-                height="60px", 
-                bg=paint["color_hex"],
-                border_radius="4px",
-                border="1px solid #e0e0e0"
-            ),
+def render_import_stat(label: str, value, color: str):
+    return rx.vstack(
+        rx.text(value, size="5", weight="bold", color=color),
+        rx.text(label, size="1", color="gray"),
+        align_items="center",
+        spacing="0"
+    )
+
+def render_import_modal():
+    """CSV inventory import: upload, preview of matches, confirm"""
+    return rx.dialog.root(
+        rx.dialog.content(
+             rx.dialog.title("Import Paints from CSV", size="4"),
+             rx.vstack(
+                 rx.text(
+                     "Columns: brand, name, code, hex. Exports from other trackers work if they use similar headers.",
+                     size="2",
+                     color="gray"
+                 ),
+                 rx.upload(
+                     rx.vstack(
+                         rx.icon("file-spreadsheet", size=24, color="gray"),
+                         rx.text("Click/Drop CSV File", size="2"),
+                         align_items="center",
+                     ),
+                     id="inventory_import_upload",
+                     accept={"text/csv": [".csv"], "text/plain": [".txt", ".tsv"]},
+                     max_files=1,
+                     on_drop=DashboardState.handle_import_upload,
+                     border="1px dashed var(--gray-6)",
+                     padding="1em",
+                     width="100%",
+                 ),
+                 rx.cond(
+                     DashboardState.is_importing,
+                     rx.hstack(rx.spinner(), rx.text("Working...", size="2"), align_items="center")
+                 ),
+                 rx.cond(
+                     DashboardState.import_total > 0,
+                     rx.vstack(
+                         rx.hstack(
+                             render_import_stat("Rows", DashboardState.import_total, "gray"),
+                             render_import_stat("Matched", DashboardState.import_matched_count, "green"),
+                             render_import_stat("To Review", DashboardState.import_ambiguous_count, "orange"),
+                             render_import_stat("Custom", DashboardState.import_custom_count, "violet"),
+                             render_import_stat("Skipped", DashboardState.import_skipped_count, "red"),
+                             width="100%",
+                             justify="between"
+                         ),
+                         rx.cond(
+                             DashboardState.import_ambiguous_count > 0,
+                             rx.vstack(
+                                 rx.hstack(
+                                     rx.switch(
+                                         checked=DashboardState.import_accept_suggestions,
+                                         on_change=DashboardState.set_import_accept_suggestions
+                                     ),
+                                     rx.text("Use suggested match for rows to review (otherwise import as custom paints)", size="2"),
+                                     align_items="center"
+                                 ),
+                                 rx.scroll_area(
+                                     rx.table.root(
+                                         rx.table.header(
+                                             rx.table.row(
+                                                 rx.table.column_header_cell("Row"),
+                                                 rx.table.column_header_cell("In File"),
+                                                 rx.table.column_header_cell("Suggested"),
+                                                 rx.table.column_header_cell("Why"),
+                                             )
+                                         ),
+                                         rx.table.body(
+                                             rx.foreach(
+                                                 DashboardState.import_ambiguous_rows,
+                                                 lambda r: rx.table.row(
+                                                     rx.table.cell(r["row"]),
+                                                     rx.table.cell(
+                                                         rx.hstack(
+                                                             rx.box(width="14px", height="14px", bg=r["input_hex"], border_radius="3px", border="1px solid #eee"),
+                                                             rx.text(r["input"], size="1"),
+                                                             align_items="center",
+                                                             spacing="2"
+                                                         )
+                                                     ),
+                                                     rx.table.cell(
+                                                         rx.hstack(
+                                                             rx.box(width="14px", height="14px", bg=r["suggestion_hex"], border_radius="3px", border="1px solid #eee"),
+                                                             rx.vstack(
+                                                                 rx.text(r["suggestion"], size="1"),
+                                                                 rx.text(r["suggestion_detail"], size="1", color="gray"),
+                                                                 spacing="0"
+                                                             ),
+                                                             align_items="center",
+                                                             spacing="2"
+                                                         )
+                                                     ),
+                                                     rx.table.cell(rx.text(r["reason"], size="1", color="gray")),
+                                                 )
+                                             )
+                                         ),
+                                         width="100%",
+                                         size="1"
+                                     ),
+                                     max_height="300px",
+                                     width="100%"
+                                 ),
+                                 spacing="2",
+                                 width="100%"
+                             )
+                         ),
+                         spacing="3",
+                         width="100%"
+                     )
+                 ),
+                 rx.hstack(
+                     rx.spacer(),
+                     rx.button("Cancel", variant="soft", color_scheme="gray", on_click=DashboardState.toggle_import_modal),
+                     rx.button(
+                         "Import",
+                         on_click=DashboardState.confirm_import,
+                         disabled=DashboardState.import_total == 0,
+                         loading=DashboardState.is_importing
+                     ),
+                     width="100%",
+                     spacing="3"
+                 ),
+                 spacing="3",
+                 width="100%"
+             ),
+             max_width="700px"
+        ),
+        open=DashboardState.is_import_modal_open,
+        on_open_change=DashboardState.toggle_import_modal
+    )
+
+def render_custom_paint_card(paint: CustomPaintDict):
+    return rx.card(
+        rx.box(
+            rx.vstack(
+                rx.icon_button(
+                    rx.icon("trash-2", size=16),
+                    size="1",
+                    variant="solid",
+                    radius="full",
+                    color_scheme="red",
+                    on_click=lambda: DashboardState.delete_custom_paint(paint["id"]),
+                    style={"boxShadow": "0 2px 4px rgba(0,0,0,0.3)"}
+                ),
+                rx.icon_button(
+                    rx.icon("pencil", size=14),
+                    size="1",
+                    variant="solid",
+                    radius="full",
+                    color_scheme="gray",
+                    on_click=lambda: DashboardState.open_edit_custom_paint_modal(paint),
+                    style={"boxShadow": "0 2px 4px rgba(0,0,0,0.3)"}
+                ),
+                rx.icon_button(
+                    rx.icon("shopping-cart", size=14),
+                    size="1",
+                    variant="solid",
+                    radius="full",
+                    color_scheme="blue",
+                    on_click=lambda: DashboardState.add_to_wishlist(custom_paint_id=paint["id"], paint_name=paint["name"]),
+                    style={"boxShadow": "0 2px 4px rgba(0,0,0,0.3)"}
+                ),
+                spacing="2"
+            ),
+            position="absolute",
+            top="10px",
+            right="10px",
+            z_index="2"
+        ),
+        rx.vstack(
+            rx.box(
+                width="100%", 
+                height="60px", 
+                bg=paint["color_hex"],
+                border_radius="4px",
+                border="1px solid #e0e0e0"
+            ),
             rx.vstack(
                 rx.text(paint["name"], weight="bold", size="2", truncate=True),
                 rx.text(paint["brand_name"], size="1", color="gray", weight="bold"),
@@ -2322,6 +3170,12 @@ def render_owned_view():
                      "Switch to Card View"
                  )
              ),
+             rx.button(
+                 rx.hstack(rx.icon("upload", size=16), rx.text("Import CSV")),
+                 on_click=DashboardState.toggle_import_modal,
+                 variant="soft",
+                 size="2"
+             ),
              rx.button(
                  rx.hstack(rx.icon("plus", size=16), rx.text("Add Custom Paint")),
                  on_click=DashboardState.toggle_custom_modal,
@@ -2729,6 +3583,7 @@ def render_wishlist_view():
 def paints_tab():
     return rx.vstack(
         render_create_custom_modal(),
+        render_import_modal(),
         
         # Conditional heading based on active tab
         rx.cond(
@@ -2948,20 +3803,105 @@ def render_create_guide_modal():
                              rx.upload(
                                  rx.vstack(
                                      rx.icon("upload", size=24, color="gray"),
-                                     rx.text("Click/Drop Image", size="2"),
+                                     rx.text("Click/Drop Images", size="2"),
+                                     rx.text(f"Up to {MAX_GUIDE_IMAGES} per guide", size="1", color="gray"),
                                      align_items="center",
                                  ),
                                  id="guide_image_upload",
                                  accept={"image/png": [".png"], "image/jpeg": [".jpg", ".jpeg"], "image/webp": [".webp"]},
-                                 max_files=1,
+                                 max_files=MAX_GUIDE_IMAGES,
+                                 multiple=True,
+                                 disabled=DashboardState.is_uploading_guide_image,
                                  on_drop=DashboardState.handle_guide_image_upload,
                                  border="1px dashed var(--gray-6)",
                                  padding="1em",
                                  width="100%",
                              ),
+                             # Per-file progress of the current upload
+                             rx.foreach(
+                                 DashboardState.guide_image_uploads,
+                                 lambda item: rx.hstack(
+                                     rx.cond(
+                                         item["state"] == "pending",
+                                         rx.spinner(size="1"),
+                                         rx.cond(
+                                             item["state"] == "done",
+                                             rx.icon("circle-check", size=14, color="green"),
+                                             rx.icon("circle-x", size=14, color="red"),
+                                         )
+                                     ),
+                                     rx.text(item["name"], size="1", weight="medium", trim="both", max_width="40%", overflow="hidden", text_overflow="ellipsis", white_space="nowrap"),
+                                     rx.text(item["status"], size="1", color=rx.cond(item["state"] == "error", "red", "gray")),
+                                     align_items="center",
+                                     width="100%"
+                                 )
+                             ),
+                             # Gallery: first image is the cover
                              rx.cond(
                                  DashboardState.new_guide_image_file,
-                                 rx.text("✅ Image Uploaded", color="green", size="2")
+                                 rx.flex(
+                                     rx.foreach(
+                                         DashboardState.new_guide_image_file,
+                                         lambda file_id, idx: rx.box(
+                                             rx.image(
+                                                 src=guide_image_url(file_id, 160),
+                                                 width="80px",
+                                                 height="80px",
+                                                 object_fit="cover",
+                                                 border_radius="6px",
+                                                 loading="lazy",
+                                                 border=rx.cond(idx == 0, "2px solid var(--violet-9)", "1px solid var(--gray-6)"),
+                                             ),
+                                             rx.hstack(
+                                                 rx.cond(
+                                                     idx == 0,
+                                                     rx.badge("Cover", size="1", color_scheme="violet"),
+                                                     rx.icon_button(
+                                                         rx.icon("star", size=12),
+                                                         size="1",
+                                                         variant="soft",
+                                                         on_click=DashboardState.make_guide_image_cover(file_id),
+                                                     ),
+                                                 ),
+                                                 rx.icon_button(
+                                                     rx.icon("x", size=12),
+                                                     size="1",
+                                                     variant="soft",
+                                                     color_scheme="red",
+                                                     on_click=DashboardState.remove_guide_image(file_id),
+                                                 ),
+                                                 spacing="1",
+                                                 justify="center",
+                                                 margin_top="4px",
+                                             ),
+                                         )
+                                     ),
+                                     wrap="wrap",
+                                     gap="0.5em",
+                                     width="100%"
+                                 )
+                             ),
+                             # Cover image palette (extracted on upload)
+                             rx.cond(
+                                 DashboardState.new_guide_palette.length() > 0,
+                                 rx.vstack(
+                                     rx.hstack(
+                                         rx.text("Reference Palette", size="1", weight="bold"),
+                                         rx.spacer(),
+                                         rx.button(
+                                             rx.icon("palette", size=14),
+                                             "Create Steps From Palette",
+                                             size="1",
+                                             variant="soft",
+                                             on_click=DashboardState.add_steps_from_palette
+                                         ),
+                                         width="100%",
+                                         align_items="center"
+                                     ),
+                                     render_palette_matches(DashboardState.new_guide_palette),
+                                     width="100%",
+                                     spacing="2"
+                                 )
                              ),
                          )
                      ),
@@ -3090,42 +4030,51 @@ def render_create_guide_modal():
                      rx.dialog.content(
                          rx.dialog.title("Select Paint"),
                          rx.input(
-                             placeholder="Search owned paints...", 
+                             placeholder="Search by name, code or #hex...", 
                              value=DashboardState.new_guide_paint_search,
-                             on_change=DashboardState.set_new_guide_paint_search
+                             on_change=DashboardState.set_new_guide_paint_search,
+                             debounce_timeout=250,
+                         ),
+                         rx.hstack(
+                             rx.switch(
+                                 checked=DashboardState.paint_search_include_catalog,
+                                 on_change=DashboardState.set_paint_search_include_catalog,
+                                 size="1"
+                             ),
+                             rx.text("Include full catalog", size="1", color="gray"),
+                             align_items="center",
+                             margin_y="0.5em"
                          ),
                          rx.scroll_area(
                              rx.vstack(
                                  rx.foreach(
                                      DashboardState.owned_paints_for_guide,
                                      lambda p: rx.hstack(
-                                         rx.box(width="20px", height="20px", bg=p["color"], border_radius="4px"),
-                                         rx.text(p["name"]),
+                                         rx.box(width="20px", height="20px", bg=p["color"], border_radius="4px", flex_shrink="0"),
+                                         rx.vstack(
+                                             rx.text(p["name"], size="2"),
+                                             rx.text(p["brand"], size="1", color="gray"),
+                                             spacing="0"
+                                         ),
                                          rx.spacer(),
-                                         rx.button("Select", size="1", on_click=lambda: DashboardState.add_paint_from_owned(DashboardState.active_detail_index_for_paint, p["id"]))
-                                         # Logic in add_paint_from_owned uses new_guide_paint_search to match name?
-                                         # That's fragile. Ideally pass ID.
-                                         # Updated logic: add_paint_from_owned relies on search query string match? 
-                                         # Let's check dashboard.py. Yes:
-                                         # if owned_paint["catalog_paints"]["name"] == self.new_guide_paint_search:
-                                         # That is super fragile.
-                                         # I should probably update add_paint_from_owned to take an ID.
-                                         # I will stick to the existing logic for now to minimize breakage, OR assume the input fills with the list item name on click?
-                                         # Actually, the button above calls add_paint_from_owned which does the matching.
-                                         # I should make the button update the search text to match the clicked item first? atomic update?
-                                         # Or better, just fix add_paint_from_owned later.
-                                         # For now, I'll rely on the user typing or standard flow.
-                                         # Wait, the list items above are meaningless if clicking them doesn't select them.
-                                         # clicking "Select" triggers add_paint_from_owned... which uses the SEARCH QUERY?
-                                         # That's bad.
-                                         # I'll change the button to set the search query to the paint name, then add?
-                                         # No, I should've fixed the state function.
-                                         # I'll rely on the user searching for now.
-                                         
+                                         rx.text(p["detail"], size="1", color="gray"),
+                                         rx.badge(
+                                             p["source"],
+                                             size="1",
+                                             color_scheme=rx.match(p["source"], ("owned", "green"), ("custom", "blue"), "gray")
+                                         ),
+                                         rx.button("Select", size="1", on_click=lambda: DashboardState.add_paint_to_detail(p["name"], p["color"], p["id"])),
+                                         width="100%",
+                                         align_items="center"
                                      )
                                  ),
-                                 height="300px"
-                             )
+                                 rx.cond(
+                                     DashboardState.owned_paints_for_guide.length() == 0,
+                                     rx.text("No matching paints.", size="2", color="gray")
+                                 ),
+                                 width="100%"
+                             ),
+                             height="300px"
                          ),
                          rx.button("Cancel", on_click=lambda: DashboardState.open_paint_selector(-1)),
                      ),
@@ -3163,6 +4112,381 @@ def render_cancel_confirmation_modal():
         open=DashboardState.cancel_confirmation_open,
     )
 
+def guide_image_url(file_id, width: int = 0):
+    """
+    URL of a guide image served through the caching backend proxy (/api/image_proxy).
+
+    Pass the largest width (px, incl. high-DPI) the image is displayed at; the
+    proxy answers with the smallest rendition covering it.
+    """
+    api_url = rx.config.get_config().api_url.rstrip("/")
+    if width:
+        return f"{api_url}/api/image_proxy/{file_id}?w={width}"
+    return f"{api_url}/api/image_proxy/{file_id}"
+
+
+def render_palette_matches(matches):
+    """Palette colours of a reference image, each with the closest owned paint"""
+    return rx.flex(
+        rx.foreach(
+            matches,
+            lambda m: rx.tooltip(
+                rx.hstack(
+                    rx.box(width="20px", height="20px", bg=m["color"], border_radius="4px", border="1px solid var(--gray-6)"),
+                    rx.cond(
+                        m["paint"],
+                        rx.hstack(
+                            rx.icon("arrow-right", size=12, color="gray"),
+                            rx.box(width="14px", height="14px", bg=m["paint_color"], border_radius="3px"),
+                            rx.text(m["paint"], size="1", max_width="120px", overflow="hidden", text_overflow="ellipsis", white_space="nowrap"),
+                            align_items="center",
+                            spacing="1"
+                        )
+                    ),
+                    align_items="center",
+                    spacing="1",
+                    padding="4px",
+                    border_radius="6px",
+                    bg=rx.color("gray", 2)
+                ),
+                content=m["color"] + " · " + m["detail"]
+            )
+        ),
+        wrap="wrap",
+        gap="0.5em",
+        width="100%"
+    )
+
+
+def render_shopping_list_item(item: ShoppingListItemDict):
+    return rx.hstack(
+        rx.box(width="24px", height="24px", bg=item["color"], border_radius="4px", border="1px solid var(--gray-6)", flex_shrink="0"),
+        rx.vstack(
+            rx.hstack(
+                rx.text(item["name"], weight="bold", size="2"),
+                rx.cond(item["brand"], rx.text(item["brand"], size="1", color="gray")),
+                rx.cond(item["in_wishlist"], rx.badge("On list", color_scheme="green", size="1")),
+                align_items="center",
+                spacing="2"
+            ),
+            rx.text(f"Used in: {item['guides']}", size="1", color="gray"),
+            rx.cond(
+                item["substitute"],
+                rx.hstack(
+                    rx.text("You own:", size="1", color="gray"),
+                    rx.box(width="12px", height="12px", bg=item["substitute_color"], border_radius="2px"),
+                    rx.text(item["substitute"], size="1"),
+                    rx.text(item["substitute_detail"], size="1", color="gray"),
+                    align_items="center",
+                    spacing="1"
+                ),
+                rx.text("No close owned substitute", size="1", color="gray")
+            ),
+            spacing="0",
+            align_items="start"
+        ),
+        width="100%",
+        align_items="start",
+        padding_y="0.5em",
+        border_bottom="1px solid var(--gray-4)"
+    )
+
+
+def render_brand_swap_row(row: dict[str, str]):
+    return rx.table.row(
+        rx.table.cell(rx.vstack(
+            rx.text(row["step"], size="1", weight="bold"),
+            rx.text(row["role"], size="1", color="gray"),
+            spacing="0"
+        )),
+        rx.table.cell(rx.hstack(
+            rx.box(width="16px", height="16px", bg=row["from_color"], border_radius="3px", border="1px solid var(--gray-6)", flex_shrink="0"),
+            rx.text(row["from_name"], size="1"),
+            align_items="center",
+            spacing="2"
+        )),
+        rx.table.cell(rx.hstack(
+            rx.box(width="16px", height="16px", bg=row["to_color"], border_radius="3px", border="1px solid var(--gray-6)", flex_shrink="0"),
+            rx.text(row["to_name"], size="1"),
+            align_items="center",
+            spacing="2"
+        )),
+        rx.table.cell(rx.cond(
+            row["delta_e"],
+            rx.badge(
+                row["delta_e"],
+                size="1",
+                color_scheme=rx.match(row["quality"], ("close", "green"), ("fair", "amber"), "red")
+            ),
+            rx.text("kept", size="1", color="gray")
+        )),
+    )
+
+
+def render_brand_swap_modal():
+    return rx.dialog.root(
+        rx.dialog.content(
+            rx.dialog.title("Swap Brand"),
+            rx.dialog.description(
+                "Replace every paint with the closest paint of one brand, or of your own paints, and save the result as a new guide.",
+                size="2",
+                color="gray"
+            ),
+            rx.vstack(
+                rx.select(
+                    DashboardState.brand_swap_targets,
+                    placeholder="Choose a brand...",
+                    value=DashboardState.brand_swap_target,
+                    on_change=DashboardState.set_brand_swap_target,
+                    width="100%"
+                ),
+                rx.cond(
+                    DashboardState.is_brand_swap_loading,
+                    rx.center(rx.spinner(size="3"), width="100%", padding="2em"),
+                    rx.cond(
+                        DashboardState.brand_swap_rows.length() > 0,
+                        rx.vstack(
+                            rx.text(DashboardState.brand_swap_summary, size="1", color="gray"),
+                            rx.scroll_area(
+                                rx.table.root(
+                                    rx.table.header(rx.table.row(
+                                        rx.table.column_header_cell("Step"),
+                                        rx.table.column_header_cell("Original"),
+                                        rx.table.column_header_cell("Replacement"),
+                                        rx.table.column_header_cell("ΔE"),
+                                    )),
+                                    rx.table.body(rx.foreach(DashboardState.brand_swap_rows, render_brand_swap_row)),
+                                    size="1",
+                                    width="100%"
+                                ),
+                                max_height="360px",
+                                type="auto"
+                            ),
+                            rx.input(
+                                value=DashboardState.brand_swap_name,
+                                on_change=DashboardState.set_brand_swap_name,
+                                placeholder="New guide name",
+                                width="100%"
+                            ),
+                            width="100%",
+                            spacing="2"
+                        )
+                    )
+                ),
+                width="100%",
+                spacing="3",
+                margin_y="1em"
+            ),
+            rx.hstack(
+                rx.dialog.close(rx.button("Cancel", variant="soft", color_scheme="gray")),
+                rx.button(
+                    "Save as New Guide",
+                    on_click=DashboardState.save_brand_swap,
+                    loading=DashboardState.is_cloning_guide,
+                    disabled=DashboardState.brand_swap_rows.length() == 0
+                ),
+                justify="end",
+                width="100%",
+                spacing="2"
+            ),
+            max_width="700px"
+        ),
+        open=DashboardState.is_brand_swap_open,
+        on_open_change=DashboardState.set_is_brand_swap_open
+    )
+
+
+def render_share_modal():
+    return rx.dialog.root(
+        rx.dialog.content(
+            rx.dialog.title("Share Guide"),
+            rx.dialog.description(
+                "Anyone with the link can view this guide, read-only and without an account. The shared page updates when you save the guide.",
+                size="2",
+                color="gray"
+            ),
+            rx.cond(
+                DashboardState.is_sharing & (DashboardState.share_url == ""),
+                rx.center(rx.spinner(size="3"), width="100%", padding="2em"),
+                rx.cond(
+                    DashboardState.share_url != "",
+                    rx.vstack(
+                        rx.hstack(
+                            rx.input(value=DashboardState.share_url, read_only=True, width="100%"),
+                            rx.tooltip(
+                                rx.icon_button(
+                                    rx.icon("clipboard-copy", size=18),
+                                    on_click=[rx.set_clipboard(DashboardState.share_url), rx.toast("Link copied")],
+                                    variant="soft"
+                                ),
+                                content="Copy Link"
+                            ),
+                            rx.link(
+                                rx.icon_button(rx.icon("external-link", size=18), variant="soft"),
+                                href=DashboardState.share_url,
+                                is_external=True
+                            ),
+                            width="100%",
+                            spacing="2"
+                        ),
+                        rx.button(
+                            "Stop Sharing",
+                            on_click=DashboardState.stop_sharing,
+                            loading=DashboardState.is_sharing,
+                            color_scheme="red",
+                            variant="soft"
+                        ),
+                        width="100%",
+                        spacing="3",
+                        align_items="start"
+                    ),
+                    rx.button(
+                        rx.icon("link", size=16),
+                        "Create Share Link",
+                        on_click=DashboardState.create_share_link,
+                        loading=DashboardState.is_sharing
+                    )
+                )
+            ),
+            rx.hstack(
+                rx.dialog.close(rx.button("Close", variant="soft", color_scheme="gray")),
+                justify="end",
+                width="100%",
+                margin_top="1em"
+            ),
+            max_width="520px"
+        ),
+        open=DashboardState.is_share_open,
+        on_open_change=DashboardState.set_is_share_open
+    )
+
+
+def render_template_library_modal():
+    return rx.dialog.root(
+        rx.dialog.content(
+            rx.dialog.title("Template Library"),
+            rx.dialog.description(
+                "Start a guide from a shared template. Save your own guides here from their detail view.",
+                size="2",
+                color="gray"
+            ),
+            rx.cond(
+                DashboardState.guide_templates.length() > 0,
+                rx.scroll_area(
+                    rx.vstack(
+                        rx.foreach(
+                            DashboardState.guide_templates,
+                            lambda t: rx.hstack(
+                                rx.cond(
+                                    t.image_drive_id,
+                                    rx.image(src=guide_image_url(t.image_drive_id, 160), width="40px", height="40px", object_fit="cover", border_radius="4px", loading="lazy"),
+                                    rx.center(rx.icon("book-open", size=18, color="gray"), width="40px", height="40px")
+                                ),
+                                rx.vstack(
+                                    rx.text(t.name, weight="bold", size="2"),
+                                    rx.hstack(
+                                        rx.badge(t.guide_type, size="1", variant="soft"),
+                                        rx.text(f"{t.detail_count} Sections", size="1", color="gray"),
+                                        rx.cond(t.user_id == DashboardState.user["id"], rx.badge("Yours", size="1", color_scheme="violet")),
+                                        spacing="2",
+                                        align_items="center"
+                                    ),
+                                    spacing="1",
+                                    align_items="start"
+                                ),
+                                rx.spacer(),
+                                rx.cond(
+                                    t.user_id == DashboardState.user["id"],
+                                    rx.icon_button(
+                                        rx.icon("trash-2", size=14),
+                                        size="1",
+                                        variant="ghost",
+                                        color_scheme="red",
+                                        on_click=DashboardState.delete_template(t.id)
+                                    )
+                                ),
+                                rx.button(
+                                    "Use",
+                                    size="1",
+                                    on_click=DashboardState.use_template(t.id),
+                                    loading=DashboardState.is_cloning_guide
+                                ),
+                                width="100%",
+                                align_items="center",
+                                padding_y="0.5em",
+                                border_bottom="1px solid var(--gray-4)"
+                            )
+                        ),
+                        width="100%",
+                        spacing="0"
+                    ),
+                    max_height="400px",
+                    type="auto",
+                    margin_y="1em"
+                ),
+                rx.center(rx.text("No templates yet.", color="gray"), width="100%", padding="2em")
+            ),
+            rx.flex(
+                rx.dialog.close(rx.button("Close", variant="soft", color_scheme="gray")),
+                justify="end"
+            ),
+            max_width="600px"
+        ),
+        open=DashboardState.is_template_library_open,
+        on_open_change=DashboardState.set_is_template_library_open
+    )
+
+
+def render_shopping_list_modal():
+    return rx.dialog.root(
+        rx.dialog.content(
+            rx.dialog.title("Missing Paints"),
+            rx.dialog.description(
+                rx.cond(
+                    DashboardState.shopping_list_guide_count == 1,
+                    "Paints this guide uses that you do not own.",
+                    f"Paints your {DashboardState.shopping_list_guide_count} guides use that you do not own."
+                ),
+                size="2",
+                color="gray"
+            ),
+            rx.cond(
+                DashboardState.is_resolving_shopping_list,
+                rx.center(rx.spinner(size="3"), width="100%", padding="2em"),
+                rx.cond(
+                    DashboardState.shopping_list_items.length() > 0,
+                    rx.scroll_area(
+                        rx.vstack(
+                            rx.foreach(DashboardState.shopping_list_items, render_shopping_list_item),
+                            width="100%",
+                            spacing="0"
+                        ),
+                        max_height="400px",
+                        type="auto",
+                        margin_y="1em"
+                    ),
+                    rx.center(rx.text("✅ You own every paint these guides use.", color="gray"), width="100%", padding="2em")
+                )
+            ),
+            rx.hstack(
+                rx.dialog.close(rx.button("Close", variant="soft", color_scheme="gray")),
+                rx.button(
+                    rx.icon("shopping-cart", size=16),
+                    f"Add {DashboardState.shopping_list_addable_count} to Shopping List",
+                    on_click=DashboardState.add_missing_to_wishlist,
+                    disabled=DashboardState.shopping_list_addable_count == 0
+                ),
+                justify="end",
+                width="100%",
+                spacing="2"
+            ),
+            max_width="600px"
+        ),
+        open=DashboardState.is_shopping_list_open,
+        on_open_change=DashboardState.set_is_shopping_list_open
+    )
+
+
 def render_guide_detail_modal():
     return rx.dialog.root(
         rx.dialog.content(
@@ -3182,21 +4506,112 @@ def render_guide_detail_modal():
                             ),
                             content="Edit Guide"
                         ),
+                        rx.tooltip(
+                            rx.icon_button(
+                                rx.icon("shopping-cart", size=18),
+                                on_click=DashboardState.check_missing_paints(DashboardState.selected_guide.id),
+                                variant="soft",
+                                size="2"
+                            ),
+                            content="Missing Paints"
+                        ),
+                        rx.tooltip(
+                            rx.icon_button(
+                                rx.icon("copy", size=18),
+                                on_click=DashboardState.duplicate_guide(DashboardState.selected_guide.id, ""),
+                                loading=DashboardState.is_cloning_guide,
+                                variant="soft",
+                                size="2"
+                            ),
+                            content="Duplicate Guide"
+                        ),
+                        rx.tooltip(
+                            rx.icon_button(
+                                rx.icon("replace", size=18),
+                                on_click=DashboardState.open_brand_swap,
+                                variant="soft",
+                                size="2"
+                            ),
+                            content="Swap Brand"
+                        ),
+                        rx.tooltip(
+                            rx.icon_button(
+                                rx.icon("share-2", size=18),
+                                on_click=DashboardState.open_share_dialog,
+                                variant="soft",
+                                size="2"
+                            ),
+                            content="Share Link"
+                        ),
+                        rx.tooltip(
+                            rx.icon_button(
+                                rx.icon("library", size=18),
+                                on_click=DashboardState.save_guide_as_template(DashboardState.selected_guide.id),
+                                loading=DashboardState.is_cloning_guide,
+                                variant="soft",
+                                size="2"
+                            ),
+                            content="Save as Template"
+                        ),
                         width="100%",
                         align_items="center"
                     ),
                     rx.cond(
-                        DashboardState.selected_guide.image_drive_id,
+                        DashboardState.selected_guide_image,
                         rx.box(
+                            rx.image(
+                                src=guide_image_url(DashboardState.selected_guide_image, 1024),
+                                width="100%",
+                                max_height="400px",
+                                object_fit="contain",
+                                border_radius="8px",
+                                loading="lazy",
+                                margin_bottom="0.5em"
+                            ),
+                            # Gallery strip (only when the guide has more than the cover)
+                            rx.cond(
+                                DashboardState.selected_guide.image_drive_ids.length() > 1,
+                                rx.flex(
+                                    rx.foreach(
+                                        DashboardState.selected_guide.image_drive_ids,
+                                        lambda file_id: rx.image(
+                                            src=guide_image_url(file_id, 160),
+                                            width="64px",
+                                            height="64px",
+                                            object_fit="cover",
+                                            border_radius="6px",
+                                            loading="lazy",
+                                            cursor="pointer",
+                                            border=rx.cond(
+                                                DashboardState.selected_guide_image == file_id,
+                                                "2px solid var(--violet-9)",
+                                                "1px solid var(--gray-6)"
+                                            ),
+                                            on_click=DashboardState.set_selected_guide_image(file_id),
+                                        )
+                                    ),
+                                    wrap="wrap",
+                                    gap="0.5em",
+                                    margin_bottom="0.5em"
+                                )
+                            ),
+                            rx.cond(
+                                DashboardState.selected_guide_palette.length() > 0,
+                                rx.box(
+                                    render_palette_matches(DashboardState.selected_guide_palette),
+                                    margin_bottom="0.5em"
+                                )
+                            ),
                             rx.link(
                                 rx.button(
                                     rx.icon("external-link", size=16),
-                                    "View Reference Image on Google Drive",
+                                    "Open Full-Size Image",
                                     variant="soft",
                                     color_scheme="blue",
                                     width="100%"
                                 ),
-                                href=f"https://drive.google.com/file/d/{DashboardState.selected_guide.image_drive_id}/view?usp=sharing",
+                                # Through the proxy, so it works for every storage backend
+                                href=guide_image_url(DashboardState.selected_guide_image),
                                 is_external=True,
                                 width="100%"
                             ),
@@ -3206,6 +4621,10 @@ def render_guide_detail_modal():
                     rx.text(DashboardState.selected_guide.note, color="gray", white_space="pre-wrap"),
                     rx.divider(),
                     rx.heading("Painting Steps", size="4"),
+                    rx.cond(
+                        DashboardState.is_loading_guide,
+                        rx.center(rx.spinner(size="3"), width="100%", padding="2em")
+                    ),
                     rx.foreach(
                         DashboardState.selected_guide.guide_details,
                         lambda detail, idx: rx.box(
@@ -3300,8 +4719,8 @@ def render_guide_detail_modal():
 
 
 def render_detail_paint_row(detail: GuideDetail, label: str, role: str):
-    """Renders a row of paints for a specific role in detail view"""
-    return rx.foreach(
+    """Renders a row of paints for a specific role in detail view, plus their mix when there are several"""
+    return rx.fragment(rx.foreach(
         detail.guide_paints,
         lambda p: rx.cond(
             p.role == role,
@@ -3326,7 +4745,21 @@ def render_detail_paint_row(detail: GuideDetail, label: str, role: str):
             ),
             rx.fragment() 
         )
-    )
+    ), rx.cond(
+        detail.mix_previews.contains(role),
+        rx.hstack(
+            rx.text("Mixed", width="80px", size="1", color="gray"),
+            rx.box(width="20px", height="20px", bg=detail.mix_previews[role], border_radius="4px", border="1px solid #eee"),
+            rx.text("Predicted mix at these ratios", size="1", color="gray"),
+            rx.spacer(),
+            rx.text(detail.mix_previews[role], size="1", color="gray", font_family="monospace"),
+            width="100%",
+            align_items="center",
+            spacing="3",
+            padding="6px",
+            margin_bottom="4px"
+        )
+    ))
 
 
 def render_delete_confirmation_modal():
@@ -3375,7 +4808,16 @@ def render_settings_view():
                  rx.text("Connect your Google Drive to upload and manage reference images for your painting guides.", color="gray", size="2"),
                  rx.cond(
                      DashboardState.is_drive_connected,
-                     rx.button("Disconnect Drive", on_click=DashboardState.disconnect_drive, color_scheme="red", variant="outline"),
+                     rx.hstack(
+                         rx.button("Disconnect Drive", on_click=DashboardState.disconnect_drive, color_scheme="red", variant="outline"),
+                         rx.button(
+                             "Republish Guide Images",
+                             on_click=DashboardState.republish_guide_images,
+                             loading=DashboardState.is_republishing_images,
+                             variant="soft"
+                         ),
+                         spacing="2"
+                     ),
                      rx.button("Connect Google Drive", on_click=DashboardState.connect_drive, variant="solid")
                  ),
                  spacing="4",
@@ -3384,12 +4826,52 @@ def render_settings_view():
              width="100%",
              max_width="600px"
          ),
-         
+
+         render_export_card(),
+
          width="100%",
          spacing="4"
     )
 
 
+EXPORT_DATASETS = [
+    ("Owned Paints", "owned_paints"),
+    ("Custom Paints", "custom_paints"),
+    ("Shopping List", "wishlist"),
+    ("Print Batches", "batches"),
+    ("Painting Guides", "guides"),
+]
+
+def render_export_card():
+    """Data export card: one CSV / JSON Lines download per dataset"""
+    return rx.card(
+        rx.vstack(
+            rx.hstack(
+                rx.icon("download", size=24),
+                rx.heading("Export Your Data", size="4"),
+                width="100%",
+                align_items="center"
+            ),
+            rx.text("Download a backup of your data. CSV opens in spreadsheets and can be re-imported; JSON Lines keeps every field.", color="gray", size="2"),
+            *[
+                rx.hstack(
+                    rx.text(label, size="2", weight="medium"),
+                    rx.spacer(),
+                    rx.button("CSV", size="1", variant="soft", on_click=DashboardState.export_data(dataset, "csv")),
+                    rx.button("JSON Lines", size="1", variant="soft", on_click=DashboardState.export_data(dataset, "jsonl")),
+                    width="100%",
+                    align_items="center"
+                )
+                for label, dataset in EXPORT_DATASETS
+            ],
+            spacing="3",
+            width="100%"
+        ),
+        width="100%",
+        max_width="600px"
+    )
+
+
 # Sidebar functions moved to components/common/sidebar.py
 
 def dashboard_page():
@@ -1,5 +1,6 @@
 import reflex as rx
-from ..services.supabase import supabase
+from ..services.supabase import auth_client
+from ..state import BaseState
 import asyncio
 
 class LoginState(rx.State):
@@ -20,9 +21,13 @@ class LoginState(rx.State):
         yield
         
         try:
-            res = supabase.auth.sign_in_with_password({"email": self.email, "password": self.password})
-            if res.user:
+            res = auth_client().sign_in_with_password({"email": self.email, "password": self.password})
+            if res.user and res.session:
+                base = await self.get_state(BaseState)
+                base._set_session(res.session)
                 self.is_loading = False
+                # Drop the refresh token cookie older versions kept in the browser
+                yield rx.remove_cookie("mp_refresh_token")
                 yield rx.redirect("/dashboard")
             else:
                 self.error_msg = "Login failed."
@@ -1,5 +1,5 @@
 import reflex as rx
-from ..services.supabase import supabase, supabase_admin
+from ..services.supabase import auth_client, supabase_admin
 from ..state import BaseState 
 import asyncio
 
@@ -55,7 +55,7 @@ class RegistrationState(BaseState):
             
             # 3. Register User
             # Supabase Auth sign_up
-            auth_res = supabase.auth.sign_up({"email": self.email, "password": self.password})
+            auth_res = auth_client().sign_up({"email": self.email, "password": self.password})
             
             if auth_res.user:
                 # 4. Consume Token
@@ -1,7 +1,17 @@
 import os
+import json
+import time
+import random
+import threading
+import datetime
+import httplib2
+from collections import OrderedDict
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from google.auth.transport.requests import Request
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseUpload
 import io
 
@@ -20,6 +30,17 @@ CLIENT_CONFIG = {
 
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
+# Resumable upload settings
+CHUNK_GRANULARITY = 256 * 1024
+UPLOAD_CHUNK_SIZE = int(os.environ.get("DRIVE_UPLOAD_CHUNK_SIZE", 1024 * 1024))
+UPLOAD_MAX_RETRIES = int(os.environ.get("DRIVE_UPLOAD_MAX_RETRIES", 5))
+UPLOAD_MAX_BACKOFF = 32  # seconds
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+APP_FOLDER_NAME = "MiniPaintTracker"
+BATCH_LIMIT = 100  # Max calls per Drive batch request
+PUBLIC_PERMISSION = {'type': 'anyone', 'role': 'reader'}
+
 def get_auth_url(redirect_uri):
     """Generates the OAuth2 URL."""
     flow = Flow.from_client_config(
@@ -55,23 +76,147 @@ def get_drive_service(access_token, refresh_token=None):
         client_secret=os.environ.get("GOOGLE_CLIENT_SECRET"),
         scopes=SCOPES
     )
-    return build('drive', 'v3', credentials=creds)
+    return build_from_document(_get_drive_doc(), credentials=creds)
+
+# --- Per-user service cache ---
+# Refreshing a token is a network round trip, so refreshed credentials are
+# kept per user (LRU) and only refreshed shortly before they expire. Service
+# objects are built from the bundled discovery document, parsed once, and
+# kept per worker thread because httplib2 connections are not thread-safe.
+
+SERVICE_CACHE_SIZE = int(os.environ.get("DRIVE_SERVICE_CACHE_SIZE", 64))
+TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+_drive_doc = None
+_user_cache: OrderedDict = OrderedDict()  # user_id -> {"refresh_token", "creds", "lock", "local", "folder_id"}
+_user_cache_lock = threading.Lock()
+
+
+def _get_drive_doc() -> dict:
+    global _drive_doc
+    if _drive_doc is None:
+        _drive_doc = json.loads(discovery_cache.get_static_doc('drive', 'v3'))
+    return _drive_doc
+
+
+def _user_entry(user_id, refresh_token=None) -> dict:
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry and refresh_token and entry["refresh_token"] != refresh_token:
+            entry = None  # Reconnected with a new token
+        if entry is None:
+            if not refresh_token:
+                raise KeyError("Google Drive session expired. Please try again.")
+            entry = {
+                "refresh_token": refresh_token,
+                "creds": Credentials(
+                    None,
+                    refresh_token=refresh_token,
+                    token_uri="https://oauth2.googleapis.com/token",
+                    client_id=os.environ.get("GOOGLE_CLIENT_ID"),
+                    client_secret=os.environ.get("GOOGLE_CLIENT_SECRET"),
+                    scopes=SCOPES
+                ),
+                "lock": threading.Lock(),
+                "local": threading.local(),
+            }
+            _user_cache[user_id] = entry
+        _user_cache.move_to_end(user_id)
+        while len(_user_cache) > SERVICE_CACHE_SIZE:
+            _user_cache.popitem(last=False)
+        return entry
+
+
+def has_cached_service(user_id) -> bool:
+    """True if Drive credentials for this user are cached (no user_settings read needed)."""
+    with _user_cache_lock:
+        return user_id in _user_cache
+
+
+def forget_user(user_id):
+    """Drops cached credentials, e.g. after the user disconnects or reconnects Drive."""
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+
+def get_user_drive_service(user_id, refresh_token=None):
+    """
+    Cached Drive service for a user, safe to call from worker threads.
+
+    refresh_token may be omitted when has_cached_service(user_id) is true.
+    """
+    entry = _user_entry(user_id, refresh_token)
+    creds = entry["creds"]
+    with entry["lock"]:
+        expiring = creds.expiry is None or creds.expiry - datetime.datetime.utcnow() < TOKEN_REFRESH_MARGIN
+        if not creds.token or expiring:
+            try:
+                creds.refresh(Request())
+            except Exception:
+                forget_user(user_id)  # Revoked/invalid token: re-read user_settings next time
+                raise
+    service = getattr(entry["local"], "service", None)
+    if service is None:
+        service = build_from_document(_get_drive_doc(), credentials=creds)
+        entry["local"].service = service
+    return service
 
-def upload_file(service, file_data, filename, folder_id=None, mime_type='image/jpeg'):
-    """Uploads a file to Drive."""
+def _retry_delay(attempt: int) -> float:
+    """Exponential backoff with jitter: ~1s, 2s, 4s ... capped at UPLOAD_MAX_BACKOFF."""
+    return min(UPLOAD_MAX_BACKOFF, 2 ** attempt) * (0.5 + random.random() / 2)
+
+def upload_file(service, file_data, filename, folder_id=None, mime_type='image/jpeg',
+                chunk_size=None, progress=None):
+    """
+    Uploads a file to Drive in resumable chunks.
+
+    Each chunk is retried with exponential backoff on transient errors
+    (network failures, 429/5xx); the resumable session continues where the
+    server left off, so sent bytes are never re-sent. progress(sent, total)
+    is called after every chunk.
+    """
     file_metadata = {'name': filename}
     if folder_id:
         file_metadata['parents'] = [folder_id]
 
-    media = MediaIoBaseUpload(io.BytesIO(file_data), mimetype=mime_type, resumable=True)
+    chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+    # Drive requires chunks in multiples of 256 KB
+    chunk_size = max(CHUNK_GRANULARITY, chunk_size // CHUNK_GRANULARITY * CHUNK_GRANULARITY)
+    media = MediaIoBaseUpload(io.BytesIO(file_data), mimetype=mime_type, chunksize=chunk_size, resumable=True)
     
-    file = service.files().create(
+    request = service.files().create(
         body=file_metadata,
         media_body=media,
         fields='id, webContentLink, webViewLink'
-    ).execute()
-    
-    return file
+    )
+
+    total = len(file_data)
+    response = None
+    failures = 0
+    while response is None:
+        try:
+            status, response = request.next_chunk()
+        except HttpError as e:
+            if e.resp.status not in RETRYABLE_STATUS or failures >= UPLOAD_MAX_RETRIES:
+                raise
+            failures += 1
+            print(f"Drive upload chunk failed ({e.resp.status}), retry {failures}/{UPLOAD_MAX_RETRIES}")
+            time.sleep(_retry_delay(failures))
+            continue
+        except (OSError, httplib2.HttpLib2Error) as e:
+            if failures >= UPLOAD_MAX_RETRIES:
+                raise
+            failures += 1
+            print(f"Drive upload chunk failed ({e}), retry {failures}/{UPLOAD_MAX_RETRIES}")
+            time.sleep(_retry_delay(failures))
+            continue
+        failures = 0
+        if status and progress:
+            progress(status.resumable_progress, total)
+
+    if progress:
+        progress(total, total)
+    return response
 
 def create_folder(service, folder_name, parent_id=None):
     """Creates a folder and returns its ID."""
@@ -87,12 +232,56 @@ def create_folder(service, folder_name, parent_id=None):
 
 def set_file_public(service, file_id):
     """Sets the file permission to anyone with link (reader)."""
-    user_permission = {
-        'type': 'anyone',
-        'role': 'reader',
-    }
     service.permissions().create(
         fileId=file_id,
-        body=user_permission,
+        body=PUBLIC_PERMISSION,
         fields='id',
     ).execute()
+
+def set_files_public(service, file_ids):
+    """
+    Sets "anyone with link" read access on many files using batch requests
+    (up to BATCH_LIMIT calls per HTTP request).
+
+    Returns {"published": [ids], "failed": {id: error message}}.
+    """
+    published, failed = [], {}
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            failed[request_id] = str(exception)
+        else:
+            published.append(request_id)
+
+    for start in range(0, len(file_ids), BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=on_response)
+        for file_id in file_ids[start:start + BATCH_LIMIT]:
+            batch.add(
+                service.permissions().create(fileId=file_id, body=PUBLIC_PERMISSION, fields='id'),
+                request_id=file_id,
+            )
+        batch.execute()
+    return {"published": published, "failed": failed}
+
+def create_public_folder(service, folder_name=APP_FOLDER_NAME):
+    """
+    Creates the app folder with "anyone with link" read access.
+
+    Files uploaded into it inherit the permission, so uploads need no
+    separate permissions call.
+    """
+    folder_id = create_folder(service, folder_name)
+    set_file_public(service, folder_id)
+    return folder_id
+
+def get_cached_folder(user_id):
+    """The user's app folder id if known in-process (avoids a user_settings read)."""
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        return entry.get("folder_id") if entry else None
+
+def remember_folder(user_id, folder_id):
+    with _user_cache_lock:
+        entry = _user_cache.get(user_id)
+        if entry:
+            entry["folder_id"] = folder_id
@@ -0,0 +1,230 @@
+"""
+Streaming export of a user's data (CSV or JSON Lines).
+
+Rows are read with keyset pagination on `id` and encoded page by page, so
+memory use stays at one page regardless of account size. The HTTP routes
+live in `api.py`; the dashboard hands out short-lived single-use tickets so
+the download URL never carries the user's JWT.
+"""
+import csv
+import io
+import json
+import secrets
+import time
+
+EXPORT_PAGE_SIZE = 500
+TICKET_TTL_SECONDS = 120
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+
+# Tickets are kept in-process: the app runs as a single backend instance
+_tickets: dict[str, dict] = {}
+
+
+class ExportError(Exception):
+    """Raised for unknown datasets/formats or invalid tickets"""
+    pass
+
+
+def issue_ticket(user_id: str, access_token: str, dataset: str, fmt: str) -> str:
+    """Creates a single-use ticket authorising one export download."""
+    validate_request(dataset, fmt)
+    now = time.time()
+    for key in [k for k, t in _tickets.items() if t["expires_at"] < now]:
+        _tickets.pop(key, None)
+    ticket = secrets.token_urlsafe(24)
+    _tickets[ticket] = {
+        "user_id": user_id,
+        "access_token": access_token,
+        "dataset": dataset,
+        "format": fmt,
+        "expires_at": now + TICKET_TTL_SECONDS,
+    }
+    return ticket
+
+
+def redeem_ticket(ticket: str, dataset: str, fmt: str) -> dict:
+    """Consumes a ticket; raises ExportError if it is unknown, expired or for another export."""
+    entry = _tickets.pop(ticket, None)
+    if not entry or entry["expires_at"] < time.time():
+        raise ExportError("Export link expired. Please start the export again.")
+    if entry["dataset"] != dataset or entry["format"] != fmt:
+        raise ExportError("Export link does not match the requested export.")
+    return entry
+
+
+def validate_request(dataset: str, fmt: str):
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown dataset '{dataset}'")
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown format '{fmt}'")
+
+
+# --- Row flattening (CSV) ---
+
+def _paint_columns(paint: dict | None) -> dict:
+    paint = paint or {}
+    brand = paint.get("paint_brands") or {}
+    paint_set = paint.get("paint_sets") or {}
+    return {
+        "brand": brand.get("name", ""),
+        "name": paint.get("name", ""),
+        "code": paint.get("product_code") or "",
+        "hex": paint.get("color_hex") or "",
+        "set": paint_set.get("name", ""),
+    }
+
+
+def _custom_columns(paint: dict | None) -> dict:
+    paint = paint or {}
+    return {
+        "brand": paint.get("brand_name") or "",
+        "name": paint.get("name", ""),
+        "code": paint.get("product_code") or "",
+        "hex": paint.get("color_hex") or "",
+        "set": paint.get("set_name") or "",
+    }
+
+
+def _flatten_owned(record: dict) -> list[dict]:
+    return [{**_paint_columns(record.get("catalog_paints")), "added_at": record.get("created_at", "")}]
+
+
+def _flatten_custom(record: dict) -> list[dict]:
+    return [{**_custom_columns(record), "added_at": record.get("created_at", "")}]
+
+
+def _flatten_wishlist(record: dict) -> list[dict]:
+    if record.get("custom_paints"):
+        row = {**_custom_columns(record["custom_paints"]), "source": "custom"}
+    else:
+        row = {**_paint_columns(record.get("catalog_paints")), "source": "catalog"}
+    return [{**row, "added_at": record.get("created_at", "")}]
+
+
+def _flatten_batch(record: dict) -> list[dict]:
+    base = {
+        "batch": record.get("name", ""),
+        "tag": record.get("tag") or "",
+        "due_date": record.get("due_date") or "",
+        "is_archived": record.get("is_archived", False),
+    }
+    rows = []
+    jobs = record.get("print_jobs") or []
+    for job_no, job in enumerate(jobs, start=1):
+        job_cols = {"job": job_no, "job_status": job.get("status", "")}
+        items = job.get("print_job_items") or [{}]
+        for item in items:
+            rows.append({
+                **base, **job_cols,
+                "item": item.get("name", ""),
+                "quantity": item.get("quantity", ""),
+                "link_url": item.get("link_url") or "",
+            })
+    # Reprints are not tied to a job; they get rows of their own
+    for reprint in record.get("batch_reprints") or []:
+        rows.append({
+            **base, "job": "reprint",
+            "item": reprint.get("name", ""),
+            "quantity": reprint.get("quantity", ""),
+        })
+    return rows or [base]
+
+
+def _flatten_guide(record: dict) -> list[dict]:
+    base = {"guide": record.get("name", ""), "guide_type": record.get("guide_type", "")}
+    rows = []
+    details = sorted(record.get("guide_details") or [], key=lambda d: d.get("order_index", 0))
+    for step_no, detail in enumerate(details, start=1):
+        step = {"step": step_no, "part": detail.get("name", ""), "category": detail.get("category") or ""}
+        paints = sorted(detail.get("guide_paints") or [], key=lambda p: p.get("order_index", 0)) or [{}]
+        for paint in paints:
+            rows.append({
+                **base, **step,
+                "paint": paint.get("paint_name", ""),
+                "hex": paint.get("paint_color_hex") or "",
+                "role": paint.get("role") or "",
+                "ratio": paint.get("ratio", ""),
+                "note": paint.get("note") or "",
+            })
+    return rows or [base]
+
+
+_PAINT_SELECT = "name, product_code, color_hex, paint_sets(name), paint_brands(name)"
+
+DATASETS = {
+    "owned_paints": {
+        "table": "user_paints",
+        "select": f"id, created_at, catalog_paints({_PAINT_SELECT})",
+        "columns": ["brand", "name", "code", "hex", "set", "added_at"],
+        "flatten": _flatten_owned,
+    },
+    "custom_paints": {
+        "table": "custom_paints",
+        "select": "id, name, brand_name, set_name, product_code, color_hex, created_at",
+        "columns": ["brand", "name", "code", "hex", "set", "added_at"],
+        "flatten": _flatten_custom,
+    },
+    "wishlist": {
+        "table": "paint_wishlist",
+        "select": f"id, created_at, catalog_paints({_PAINT_SELECT}), "
+                  "custom_paints(name, brand_name, set_name, product_code, color_hex)",
+        "columns": ["brand", "name", "code", "hex", "set", "source", "added_at"],
+        "flatten": _flatten_wishlist,
+    },
+    "batches": {
+        "table": "batches",
+        "select": "id, name, tag, due_date, is_archived, created_at, "
+                  "print_jobs(name, status, started_at, print_job_items(name, quantity, link_url)), "
+                  "batch_reprints(name, quantity, created_at)",
+        "columns": ["batch", "tag", "due_date", "is_archived", "job", "job_status", "item", "quantity", "link_url"],
+        "flatten": _flatten_batch,
+    },
+    "guides": {
+        "table": "painting_guides",
+        "select": "id, name, note, guide_type, is_airbrush, is_slapchop, slapchop_note, image_drive_id, image_drive_ids, image_palettes, created_at, "
+                  "guide_details(name, description, category, order_index, "
+                  "guide_paints(paint_name, paint_color_hex, paint_id, role, ratio, note, order_index))",
+        "columns": ["guide", "guide_type", "step", "part", "category", "paint", "hex", "role", "ratio", "note"],
+        "flatten": _flatten_guide,
+    },
+}
+
+
+def iter_pages(client, dataset: str, user_id: str):
+    """Yields lists of records for one user, EXPORT_PAGE_SIZE at a time (keyset on id)."""
+    spec = DATASETS[dataset]
+    last_id = None
+    while True:
+        query = client.table(spec["table"]).select(spec["select"]).eq("user_id", user_id)
+        if last_id:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(EXPORT_PAGE_SIZE).execute().data
+        if page:
+            yield page
+        if len(page) < EXPORT_PAGE_SIZE:
+            return
+        last_id = page[-1]["id"]
+
+
+def stream_export(client, dataset: str, user_id: str, fmt: str):
+    """Generator of encoded chunks (one per page) for a StreamingResponse."""
+    spec = DATASETS[dataset]
+    if fmt == "jsonl":
+        for page in iter_pages(client, dataset, user_id):
+            yield "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in page).encode("utf-8")
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=spec["columns"], extrasaction="ignore")
+    writer.writeheader()
+    for page in iter_pages(client, dataset, user_id):
+        for record in page:
+            writer.writerows(spec["flatten"](record))
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
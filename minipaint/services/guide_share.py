@@ -0,0 +1,251 @@
+"""
+Public read-only guide links.
+
+Sharing a guide stores a denormalised JSON snapshot of it in guide_shares
+(migration 13) under a random token, and every save rewrites the
+snapshot. The /api/share routes in api.py serve the snapshot as JSON or
+as a small static HTML page: no Reflex session, and no snapshot read per
+view. Snapshots and their rendered pages are kept in an in-process LRU.
+Saves and unshares on this instance invalidate it at once; other instances
+re-check a cached entry's updated_at (migration 14, one tiny RPC) once it
+is SHARE_REVALIDATE_SECONDS old, so a stopped share or deleted guide stops
+being served everywhere within that window.
+"""
+import hashlib
+import html
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from .guide_transform import role_label
+from .supabase import client_for_token
+from ..utils.color import normalize_hex
+
+SHARE_CACHE_SIZE = 512
+SHARE_REVALIDATE_SECONDS = int(os.environ.get("SHARE_REVALIDATE_SECONDS", 5))
+SHARE_MISS_TTL_SECONDS = 30  # Unknown tokens are not looked up again for this long
+SNAPSHOT_VERSION = 1
+
+TOKEN_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+# Display order of paint slots within a step, as in the guide detail view
+FIXED_ROLES_BEFORE = ("base", "contrast")
+FIXED_ROLES_AFTER = ("highlight", "edge", "shade", "drybrush")
+ROLE_TITLES = {"shade": "Shade/Wash"}
+
+_cache: OrderedDict[str, dict] = OrderedDict()
+_lock = threading.Lock()
+
+
+def is_valid_token(token: str) -> bool:
+    return bool(token and TOKEN_PATTERN.match(token))
+
+
+def _role_sort_key(role: str) -> tuple:
+    if role in FIXED_ROLES_BEFORE:
+        return (0, FIXED_ROLES_BEFORE.index(role))
+    if role.startswith("layer_") and role[6:].isdigit():
+        return (1, int(role[6:]))
+    if role in FIXED_ROLES_AFTER:
+        return (2, FIXED_ROLES_AFTER.index(role))
+    return (3, role)
+
+
+def build_snapshot(guide, primer_name: str = "") -> dict:
+    """Everything the share page shows, flattened into plain JSON (no ids of other rows)."""
+    steps = []
+    for detail in guide.guide_details:
+        slots: dict[str, list[dict]] = {}
+        for p in detail.guide_paints:
+            slots.setdefault(p.role or "", []).append({
+                "name": p.paint_name,
+                "color": normalize_hex(p.paint_color_hex) or "",
+                "ratio": p.ratio,
+                "note": p.note or "",
+            })
+        steps.append({
+            "name": detail.name,
+            "description": detail.description or "",
+            "category": detail.category or "",
+            "slots": [
+                {
+                    "role": role,
+                    "label": ROLE_TITLES.get(role) or role_label(role) or "Paints",
+                    "paints": paints,
+                    "mix": detail.mix_previews.get(role, ""),
+                }
+                for role, paints in sorted(slots.items(), key=lambda item: _role_sort_key(item[0]))
+            ],
+        })
+    return {
+        "version": SNAPSHOT_VERSION,
+        "name": guide.name,
+        "note": guide.note or "",
+        "guide_type": guide.guide_type,
+        "primer": primer_name,
+        "is_airbrush": guide.is_airbrush,
+        "is_slapchop": guide.is_slapchop,
+        "slapchop_note": guide.slapchop_note or "",
+        "images": list(guide.image_drive_ids or ([guide.image_drive_id] if guide.image_drive_id else [])),
+        "steps": steps,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def share_token_for(client, guide_id: str) -> str | None:
+    res = client.table("guide_shares").select("token").eq("guide_id", guide_id).execute()
+    return res.data[0]["token"] if res.data else None
+
+
+def publish(client, guide, primer_name: str = "") -> str:
+    """Shares a guide (or refreshes an existing share); returns the token."""
+    snapshot = build_snapshot(guide, primer_name)
+    token = share_token_for(client, guide.id)
+    if token:
+        client.table("guide_shares").update({
+            "snapshot": snapshot, "updated_at": snapshot["generated_at"]
+        }).eq("token", token).execute()
+        invalidate(token)
+        return token
+    token = secrets.token_urlsafe(16)
+    client.table("guide_shares").insert({
+        "token": token, "guide_id": guide.id, "snapshot": snapshot, "updated_at": snapshot["generated_at"]
+    }).execute()
+    return token
+
+
+def refresh(client, guide, primer_name: str = ""):
+    """Rewrites the snapshot of a shared guide after a save; no-op for unshared guides."""
+    snapshot = build_snapshot(guide, primer_name)
+    res = client.table("guide_shares").update({
+        "snapshot": snapshot, "updated_at": snapshot["generated_at"]
+    }).eq("guide_id", guide.id).execute()
+    for row in res.data:
+        invalidate(row["token"])
+
+
+def unpublish(client, guide_id: str):
+    res = client.table("guide_shares").delete().eq("guide_id", guide_id).execute()
+    for row in res.data:
+        invalidate(row["token"])
+
+
+def invalidate(token: str):
+    with _lock:
+        _cache.pop(token, None)
+
+
+def _is_current(token: str, share: dict) -> bool:
+    """Whether a cached share still matches its row (not changed, unshared or deleted)."""
+    res = client_for_token("").rpc("get_shared_guide_version", {"share_token": token}).execute()
+    return bool(res.data) and res.data[0]["updated_at"] == share["updated_at"]
+
+
+def get_shared(token: str) -> dict | None:
+    """
+    Cached share: snapshot, etag, last_modified and (once rendered) the HTML; None if unknown.
+
+    Blocking on a miss (one anonymous RPC) or a re-check; call it off the event loop.
+    """
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(token)
+        if entry:
+            _cache.move_to_end(token)
+    if entry and entry["expires_at"] > now:
+        return entry["share"]
+    if entry and entry["share"] and _is_current(token, entry["share"]):
+        with _lock:
+            entry["expires_at"] = now + SHARE_REVALIDATE_SECONDS
+        return entry["share"]
+
+    res = client_for_token("").rpc("get_shared_guide", {"share_token": token}).execute()
+    share = None
+    if res.data:
+        row = res.data[0]
+        digest = hashlib.sha256(f"{token}:{row['updated_at']}".encode()).hexdigest()[:32]
+        share = {"snapshot": row["snapshot"], "etag": f'"{digest}"', "updated_at": row["updated_at"]}
+        try:
+            share["last_modified"] = format_datetime(datetime.fromisoformat(row["updated_at"]), usegmt=True)
+        except (TypeError, ValueError):
+            pass
+    ttl = SHARE_REVALIDATE_SECONDS if share else SHARE_MISS_TTL_SECONDS
+    with _lock:
+        _cache[token] = {"share": share, "expires_at": now + ttl}
+        _cache.move_to_end(token)
+        while len(_cache) > SHARE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return share
+
+
+def _swatch(color: str, size: int = 18) -> str:
+    color = normalize_hex(color)
+    if not color:
+        return ""
+    return (f'<span class="swatch" style="background:{color};width:{size}px;height:{size}px" '
+            f'title="{color}"></span>')
+
+
+def render_page(share: dict) -> str:
+    """Static HTML for a share; rendered once per snapshot and kept with the cache entry."""
+    if "html" in share:
+        return share["html"]
+    s = share["snapshot"]
+    e = html.escape
+
+    images = "".join(
+        f'<img src="/api/image_proxy/{e(file_id)}?w=1024" alt="" loading="lazy">'
+        for file_id in s.get("images", [])
+    )
+    meta = [e(str(s.get("guide_type") or "").capitalize())]
+    if s.get("primer"):
+        meta.append(f"Primer: {e(s['primer'])}")
+    if s.get("is_airbrush"):
+        meta.append("Airbrush")
+    if s.get("is_slapchop"):
+        meta.append("Slapchop" + (f" ({e(s['slapchop_note'])})" if s.get("slapchop_note") else ""))
+
+    steps = []
+    for step in s.get("steps", []):
+        slots = []
+        for slot in step.get("slots", []):
+            paints = []
+            for p in slot["paints"]:
+                note = f"<em>{e(p['note'])}</em>" if p.get("note") else ""
+                ratio = f"<b>x{int(p['ratio'])}</b>" if len(slot["paints"]) > 1 else ""
+                paints.append(f"<li>{_swatch(p['color'])}<span>{e(p['name'])}</span>{note}{ratio}</li>")
+            mix = f'<li class="mix">{_swatch(slot["mix"])}<span>Mixed</span></li>' if slot.get("mix") else ""
+            slots.append(f'<div class="slot"><h4>{e(slot["label"])}</h4><ul>{"".join(paints)}{mix}</ul></div>')
+        category = f' <small>{e(step["category"])}</small>' if step.get("category") else ""
+        description = f'<p>{e(step["description"])}</p>' if step.get("description") else ""
+        steps.append(f'<section><h3>{e(step["name"])}{category}</h3>{description}{"".join(slots)}</section>')
+
+    page = f"""<!doctype html>
+<html lang="en"><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{e(s.get("name", "Painting Guide"))}</title>
+<style>
+body{{font-family:system-ui,sans-serif;max-width:760px;margin:0 auto;padding:1.5em;color:#222;background:#fafafa}}
+h1{{margin-bottom:.2em}} .meta{{color:#777;margin-top:0}} .note{{white-space:pre-wrap;color:#555}}
+.gallery{{display:flex;flex-wrap:wrap;gap:.5em;margin:1em 0}} .gallery img{{max-width:100%;max-height:360px;border-radius:8px}}
+section{{background:#fff;border:1px solid #e5e5e5;border-radius:8px;padding:1em;margin:1em 0}}
+h3{{color:#6e56cf;margin:0 0 .4em}} h3 small{{color:#999;font-weight:normal;font-size:.7em}}
+h4{{margin:.6em 0 .2em;font-size:.8em;color:#777;text-transform:uppercase}}
+ul{{list-style:none;padding:0;margin:0}} li{{display:flex;align-items:center;gap:.5em;padding:.2em 0}}
+li em{{color:#888;font-size:.85em}} li b{{margin-left:auto;color:#777;font-weight:normal}} li.mix span{{color:#888;font-style:italic}}
+.swatch{{display:inline-block;border-radius:4px;border:1px solid #ddd;flex-shrink:0}}
+footer{{color:#aaa;font-size:.8em;margin-top:2em}}
+</style></head><body>
+<h1>{e(s.get("name", ""))}</h1>
+<p class="meta">{" · ".join(m for m in meta if m)}</p>
+{f'<p class="note">{e(s["note"])}</p>' if s.get("note") else ""}
+{f'<div class="gallery">{images}</div>' if images else ""}
+{"".join(steps)}
+<footer>Shared read-only from MiniPaint</footer>
+</body></html>"""
+    share["html"] = page
+    return page
@@ -0,0 +1,73 @@
+"""
+Brand swap: a guide with every paint replaced by the closest paint of one
+brand, or of the user's own paints.
+
+All paints of a guide are matched with a single nearest-colour query
+against a cached index from paint_index. The preview lists delta E per
+substitution; paint_overrides() turns it into the map
+clone_painting_guide applies while copying the guide (migration 12).
+"""
+OWNED_TARGET = "My Paints"  # Target meaning the user's owned + custom paints
+CLOSE_DELTA_E = 5.0  # Below this the swap is hard to tell apart on a model
+FAIR_DELTA_E = 12.0  # Noticeably different, but the same colour family
+
+
+def role_label(role: str | None) -> str:
+    """'layer_1' -> 'Layer 2', 'shade' -> 'Shade'."""
+    if not role:
+        return ""
+    if role.startswith("layer_") and role[6:].isdigit():
+        return f"Layer {int(role[6:]) + 1}"
+    return role.capitalize()
+
+
+def swap_preview(guide, target_index) -> list[dict[str, str]]:
+    """
+    One row per guide paint: the original, its replacement and the delta E.
+
+    Paints without a usable colour (or an empty target) keep the original
+    paint and get quality "none".
+    """
+    slots = [(d, p) for d in guide.guide_details for p in d.guide_paints]
+    if not slots:
+        return []
+    indices, dists = target_index.colors.nearest([p.paint_color_hex for _, p in slots], k=1)
+
+    rows = []
+    for (detail, paint), idx, dist in zip(slots, indices[:, 0], dists[:, 0]):
+        entry = target_index.entries[idx] if idx >= 0 else None
+        if entry is None:
+            quality = "none"
+        elif dist < CLOSE_DELTA_E:
+            quality = "close"
+        elif dist < FAIR_DELTA_E:
+            quality = "fair"
+        else:
+            quality = "far"
+        rows.append({
+            "guide_paint_id": paint.id,
+            "step": detail.name,
+            "role": role_label(paint.role),
+            "from_name": paint.paint_name,
+            "from_color": paint.paint_color_hex or "",
+            "to_name": entry["name"] if entry else paint.paint_name,
+            "to_color": entry["color"] if entry else (paint.paint_color_hex or ""),
+            "to_paint_id": (entry["paint_id"] or "") if entry else "",
+            "to_brand": entry["brand"] if entry else "",
+            "delta_e": f"{dist:.1f}" if entry else "",
+            "quality": quality,
+        })
+    return rows
+
+
+def paint_overrides(rows: list[dict[str, str]]) -> dict[str, dict]:
+    """guide_paints.id -> replacement columns, for clone_painting_guide's paint_overrides."""
+    return {
+        row["guide_paint_id"]: {
+            "paint_name": row["to_name"],
+            "paint_color_hex": row["to_color"],
+            "paint_id": row["to_paint_id"] or None,
+        }
+        for row in rows
+        if row["quality"] != "none" and row["guide_paint_id"]
+    }
@@ -0,0 +1,405 @@
+"""
+Disk cache and shared HTTP client for the Google Drive image proxy.
+
+Drive file ids are immutable (re-uploading an image creates a new id), so a
+cached copy never needs revalidating upstream. Entries are evicted least
+recently used once the cache grows past IMAGE_CACHE_MAX_BYTES.
+
+Misses are streamed to the client chunk by chunk while being written to a
+temp file, so memory per request stays at one chunk regardless of image size.
+Images kept on this host by the local storage backend bypass the cache and
+are served from the storage directory (see image_storage.py).
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+
+import httpx
+
+from . import image_storage
+from ..utils.image_validator import RENDITION_WIDTHS, make_renditions
+
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", ".image_cache")
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024)) # 0 disables caching
+IMAGE_PROXY_MAX_BYTES = int(os.environ.get("IMAGE_PROXY_MAX_BYTES", 20 * 1024 * 1024))
+IMAGE_PROXY_TIMEOUT = httpx.Timeout(float(os.environ.get("IMAGE_PROXY_TIMEOUT_SECONDS", 15)), connect=5.0)
+STREAM_CHUNK_SIZE = 64 * 1024
+RENDITION_CONTENT_TYPE = "image/webp"
+
+# Drive ids are URL-safe base64-ish (storage ids are prefixed hex); anything else never reaches the filesystem
+FILE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{10,128}$")
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for upstream image fetches (created lazily on the running loop)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=IMAGE_PROXY_TIMEOUT,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=10),
+        )
+    return _http_client
+
+
+def is_valid_file_id(file_id: str) -> bool:
+    return bool(file_id and FILE_ID_PATTERN.match(file_id))
+
+
+class DiskLRUCache:
+    """
+    Size-bounded file cache: one data file plus one JSON metadata file per key.
+
+    The LRU order lives in memory and is rebuilt from file access times on
+    startup, so the cache survives restarts.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        # Upload workers write renditions from other threads
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _data_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self):
+        found = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                # Left over from a stream interrupted by a restart
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+                continue
+            if not name.endswith(".bin"):
+                continue
+            key = name[:-4]
+            try:
+                stat = os.stat(self._data_path(key))
+            except OSError:
+                continue
+            if os.path.exists(self._meta_path(key)):
+                found.append((stat.st_atime, key, stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._size += size
+
+    def get(self, key: str) -> dict | None:
+        """Returns the metadata (with 'path') for a cached key and marks it recently used."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            try:
+                with open(self._meta_path(key), "r") as f:
+                    meta = json.load(f)
+                os.utime(self._data_path(key))
+            except (OSError, ValueError):
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+        meta["path"] = self._data_path(key)
+        return meta
+
+    def temp_path(self, key: str) -> str:
+        """Unique scratch file for streaming a new entry in; pass it to commit()."""
+        return os.path.join(self.directory, f"{key}.{secrets.token_hex(4)}.tmp")
+
+    def commit(self, key: str, tmp_path: str, content_type: str, etag: str,
+               last_modified: str | None = None) -> dict:
+        """Moves a fully written temp file into the cache, evicting old entries as needed."""
+        size = os.path.getsize(tmp_path)
+        meta = {
+            "content_type": content_type,
+            "etag": etag,
+            "last_modified": last_modified or formatdate(time.time(), usegmt=True),
+            "size": size,
+        }
+        with self._lock:
+            os.replace(tmp_path, self._data_path(key))
+            with open(self._meta_path(key), "w") as f:
+                json.dump(meta, f)
+
+            if key in self._entries:
+                self._size -= self._entries.pop(key)
+            self._entries[key] = size
+            self._size += size
+            self._evict()
+        meta["path"] = self._data_path(key)
+        return meta
+
+    def _drop(self, key: str):
+        self._size -= self._entries.pop(key, 0)
+        for path in (self._data_path(key), self._meta_path(key)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+
+
+_cache: DiskLRUCache | None = None
+_inflight: dict[str, asyncio.Future] = {}
+
+
+def get_cache() -> DiskLRUCache:
+    global _cache
+    if _cache is None:
+        _cache = DiskLRUCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
+    return _cache
+
+
+def _release(file_id: str, done: asyncio.Future):
+    if _inflight.get(file_id) is done:
+        _inflight.pop(file_id, None)
+
+
+async def _finish(file_id: str, upstream: httpx.Response, done: asyncio.Future, entry: dict | None = None):
+    """Closes the upstream response and releases coalesced waiters; safe to call more than once."""
+    await upstream.aclose()
+    if not done.done():
+        done.set_result(entry)
+    _release(file_id, done)
+
+
+class ImageTooLarge(Exception):
+    """Raised when an upstream image exceeds IMAGE_PROXY_MAX_BYTES"""
+    pass
+
+
+async def _tee_stream(file_id: str, upstream: httpx.Response, meta: dict, done: asyncio.Future):
+    """
+    Yields the upstream body in chunks while writing it to a temp file.
+
+    The temp file only enters the cache when the whole body arrived; on any
+    error or client disconnect it is discarded. `done` is resolved either way
+    so coalesced requests stop waiting.
+    """
+    cache = get_cache() if IMAGE_CACHE_MAX_BYTES > 0 else None
+    tmp_path = cache.temp_path(file_id) if cache else None
+    tmp_file = open(tmp_path, "wb") if tmp_path else None
+    digest = hashlib.sha1()
+    received = 0
+    entry = None
+    try:
+        async for chunk in upstream.aiter_bytes(STREAM_CHUNK_SIZE):
+            received += len(chunk)
+            if received > IMAGE_PROXY_MAX_BYTES:
+                raise ImageTooLarge(f"Image {file_id} exceeds {IMAGE_PROXY_MAX_BYTES} bytes")
+            if tmp_file:
+                tmp_file.write(chunk)
+                digest.update(chunk)
+            yield chunk
+        if tmp_file:
+            tmp_file.close()
+            tmp_file = None
+            entry = cache.commit(
+                file_id, tmp_path, meta["content_type"],
+                etag=meta["etag"] or f'"{digest.hexdigest()}"',
+                last_modified=meta["last_modified"],
+            )
+    except Exception as e:
+        print(f"Proxy stream error for {file_id}: {e}")
+        raise
+    finally:
+        if tmp_file:
+            tmp_file.close()
+        if tmp_path and entry is None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        await _finish(file_id, upstream, done, entry)
+
+
+async def open_image(file_id: str) -> dict:
+    """
+    Resolves a guide image to something the proxy route can send.
+
+    Returns one of:
+      - cache metadata with 'path' (serve the file),
+      - {'stream': async iterator, 'close': coroutine function, 'content_type', 'etag',
+        'last_modified', 'size'} for a miss being fetched by this request. The caller
+        must await close() once done with the stream, even if it never iterated it
+        (e.g. the client disconnected first), or the upstream connection stays open,
+      - {'status': code} when the upstream answered with an error or the image is too large.
+
+    Concurrent misses for the same id wait for the first request's stream to
+    land in the cache instead of fetching again.
+    """
+    storage = image_storage.storage_for_id(file_id)
+    if storage.serves_files:
+        return storage.open(file_id) or {"status": 404}
+
+    cache = get_cache() if IMAGE_CACHE_MAX_BYTES > 0 else None
+    if cache:
+        cached = cache.get(file_id)
+        if cached:
+            return cached
+
+        pending = _inflight.get(file_id)
+        if pending:
+            try:
+                entry = await asyncio.wait_for(asyncio.shield(pending), IMAGE_PROXY_TIMEOUT.read * 2)
+            except asyncio.TimeoutError:
+                entry = None
+            if entry:
+                return cache.get(file_id) or entry
+
+    done = asyncio.get_running_loop().create_future()
+    if cache:
+        _inflight[file_id] = done
+    try:
+        client = get_http_client()
+        request = client.build_request("GET", storage.source_url(file_id))
+        upstream = await client.send(request, stream=True)
+    except Exception:
+        done.set_result(None)
+        _release(file_id, done)
+        raise
+
+    size = upstream.headers.get("content-length")
+    status = None
+    if upstream.status_code != 200:
+        print(f"Failed to fetch image {file_id}: {upstream.status_code}")
+        status = upstream.status_code
+    elif size and size.isdigit() and int(size) > IMAGE_PROXY_MAX_BYTES:
+        print(f"Image {file_id} too large for proxy: {size} bytes")
+        status = 413
+    if status:
+        await upstream.aclose()
+        done.set_result(None)
+        _release(file_id, done)
+        return {"status": status}
+
+    meta = {
+        "content_type": upstream.headers.get("content-type", "image/jpeg"),
+        "etag": upstream.headers.get("etag"),
+        "last_modified": upstream.headers.get("last-modified"),
+        "size": int(size) if size and size.isdigit() else None,
+    }
+    return {
+        **meta,
+        "stream": _tee_stream(file_id, upstream, meta, done),
+        "close": functools.partial(_finish, file_id, upstream, done),
+    }
+
+
+# --- Renditions ---
+# Downscaled WebP copies live in the same cache under "<file_id>-w<width>".
+# They are written at upload time and rebuilt from the original on a miss.
+
+def rendition_key(file_id: str, width: int) -> str:
+    return f"{file_id}-w{width}"
+
+
+def pick_rendition_width(requested: int) -> int | None:
+    """Smallest rendition covering the requested width, or None when only the original does."""
+    for width in sorted(RENDITION_WIDTHS):
+        if width >= requested:
+            return width
+    return None
+
+
+def _store_bytes(key: str, data: bytes, content_type: str) -> dict:
+    cache = get_cache()
+    tmp_path = cache.temp_path(key)
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    return cache.commit(key, tmp_path, content_type, etag=f'"{hashlib.sha1(data).hexdigest()}"')
+
+
+def store_renditions(file_id: str, file_data: bytes, content_type: str):
+    """Caches a freshly uploaded image and its renditions so views never wait on Drive for it."""
+    if IMAGE_CACHE_MAX_BYTES <= 0 or not is_valid_file_id(file_id):
+        return
+    if not image_storage.storage_for_id(file_id).serves_files:
+        _store_bytes(file_id, file_data, content_type)
+    for width, data in make_renditions(file_data).items():
+        _store_bytes(rendition_key(file_id, width), data, RENDITION_CONTENT_TYPE)
+
+
+def _build_renditions(file_id: str, original_path: str):
+    """Reads the cached original and stores all its renditions (blocking; run in a worker thread)."""
+    with open(original_path, "rb") as f:
+        file_data = f.read()
+    for size, data in make_renditions(file_data).items():
+        _store_bytes(rendition_key(file_id, size), data, RENDITION_CONTENT_TYPE)
+
+
+async def open_rendition(file_id: str, requested_width: int) -> dict:
+    """
+    Like open_image(), but for the smallest rendition covering requested_width.
+
+    Missing renditions are generated from the (cached) original in a worker
+    thread. Concurrent misses for the same image wait for that one build
+    instead of decoding it again. Falls back to the original when no
+    smaller size exists.
+    """
+    width = pick_rendition_width(requested_width)
+    if width is None or IMAGE_CACHE_MAX_BYTES <= 0:
+        return await open_image(file_id)
+
+    cache = get_cache()
+    key = rendition_key(file_id, width)
+    cached = cache.get(key)
+    if cached:
+        return cached
+
+    pending = _inflight.get(key)
+    if pending:
+        try:
+            await asyncio.wait_for(asyncio.shield(pending), IMAGE_PROXY_TIMEOUT.read * 2)
+        except asyncio.TimeoutError:
+            pass
+        cached = cache.get(key)
+        if cached:
+            return cached
+
+    # One build writes every width, so it is registered under all of them
+    done = asyncio.get_running_loop().create_future()
+    keys = [rendition_key(file_id, size) for size in RENDITION_WIDTHS]
+    for k in keys:
+        _inflight.setdefault(k, done)
+    try:
+        original = await open_image(file_id)
+        if "stream" in original:
+            # Drain the miss into the cache; nothing is sent to the client from it
+            try:
+                async for _ in original["stream"]:
+                    pass
+            finally:
+                await original["close"]()
+            original = cache.get(file_id) or {"status": 502}
+        if "path" not in original:
+            return original
+
+        await asyncio.to_thread(_build_renditions, file_id, original["path"])
+        return cache.get(key) or cache.get(file_id) or original
+    finally:
+        if not done.done():
+            done.set_result(None)
+        for k in keys:
+            _release(k, done)
@@ -0,0 +1,194 @@
+"""
+Pluggable storage backends for guide images.
+
+IMAGE_STORAGE_BACKEND selects where new uploads go:
+  - "drive" (default): the user's Google Drive app folder (see upload_worker)
+  - "local": content-addressed files under IMAGE_STORAGE_DIR, served by the
+    image proxy straight from disk
+  - "s3": an S3-compatible bucket (AWS, R2, MinIO, ...), needs boto3
+
+Ids written by the local and S3 backends carry a prefix Drive ids never
+have ("local-<sha256>", "s3-<sha256>"), so images uploaded before a backend
+switch keep resolving to the backend that stored them.
+"""
+import hashlib
+from abc import ABC, abstractmethod
+import json
+import os
+import secrets
+from email.utils import formatdate
+
+IMAGE_STORAGE_BACKEND = os.environ.get("IMAGE_STORAGE_BACKEND", "drive").lower()
+IMAGE_STORAGE_DIR = os.environ.get("IMAGE_STORAGE_DIR", "image_storage")
+
+S3_BUCKET = os.environ.get("S3_BUCKET", "")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL") or None # None = AWS
+S3_REGION = os.environ.get("S3_REGION") or None
+S3_KEY_PREFIX = os.environ.get("S3_KEY_PREFIX", "guide-images/")
+S3_PUBLIC_URL = os.environ.get("S3_PUBLIC_URL", "").rstrip("/") # Public bucket/CDN base; presigned URLs otherwise
+S3_PRESIGN_SECONDS = 300
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DRIVE_VIEW_URL = "https://drive.google.com/uc?export=view&id={file_id}"
+
+
+class ImageStorageError(Exception):
+    """Raised when the image storage backend is misconfigured or unavailable"""
+    pass
+
+
+class ImageStorage(ABC):
+    """
+    Interface of a storage backend (abstract: a backend missing a method
+    fails when it is created, not on first use).
+
+    `save()` stores processed image bytes and returns the id kept in
+    painting_guides. Backends holding the bytes on this host set
+    `serves_files` and answer `open()`; remote ones give the proxy a
+    `source_url()` to fetch from.
+    """
+    name = ""
+    prefix = ""
+    needs_drive = False
+    serves_files = False
+
+    @abstractmethod
+    def save(self, data: bytes, mime_type: str) -> str:
+        ...
+
+    def open(self, file_id: str) -> dict | None:
+        return None
+
+    @abstractmethod
+    def source_url(self, file_id: str) -> str:
+        ...
+
+
+class DriveStorage(ImageStorage):
+    """
+    Google Drive. Uploads need the user's Drive service and app folder, so
+    they stay in upload_worker; this backend only resolves ids for the proxy.
+    """
+    name = "drive"
+    needs_drive = True
+
+    def save(self, data: bytes, mime_type: str) -> str:
+        raise ImageStorageError("Drive uploads go through upload_worker.process_guide_image")
+
+    def source_url(self, file_id: str) -> str:
+        return DRIVE_VIEW_URL.format(file_id=file_id)
+
+
+class LocalStorage(ImageStorage):
+    """
+    Content-addressed files on local disk: <dir>/<aa>/<sha256> plus a JSON
+    sidecar with the content type. Identical uploads are stored once.
+    """
+    name = "local"
+    prefix = "local-"
+    serves_files = True
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _data_path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def save(self, data: bytes, mime_type: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._data_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(f"{path}.json", "w") as f:
+                json.dump({"content_type": mime_type}, f)
+            # Write then rename, so a reader never sees a partial file
+            tmp_path = f"{path}.{secrets.token_hex(4)}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return f"{self.prefix}{digest}"
+
+    def source_url(self, file_id: str) -> str:
+        raise ImageStorageError("Local images are served from disk, not fetched")
+
+    def open(self, file_id: str) -> dict | None:
+        """Metadata with 'path' in the shape image_cache entries use, or None if missing."""
+        digest = file_id[len(self.prefix):]
+        path = self._data_path(digest)
+        try:
+            stat = os.stat(path)
+            with open(f"{path}.json", "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return {
+            "path": path,
+            "content_type": meta.get("content_type", "application/octet-stream"),
+            "etag": f'"{digest}"',
+            "last_modified": formatdate(stat.st_mtime, usegmt=True),
+            "size": stat.st_size,
+        }
+
+
+class S3Storage(ImageStorage):
+    """S3-compatible bucket; objects are keyed by content hash under S3_KEY_PREFIX."""
+    name = "s3"
+    prefix = "s3-"
+
+    def __init__(self):
+        if not S3_BUCKET:
+            raise ImageStorageError("S3_BUCKET is not set")
+        try:
+            import boto3
+        except ImportError:
+            raise ImageStorageError("IMAGE_STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+        # Credentials come from the usual AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY variables
+        self._client = boto3.client("s3", endpoint_url=S3_ENDPOINT_URL, region_name=S3_REGION)
+
+    def _key(self, file_id: str) -> str:
+        return f"{S3_KEY_PREFIX}{file_id[len(self.prefix):]}"
+
+    def save(self, data: bytes, mime_type: str) -> str:
+        file_id = f"{self.prefix}{hashlib.sha256(data).hexdigest()}"
+        self._client.put_object(
+            Bucket=S3_BUCKET, Key=self._key(file_id), Body=data,
+            ContentType=mime_type, CacheControl=IMMUTABLE_CACHE_CONTROL,
+        )
+        return file_id
+
+    def source_url(self, file_id: str) -> str:
+        if S3_PUBLIC_URL:
+            return f"{S3_PUBLIC_URL}/{self._key(file_id)}"
+        return self._client.generate_presigned_url(
+            "get_object", Params={"Bucket": S3_BUCKET, "Key": self._key(file_id)}, ExpiresIn=S3_PRESIGN_SECONDS
+        )
+
+
+_BACKENDS = {"drive": DriveStorage, "local": lambda: LocalStorage(IMAGE_STORAGE_DIR), "s3": S3Storage}
+_instances: dict[str, ImageStorage] = {}
+
+
+def _backend(name: str) -> ImageStorage:
+    if name not in _instances:
+        if name not in _BACKENDS:
+            raise ImageStorageError(f"Unknown IMAGE_STORAGE_BACKEND '{name}' (use drive, local or s3)")
+        _instances[name] = _BACKENDS[name]()
+    return _instances[name]
+
+
+def get_storage() -> ImageStorage:
+    """The backend new uploads are written to."""
+    return _backend(IMAGE_STORAGE_BACKEND)
+
+
+def storage_for_id(file_id: str) -> ImageStorage:
+    """The backend holding an existing image, whatever the current setting."""
+    for backend in (LocalStorage, S3Storage):
+        if file_id.startswith(backend.prefix):
+            return _backend(backend.name)
+    return _backend(DriveStorage.name)
+
+
+def is_drive_id(file_id: str | None) -> bool:
+    return bool(file_id) and not file_id.startswith((LocalStorage.prefix, S3Storage.prefix))
@@ -0,0 +1,329 @@
+"""
+Bulk import of a paint collection from CSV (or another tracker's export).
+
+Rows are resolved against `catalog_paints` in three passes per brand:
+exact product code, normalised name, then nearest colour. Everything that
+touches the database is batched: one keyset-paginated catalog read for all
+brands in the file and chunked inserts for the results.
+"""
+import csv
+import io
+import re
+import unicodedata
+
+import numpy as np
+
+from ..utils.color import ColorIndex, hex_list_to_lab, normalize_hex
+
+MAX_IMPORT_BYTES = 2 * 1024 * 1024  # 2MB of CSV is tens of thousands of rows
+CATALOG_PAGE_SIZE = 1000  # PostgREST default max rows per request
+WRITE_CHUNK_SIZE = 500
+COLOR_MATCH_MAX_DELTA_E = 3.0  # Below this two swatches look the same
+SUGGESTION_COUNT = 3
+IMPORT_PREVIEW_LIMIT = 200  # Ambiguous rows sent to the UI for review
+
+# Header aliases seen in other trackers' exports, all compared normalised
+COLUMN_ALIASES = {
+    "brand": {"brand", "brandname", "manufacturer", "maker", "company"},
+    "name": {"name", "paint", "paintname", "colourname", "colorname", "title"},
+    "code": {"code", "productcode", "sku", "ref", "reference", "itemcode"},
+    "hex": {"hex", "hexcode", "colour", "color", "colourhex", "colorhex", "rgbhex", "swatch"},
+    "set": {"set", "setname", "range", "line", "series", "productline"},
+}
+
+
+class PaintImportError(Exception):
+    """Raised when an import file cannot be read"""
+    pass
+
+
+def normalize_text(value: str | None) -> str:
+    """Lowercase, accent-free, alphanumeric-only form used for name matching."""
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKD", str(value))
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    return re.sub(r"[^0-9a-z]+", "", value.lower())
+
+
+def normalize_code(value: str | None) -> str:
+    """Product codes differ only in punctuation between sources (70.950 / 70-950)."""
+    code = normalize_text(value)
+    return "" if code in ("", "null", "none", "na") else code
+
+
+def parse_inventory_csv(file_data: bytes) -> list[dict]:
+    """
+    Parses CSV bytes into rows of {row, brand, name, code, hex, set}.
+
+    The delimiter is sniffed (comma, semicolon, tab) and headers are mapped
+    through COLUMN_ALIASES so exports from other tools load unchanged.
+
+    Raises:
+        PaintImportError: If the file is empty, too large or has no name column
+    """
+    if not file_data:
+        raise PaintImportError("Empty file")
+    if len(file_data) > MAX_IMPORT_BYTES:
+        raise PaintImportError(f"File too large (max {MAX_IMPORT_BYTES // 1024 // 1024}MB)")
+
+    text = file_data.decode("utf-8-sig", errors="replace")
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(io.StringIO(text), dialect)
+
+    header = next(reader, None)
+    if not header:
+        raise PaintImportError("Missing header row")
+
+    columns = {}
+    for idx, raw in enumerate(header):
+        key = normalize_text(raw)
+        for field, aliases in COLUMN_ALIASES.items():
+            if key in aliases and field not in columns:
+                columns[field] = idx
+                break
+    if "name" not in columns and "code" not in columns:
+        raise PaintImportError("CSV needs at least a 'name' or 'code' column")
+
+    rows = []
+    for line_no, record in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in record):
+            continue
+        row = {"row": line_no}
+        for field in COLUMN_ALIASES:
+            idx = columns.get(field)
+            row[field] = record[idx].strip() if idx is not None and idx < len(record) else ""
+        row["hex"] = normalize_hex(row["hex"]) or ""
+        rows.append(row)
+    return rows
+
+
+def fetch_brands(client) -> list[dict]:
+    """Loads all paint brands (a few dozen rows)."""
+    return client.table("paint_brands").select("id, name, slug").execute().data
+
+
+def fetch_catalog_for_brands(client, brand_ids: list[str]) -> list[dict]:
+    """Loads every catalog paint for the given brands using keyset pagination."""
+    if not brand_ids:
+        return []
+    paints = []
+    last_id = None
+    while True:
+        query = client.table("catalog_paints").select(
+            "id, name, product_code, color_hex, brand_id, paint_sets(name)"
+        ).in_("brand_id", brand_ids)
+        if last_id:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(CATALOG_PAGE_SIZE).execute().data
+        paints.extend(page)
+        if len(page) < CATALOG_PAGE_SIZE:
+            return paints
+        last_id = page[-1]["id"]
+
+
+def match_brands(rows: list[dict], brands: list[dict]) -> dict[str, dict]:
+    """Maps each normalised brand string found in rows to a catalog brand."""
+    by_key = {}
+    for b in brands:
+        by_key[normalize_text(b.get("name"))] = b
+        if b.get("slug"):
+            by_key.setdefault(normalize_text(b["slug"]), b)
+    return {
+        key: by_key[key]
+        for key in {normalize_text(r["brand"]) for r in rows}
+        if key in by_key
+    }
+
+
+def _describe(paint: dict, distance: float | None = None) -> dict:
+    """Compact catalog paint entry for the preview report."""
+    sets = paint.get("paint_sets") or {}
+    return {
+        "id": paint["id"],
+        "name": paint["name"],
+        "product_code": paint.get("product_code") or "",
+        "color_hex": paint.get("color_hex") or "",
+        "set_name": sets.get("name") or "",
+        "delta_e": round(float(distance), 1) if distance is not None else None,
+    }
+
+
+def resolve_rows(rows: list[dict], brand_map: dict[str, dict], catalog: list[dict]) -> dict:
+    """
+    Resolves parsed rows against the catalog.
+
+    Returns a plan dict:
+        matched:   [{row, paint, method}] - confident catalog matches
+        ambiguous: [{row, suggestions, reason}] - best guesses, needs review
+        custom:    [row] - no catalog brand/paint, imported as custom paints
+        skipped:   [{row, reason}]
+    """
+    # Per-brand lookup tables, built once so each row is a dict hit
+    by_brand: dict[str, list[dict]] = {}
+    by_code: dict[tuple[str, str], list[dict]] = {}
+    by_name: dict[tuple[str, str], list[dict]] = {}
+    for paint in catalog:
+        brand_id = paint["brand_id"]
+        by_brand.setdefault(brand_id, []).append(paint)
+        code = normalize_code(paint.get("product_code"))
+        if code:
+            by_code.setdefault((brand_id, code), []).append(paint)
+        by_name.setdefault((brand_id, normalize_text(paint["name"])), []).append(paint)
+
+    plan = {"matched": [], "ambiguous": [], "custom": [], "skipped": []}
+    colour_queue: dict[str, list[tuple[dict, list[dict] | None]]] = {}
+
+    for row in rows:
+        if not row["name"] and not row["code"]:
+            plan["skipped"].append({"row": row, "reason": "No name or code"})
+            continue
+
+        brand = brand_map.get(normalize_text(row["brand"]))
+        if not brand or brand["id"] not in by_brand:
+            if row["name"]:
+                plan["custom"].append(row)
+            else:
+                plan["skipped"].append({"row": row, "reason": "Unknown brand and no name"})
+            continue
+        brand_id = brand["id"]
+
+        # 1. Exact product code
+        code = normalize_code(row["code"])
+        hits = by_code.get((brand_id, code), []) if code else []
+        if len(hits) == 1:
+            plan["matched"].append({"row": row, "paint": _describe(hits[0]), "method": "code"})
+            continue
+
+        # 2. Normalised name (same name can exist in several sets of one brand)
+        name = normalize_text(row["name"])
+        hits = by_name.get((brand_id, name), []) if name else []
+        if len(hits) == 1:
+            plan["matched"].append({"row": row, "paint": _describe(hits[0]), "method": "name"})
+            continue
+
+        # 3. Colour - either to split a name tie or as the last resort
+        colour_queue.setdefault(brand_id, []).append((row, hits or None))
+
+    for brand_id, queued in colour_queue.items():
+        _resolve_by_colour(plan, by_brand[brand_id], queued)
+
+    plan["matched"].sort(key=lambda m: m["row"]["row"])
+    plan["ambiguous"].sort(key=lambda m: m["row"]["row"])
+    return plan
+
+
+def _rank_candidates(index: ColorIndex, hex_str: str, candidates: list[dict], position: dict) -> list[tuple[dict, float | None]]:
+    """Orders candidate paints by colour distance to hex_str (input order if no hex)."""
+    if not hex_str:
+        return [(p, None) for p in candidates]
+    dists = index.distances(hex_list_to_lab([hex_str]))[0]
+    ranked = [(p, float(dists[position[p["id"]]])) for p in candidates]
+    ranked.sort(key=lambda pd: pd[1])
+    return [(p, d if np.isfinite(d) else None) for p, d in ranked]
+
+
+def _resolve_by_colour(plan: dict, paints: list[dict], queued: list[tuple[dict, list[dict] | None]]):
+    """Matches all queued rows of one brand against its colour index in one pass."""
+    index = ColorIndex([p.get("color_hex") for p in paints])
+    position = {p["id"]: i for i, p in enumerate(paints)}
+    indices, dists = index.nearest([row["hex"] for row, _ in queued], k=SUGGESTION_COUNT)
+
+    for (row, name_hits), idx_row, dist_row in zip(queued, indices, dists):
+        if name_hits:
+            # Several same-named paints: rank just those by colour
+            ranked = _rank_candidates(index, row["hex"], name_hits, position)
+            best, best_d = ranked[0]
+            if best_d is not None and best_d <= COLOR_MATCH_MAX_DELTA_E:
+                plan["matched"].append({"row": row, "paint": _describe(best, best_d), "method": "name+colour"})
+            else:
+                plan["ambiguous"].append({
+                    "row": row,
+                    "suggestions": [_describe(p, d) for p, d in ranked[:SUGGESTION_COUNT]],
+                    "reason": f"{len(name_hits)} paints share this name",
+                })
+            continue
+
+        found = [(paints[i], d) for i, d in zip(idx_row, dist_row) if i >= 0]
+        if not found:
+            plan["custom"].append(row)
+        elif found[0][1] <= COLOR_MATCH_MAX_DELTA_E:
+            plan["matched"].append({"row": row, "paint": _describe(*found[0]), "method": "colour"})
+        else:
+            plan["ambiguous"].append({
+                "row": row,
+                "suggestions": [_describe(p, d) for p, d in found],
+                "reason": f"Closest colour is ΔE {found[0][1]:.1f}",
+            })
+
+
+def build_import_plan(client, file_data: bytes) -> dict:
+    """Parses a CSV and resolves it against the catalog with two bulk reads."""
+    rows = parse_inventory_csv(file_data)
+    brand_map = match_brands(rows, fetch_brands(client))
+    catalog = fetch_catalog_for_brands(client, sorted({b["id"] for b in brand_map.values()}))
+    plan = resolve_rows(rows, brand_map, catalog)
+    plan["total"] = len(rows)
+    return plan
+
+
+def _chunks(items: list, size: int = WRITE_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def commit_import(client, user_id: str, plan: dict, accept_suggestions: bool = True,
+                  existing_custom: list[dict] | None = None) -> dict:
+    """
+    Writes a resolved plan in batches.
+
+    Catalog matches (and the top suggestion of ambiguous rows when
+    accept_suggestions is set) go to `user_paints`; everything else with a
+    name becomes a `custom_paints` row. Paints the user already owns are
+    left alone.
+
+    Returns:
+        {"owned": int, "custom": int} - number of rows sent for insert
+    """
+    paint_ids = [m["paint"]["id"] for m in plan["matched"]]
+    custom_rows = list(plan["custom"])
+    for amb in plan["ambiguous"]:
+        if accept_suggestions and amb["suggestions"]:
+            paint_ids.append(amb["suggestions"][0]["id"])
+        elif amb["row"]["name"]:
+            custom_rows.append(amb["row"])
+
+    owned_payload = [
+        {"user_id": user_id, "paint_id": pid}
+        for pid in dict.fromkeys(paint_ids)
+    ]
+    for chunk in _chunks(owned_payload):
+        client.table("user_paints").upsert(
+            chunk, on_conflict="user_id,paint_id", ignore_duplicates=True
+        ).execute()
+
+    seen = {
+        (normalize_text(c.get("brand_name")), normalize_text(c.get("name")))
+        for c in (existing_custom or [])
+    }
+    custom_payload = []
+    for row in custom_rows:
+        key = (normalize_text(row["brand"]), normalize_text(row["name"]))
+        if key in seen:
+            continue
+        seen.add(key)
+        custom_payload.append({
+            "user_id": user_id,
+            "name": row["name"],
+            "brand_name": row["brand"],
+            "set_name": row.get("set", ""),
+            "product_code": row["code"] if normalize_code(row["code"]) else "",
+            "color_hex": row["hex"] or "#cccccc",
+        })
+    for chunk in _chunks(custom_payload):
+        client.table("custom_paints").insert(chunk).execute()
+
+    return {"owned": len(owned_payload), "custom": len(custom_payload)}
@@ -0,0 +1,163 @@
+"""
+Search indexes behind the guide paint picker.
+
+The catalog index is shared by every user: the catalog changes rarely, so
+it is read once (keyset-paginated) and kept for CATALOG_INDEX_TTL_SECONDS.
+Per-brand indexes (for brand swaps) are sliced from it on first use.
+Each user's owned + custom paints get a small index of their own, rebuilt
+only when that list changes.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .paint_import import CATALOG_PAGE_SIZE
+from ..utils.paint_search import PaintSearchIndex, TIER_COLOR
+
+CATALOG_INDEX_TTL_SECONDS = int(os.environ.get("CATALOG_INDEX_TTL_SECONDS", 3600))
+USER_INDEX_CACHE_SIZE = 256
+SEARCH_LIMIT = 50
+SOURCE_RANK = {"owned": 0, "custom": 1, "catalog": 2}
+
+_lock = threading.Lock()
+_catalog_lock = threading.Lock()  # Held during the catalog read, separate from user lookups
+_catalog_index: PaintSearchIndex | None = None
+_catalog_built_at = 0.0
+_user_indexes: OrderedDict[str, tuple[int, PaintSearchIndex]] = OrderedDict()
+_brand_indexes: dict[str, tuple[PaintSearchIndex, PaintSearchIndex]] = {}  # brand -> (catalog it came from, index)
+
+
+def fetch_catalog(client) -> list[dict]:
+    """Loads every catalog paint as a search entry."""
+    entries = []
+    last_id = None
+    while True:
+        query = client.table("catalog_paints").select(
+            "id, name, product_code, color_hex, paint_brands(name)"
+        )
+        if last_id:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(CATALOG_PAGE_SIZE).execute().data
+        entries.extend({
+            "paint_id": p["id"],
+            "name": p["name"],
+            "code": p.get("product_code"),
+            "color": p.get("color_hex") or "",
+            "brand": (p.get("paint_brands") or {}).get("name", ""),
+            "source": "catalog",
+        } for p in page)
+        if len(page) < CATALOG_PAGE_SIZE:
+            return entries
+        last_id = page[-1]["id"]
+
+
+def get_catalog_index(client) -> PaintSearchIndex:
+    """The shared catalog index, rebuilt after the TTL (one builder at a time)."""
+    global _catalog_index, _catalog_built_at
+    with _catalog_lock:
+        if _catalog_index is None or time.monotonic() - _catalog_built_at > CATALOG_INDEX_TTL_SECONDS:
+            _catalog_index = PaintSearchIndex(fetch_catalog(client))
+            _catalog_built_at = time.monotonic()
+        return _catalog_index
+
+
+def get_brand_index(client, brand: str) -> PaintSearchIndex:
+    """Index of one brand's catalog paints, rebuilt with the catalog index."""
+    catalog = get_catalog_index(client)
+    with _lock:
+        cached = _brand_indexes.get(brand)
+        if cached and cached[0] is catalog:
+            return cached[1]
+    index = PaintSearchIndex([e for e in catalog.entries if e["brand"] == brand])
+    with _lock:
+        _brand_indexes[brand] = (catalog, index)
+    return index
+
+
+def user_entries(owned_paints: list[dict], custom_paints: list[dict]) -> list[dict]:
+    """Search entries for a user's owned catalog paints followed by their custom paints."""
+    entries = []
+    for p in owned_paints:
+        paint = p.get("catalog_paints") or {}
+        entries.append({
+            "paint_id": p.get("paint_id"),
+            "name": paint.get("name", ""),
+            "code": paint.get("product_code"),
+            "color": paint.get("color_hex") or "",
+            "brand": (paint.get("paint_brands") or {}).get("name", ""),
+            "source": "owned",
+        })
+    for c in custom_paints:
+        entries.append({
+            "paint_id": None,  # guide_paints.paint_id only references catalog paints
+            "name": c.get("name", ""),
+            "code": c.get("product_code"),
+            "color": c.get("color_hex") or "",
+            "brand": c.get("brand_name") or "",
+            "source": "custom",
+        })
+    return entries
+
+
+def get_user_index(user_id: str, owned_paints: list[dict], custom_paints: list[dict]) -> PaintSearchIndex:
+    """The user's index, reused while their owned/custom paints are unchanged."""
+    entries = user_entries(owned_paints, custom_paints)
+    fingerprint = hash(tuple((e["source"], e["paint_id"], e["name"], e["color"]) for e in entries))
+    with _lock:
+        cached = _user_indexes.get(user_id)
+        if cached and cached[0] == fingerprint:
+            _user_indexes.move_to_end(user_id)
+            return cached[1]
+    index = PaintSearchIndex(entries)
+    with _lock:
+        _user_indexes[user_id] = (fingerprint, index)
+        _user_indexes.move_to_end(user_id)
+        while len(_user_indexes) > USER_INDEX_CACHE_SIZE:
+            _user_indexes.popitem(last=False)
+    return index
+
+
+def _result(entry: dict, tier: int, score: float) -> dict:
+    return {
+        "name": entry["name"],
+        "id": entry["paint_id"] or "",
+        "color": entry["color"],
+        "brand": entry["brand"],
+        "source": entry["source"],
+        "detail": f"ΔE {score:.1f}" if tier == TIER_COLOR else "",
+    }
+
+
+def search_paints(user_index: PaintSearchIndex, catalog_index: PaintSearchIndex | None,
+                  query: str, limit: int = SEARCH_LIMIT) -> list[dict]:
+    """
+    Ranked picker results from the user's paints and, optionally, the catalog.
+
+    Text matches rank by tier, then owned before custom before catalog;
+    colour matches rank by delta E. Catalog paints the user owns are
+    not listed twice. An empty query lists the user's paints in order.
+    """
+    if not query.strip():
+        return [_result(e, -1, 0.0) for e in user_index.entries[:limit]]
+
+    ranked = []
+    for index in (user_index, catalog_index):
+        if index is None:
+            continue
+        for tier, score, pos in index.search(query, limit):
+            entry = index.entries[pos]
+            rank = SOURCE_RANK[entry["source"]]
+            key = (tier, score, rank) if tier == TIER_COLOR else (tier, rank, score)
+            ranked.append((key, entry, tier, score))
+    ranked.sort(key=lambda item: item[0])
+
+    owned_ids = {e["paint_id"] for e in user_index.entries if e["paint_id"]}
+    results = []
+    for _, entry, tier, score in ranked:
+        if entry["source"] == "catalog" and entry["paint_id"] in owned_ids:
+            continue
+        results.append(_result(entry, tier, score))
+        if len(results) >= limit:
+            break
+    return results
@@ -0,0 +1,147 @@
+"""
+Shopping list for painting guides: which of their paints the user lacks.
+
+Guide paints (and primers) linked to catalog paints are collected for any
+number of guides, the user's owned paint ids are subtracted as a set, and
+every missing paint gets its closest owned or custom paint as a
+substitute from one nearest-colour query. Missing paints go into
+`paint_wishlist` with a single insert.
+"""
+from .paint_import import CATALOG_PAGE_SIZE, WRITE_CHUNK_SIZE
+
+ID_CHUNK_SIZE = 100  # Ids per in_() filter, keeps request URLs short
+SUBSTITUTE_MAX_DELTA_E = 15.0  # Beyond this an owned paint is no stand-in
+
+
+def _chunks(values: list, size: int = ID_CHUNK_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def fetch_guide_paints(client, guide_ids: list[str]) -> list[dict]:
+    """
+    Catalog-linked paints of the given guides as {guide_id, paint_id, name, color}.
+
+    Primers are included with an empty name and colour; resolve_missing
+    takes those from the catalog.
+    """
+    rows = []
+    for chunk in _chunks(guide_ids):
+        last_id = None
+        while True:
+            query = client.table("guide_paints").select(
+                "id, paint_id, paint_name, paint_color_hex, guide_details!inner(guide_id)"
+            ).in_("guide_details.guide_id", chunk).not_.is_("paint_id", "null")
+            if last_id:
+                query = query.gt("id", last_id)
+            page = query.order("id").limit(CATALOG_PAGE_SIZE).execute().data
+            rows.extend({
+                "guide_id": p["guide_details"]["guide_id"],
+                "paint_id": p["paint_id"],
+                "name": p.get("paint_name") or "",
+                "color": p.get("paint_color_hex") or "",
+            } for p in page)
+            if len(page) < CATALOG_PAGE_SIZE:
+                break
+            last_id = page[-1]["id"]
+
+        primers = client.table("painting_guides").select(
+            "id, primer_paint_id"
+        ).in_("id", chunk).not_.is_("primer_paint_id", "null").execute().data
+        rows.extend({"guide_id": g["id"], "paint_id": g["primer_paint_id"], "name": "", "color": ""} for g in primers)
+    return rows
+
+
+def guide_paint_rows(guide) -> list[dict]:
+    """The same rows as fetch_guide_paints, taken from an already loaded PaintingGuide."""
+    rows = [
+        {"guide_id": guide.id, "paint_id": p.paint_id, "name": p.paint_name, "color": p.paint_color_hex or ""}
+        for d in guide.guide_details for p in d.guide_paints if p.paint_id
+    ]
+    if guide.primer_paint_id:
+        rows.append({"guide_id": guide.id, "paint_id": guide.primer_paint_id, "name": "", "color": ""})
+    return rows
+
+
+def fetch_catalog_paints(client, paint_ids: list[str]) -> dict[str, dict]:
+    """Catalog rows (name, code, colour, brand) by id."""
+    found = {}
+    for chunk in _chunks(paint_ids):
+        res = client.table("catalog_paints").select(
+            "id, name, product_code, color_hex, paint_brands(name)"
+        ).in_("id", chunk).execute()
+        found.update((p["id"], p) for p in res.data)
+    return found
+
+
+def missing_paint_ids(rows: list[dict], owned_ids: set[str]) -> list[str]:
+    """Ids used by the guides that the user does not own, in first-use order."""
+    return list(dict.fromkeys(r["paint_id"] for r in rows if r["paint_id"] not in owned_ids))
+
+
+def resolve_missing(rows: list[dict], owned_ids: set[str], catalog: dict[str, dict],
+                    guide_names: dict[str, str], wishlist_ids: set[str], user_index) -> list[dict]:
+    """
+    Shopping list entries for every paint in rows the user does not own.
+
+    `catalog` supplies the current name/colour/brand of missing paints
+    (guide paints only keep a snapshot), `user_index` is the user's
+    PaintSearchIndex from paint_index, used for substitutes.
+    """
+    missing = missing_paint_ids(rows, owned_ids)
+    if not missing:
+        return []
+
+    used_in: dict[str, list[str]] = {paint_id: [] for paint_id in missing}
+    snapshot: dict[str, dict] = {}
+    for r in rows:
+        guides = used_in.get(r["paint_id"])
+        if guides is None:
+            continue
+        if r["guide_id"] not in guides:
+            guides.append(r["guide_id"])
+        if r["name"]:
+            snapshot.setdefault(r["paint_id"], r)
+
+    items = []
+    for paint_id in missing:
+        paint = catalog.get(paint_id) or {}
+        fallback = snapshot.get(paint_id) or {}
+        items.append({
+            "paint_id": paint_id,
+            "name": paint.get("name") or fallback.get("name") or "Unknown paint",
+            "brand": (paint.get("paint_brands") or {}).get("name", ""),
+            "code": paint.get("product_code") or "",
+            "color": paint.get("color_hex") or fallback.get("color") or "",
+            "guides": ", ".join(guide_names.get(g, "") for g in used_in[paint_id]),
+            "guide_count": len(used_in[paint_id]),
+            "in_wishlist": paint_id in wishlist_ids,
+            "substitute": "",
+            "substitute_color": "",
+            "substitute_detail": "",
+        })
+
+    # One nearest-colour query for the whole list
+    indices, dists = user_index.colors.nearest([item["color"] for item in items], k=1)
+    for item, idx, dist in zip(items, indices[:, 0], dists[:, 0]):
+        if idx >= 0 and dist <= SUBSTITUTE_MAX_DELTA_E:
+            entry = user_index.entries[idx]
+            item["substitute"] = entry["name"]
+            item["substitute_color"] = entry["color"]
+            item["substitute_detail"] = f"ΔE {dist:.1f}"
+
+    # Paints needed by the most guides first
+    items.sort(key=lambda item: -item["guide_count"])
+    return items
+
+
+def add_missing_to_wishlist(client, user_id: str, paint_ids: list[str]) -> int:
+    """Inserts the paints not yet on the user's wishlist; returns how many were added."""
+    existing = set()
+    for chunk in _chunks(paint_ids):
+        res = client.table("paint_wishlist").select("paint_id").eq("user_id", user_id).in_("paint_id", chunk).execute()
+        existing.update(r["paint_id"] for r in res.data)
+    payload = [{"user_id": user_id, "paint_id": paint_id} for paint_id in dict.fromkeys(paint_ids) if paint_id not in existing]
+    for chunk in _chunks(payload, WRITE_CHUNK_SIZE):
+        client.table("paint_wishlist").insert(chunk).execute()
+    return len(payload)
@@ -1,5 +1,11 @@
 import os
+import httpx
+from httpx import Headers, QueryParams
 from supabase import create_client, Client
+from gotrue import SyncGoTrueClient
+from postgrest import SyncRequestBuilder, SyncRPCFilterRequestBuilder
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_TIMEOUT
+from postgrest.utils import SyncClient
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,11 +17,82 @@ service_key: str = os.environ.get("SUPABASE_SERVICE_KEY", "")
 if not url:
     print("Warning: SUPABASE_URL not set")
 
-# Standard client (uses Anon key usually)
-supabase: Client = create_client(url, key)
-
 # Admin client (uses Service Role key) - Use this for backend ops that need to bypass RLS (like checking invite tokens if table is restricted)
 # Only create if key exists
 supabase_admin: Client = None
 if service_key:
     supabase_admin = create_client(url, service_key)
+
+
+# --- Per-session clients ---
+# User requests never go through a shared authenticated client: each session
+# gets a SessionClient carrying its own JWT. All of them share the two
+# keep-alive pools below, so a new client costs no connection setup.
+
+POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+
+_rest_http = SyncClient(
+    base_url=f"{url.rstrip('/')}/rest/v1",
+    headers={"apikey": key, "Accept-Profile": "public", "Content-Profile": "public"},
+    timeout=DEFAULT_POSTGREST_CLIENT_TIMEOUT,
+    limits=POOL_LIMITS,
+    follow_redirects=True,
+    http2=True,
+)
+_auth_http = SyncClient(limits=POOL_LIMITS, follow_redirects=True, http2=True)
+
+
+class _TokenSession:
+    """Sends PostgREST requests over the shared pool with one user's Authorization header."""
+
+    def __init__(self, access_token: str):
+        self._authorization = f"Bearer {access_token or key}"
+
+    def request(self, method, url, *, headers=None, **kwargs):
+        headers = Headers(headers)
+        headers["Authorization"] = self._authorization
+        return _rest_http.request(method, url, headers=headers, **kwargs)
+
+
+class SessionClient:
+    """
+    Lightweight database client bound to a single user's JWT.
+
+    Exposes the `table()` / `rpc()` subset of the supabase Client used by the
+    app, so queries run as that user and RLS applies.
+    """
+
+    def __init__(self, access_token: str):
+        self.access_token = access_token
+        self._session = _TokenSession(access_token)
+
+    def table(self, table: str) -> SyncRequestBuilder:
+        return SyncRequestBuilder(self._session, f"/{table}")
+
+    from_ = table
+
+    def rpc(self, func: str, params: dict | None = None) -> SyncRPCFilterRequestBuilder:
+        return SyncRPCFilterRequestBuilder(
+            self._session, f"/rpc/{func}", "POST", Headers(), QueryParams(), json=params or {}
+        )
+
+
+def client_for_token(access_token: str) -> SessionClient:
+    """Client whose database requests run as the given user (RLS applies)."""
+    return SessionClient(access_token)
+
+
+def auth_client() -> SyncGoTrueClient:
+    """
+    Stateless auth client for one call (sign in, sign up, token checks).
+
+    Sessions are never stored on it; callers keep the returned tokens in
+    their own session state.
+    """
+    return SyncGoTrueClient(
+        url=f"{url.rstrip('/')}/auth/v1",
+        headers={"apikey": key, "Authorization": f"Bearer {key}"},
+        auto_refresh_token=False,
+        persist_session=False,
+        http_client=_auth_http,
+    )
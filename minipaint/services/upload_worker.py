@@ -0,0 +1,230 @@
+"""
+Bounded worker pool for image processing and image uploads.
+
+PIL work and the synchronous Google API client would otherwise run inside
+Reflex event handlers and block the event loop for every connected user.
+Jobs run on a small thread pool (PIL releases the GIL while resizing and
+encoding; Drive calls are network bound). At most UPLOAD_QUEUE_LIMIT jobs
+may be queued or running, beyond that callers get UploadQueueFull.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from googleapiclient.errors import HttpError
+
+from . import drive_service, image_cache, image_storage
+from ..utils.image_validator import validate_and_optimize_image, get_safe_mime_type
+from ..utils.palette import extract_palette
+
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", 2))
+UPLOAD_QUEUE_LIMIT = int(os.environ.get("UPLOAD_QUEUE_LIMIT", 8))
+# Jobs one multi-file upload may have on the pool at once, so a single user
+# cannot take every slot in the queue
+UPLOAD_BATCH_PARALLELISM = int(os.environ.get("UPLOAD_BATCH_PARALLELISM", 3))
+
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="upload")
+_lock = threading.Lock()
+_stats = {"queued": 0, "running": 0, "completed": 0, "failed": 0, "rejected": 0}
+_folder_locks: dict[str, threading.Lock] = {}
+
+
+class UploadQueueFull(Exception):
+    """Raised when the upload pool already has UPLOAD_QUEUE_LIMIT jobs"""
+    pass
+
+
+def queue_stats() -> dict:
+    """Snapshot of the pool: queue depth, running jobs and totals."""
+    with _lock:
+        return {
+            **_stats,
+            "depth": _stats["queued"] + _stats["running"],
+            "workers": UPLOAD_WORKERS,
+            "limit": UPLOAD_QUEUE_LIMIT,
+        }
+
+
+def _reserve():
+    with _lock:
+        if _stats["queued"] + _stats["running"] >= UPLOAD_QUEUE_LIMIT:
+            _stats["rejected"] += 1
+            raise UploadQueueFull("The server is busy processing uploads. Please try again in a moment.")
+        _stats["queued"] += 1
+
+
+async def run_job(fn, *args):
+    """
+    Runs fn(*args, progress=callback) on the pool and streams its progress.
+
+    Yields ("progress", message) tuples as the job reports them, then a
+    final ("done", result). Exceptions raised by the job propagate.
+    """
+    _reserve()
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def progress(message: str):
+        loop.call_soon_threadsafe(events.put_nowait, ("progress", message))
+
+    def work():
+        with _lock:
+            _stats["queued"] -= 1
+            _stats["running"] += 1
+        ok = False
+        try:
+            result = fn(*args, progress=progress)
+            ok = True
+            return result
+        finally:
+            with _lock:
+                _stats["running"] -= 1
+                _stats["completed" if ok else "failed"] += 1
+
+    job = loop.run_in_executor(_executor, work)
+    while True:
+        next_event = asyncio.ensure_future(events.get())
+        done, _ = await asyncio.wait({next_event, job}, return_when=asyncio.FIRST_COMPLETED)
+        if next_event in done:
+            yield next_event.result()
+            continue
+        next_event.cancel()
+        break
+    while not events.empty():
+        yield events.get_nowait()
+    yield ("done", job.result())
+
+
+async def run_batch(fn, arg_lists: list[tuple], parallelism: int = UPLOAD_BATCH_PARALLELISM):
+    """
+    Runs fn once per argument tuple, at most `parallelism` jobs at a time.
+
+    Yields (index, event, value) as the jobs report: ("progress", message),
+    ("done", result) or ("error", exception). Every index ends with exactly
+    one "done" or "error"; a failing job never cancels the others.
+    """
+    semaphore = asyncio.Semaphore(max(1, parallelism))
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def run_one(index: int, args: tuple):
+        async with semaphore:
+            try:
+                async for event, value in run_job(fn, *args):
+                    await events.put((index, event, value))
+            except Exception as e:
+                await events.put((index, "error", e))
+
+    tasks = [asyncio.create_task(run_one(i, args)) for i, args in enumerate(arg_lists)]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            index, event, value = await events.get()
+            if event != "progress":
+                remaining -= 1
+            yield index, event, value
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _ensure_folder(user_id: str, drive_svc, folder_id: str | None, progress) -> tuple[str, bool]:
+    """Returns (folder_id, created): the user's public app folder, created on first use."""
+    with _lock:
+        folder_lock = _folder_locks.setdefault(user_id, threading.Lock())
+    # Parallel uploads of one user must not each create a folder
+    with folder_lock:
+        folder_id = drive_service.get_cached_folder(user_id) or folder_id
+        created = False
+        if not folder_id:
+            progress("Preparing Drive folder...")
+            folder_id = drive_service.create_public_folder(drive_svc)
+            created = True
+        drive_service.remember_folder(user_id, folder_id)
+    return folder_id, created
+
+
+def _upload_to_drive(data: bytes, file_name: str, mime_type: str, user_id: str, refresh_token: str | None,
+                     folder_id: str | None, progress) -> tuple[str, str, bool]:
+    """Uploads into the user's app folder; returns (file_id, folder_id, folder_created)."""
+    # Cached per user; only exchanges the refresh token when the access token is near expiry
+    drive_svc = drive_service.get_user_drive_service(user_id, refresh_token)
+    folder_id, folder_created = _ensure_folder(user_id, drive_svc, folder_id, progress)
+
+    def upload(parent_id):
+        progress("Uploading to Google Drive...")
+        return drive_service.upload_file(
+            drive_svc, data, file_name, folder_id=parent_id, mime_type=mime_type,
+            progress=lambda sent, total: progress(f"Uploading to Google Drive... {sent * 100 // max(total, 1)}%")
+        )
+
+    try:
+        drive_file = upload(folder_id)
+    except HttpError as e:
+        if e.resp.status != 404 or folder_created:
+            raise
+        # The stored folder was deleted in Drive: start a new one
+        drive_service.remember_folder(user_id, None)
+        folder_id, folder_created = _ensure_folder(user_id, drive_svc, None, progress)
+        drive_file = upload(folder_id)
+    return drive_file['id'], folder_id, folder_created
+
+
+def process_guide_image(file_data: bytes, filename: str, user_id: str, refresh_token: str | None,
+                        folder_id: str | None, safe_filename: str, progress) -> dict:
+    """
+    Pool job: validate/optimize an uploaded guide image, store it with the
+    configured image storage backend and pre-fill the image proxy cache.
+
+    With the Drive backend the image goes into the user's link-readable app
+    folder, so the file needs no permissions call of its own. refresh_token
+    may be None when drive_service already caches the user; folder_id is the
+    stored user_settings.drive_folder_id, if any. Other backends ignore both.
+
+    Returns the validator result (without image bytes) plus 'file_id',
+    'folder_id', 'folder_created' (the caller persists a new folder id) and
+    'palette', the image's dominant colours.
+    """
+    progress("Optimizing image...")
+    result = validate_and_optimize_image(file_data, filename)
+    print(f"Guide image processed: {result['timings']}")
+    mime_type = get_safe_mime_type(result['format'])
+
+    storage = image_storage.get_storage()
+    folder_created = False
+    if storage.needs_drive:
+        file_id, folder_id, folder_created = _upload_to_drive(
+            result['cleaned_data'], f"{safe_filename}.{result['format']}", mime_type,
+            user_id, refresh_token, folder_id, progress
+        )
+    else:
+        progress("Saving image...")
+        file_id = storage.save(result['cleaned_data'], mime_type)
+        folder_id = None
+
+    progress("Creating thumbnails...")
+    try:
+        image_cache.store_renditions(file_id, result['cleaned_data'], mime_type)
+    except Exception as e:
+        print(f"Rendition error: {e}")
+
+    progress("Extracting colours...")
+    try:
+        palette = extract_palette(result['cleaned_data'])
+    except Exception as e:
+        print(f"Palette error: {e}")
+        palette = []
+
+    summary = {k: v for k, v in result.items() if k != 'cleaned_data'}
+    summary['file_id'] = file_id
+    summary['folder_id'] = folder_id
+    summary['folder_created'] = folder_created
+    summary['palette'] = palette
+    return summary
+
+
+def republish_images(user_id: str, refresh_token: str | None, file_ids: list[str], progress) -> dict:
+    """Pool job: re-applies link access to existing guide images with batched permission calls."""
+    progress(f"Republishing {len(file_ids)} images...")
+    drive_svc = drive_service.get_user_drive_service(user_id, refresh_token)
+    return drive_service.set_files_public(drive_svc, file_ids)
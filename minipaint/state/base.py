@@ -1,12 +1,27 @@
 import reflex as rx
 import os
 import json
-from ..services.supabase import supabase
+import time
+from ..services.supabase import auth_client, client_for_token
+
+# Refresh the access token when it has less than this many seconds left
+TOKEN_REFRESH_MARGIN = 60
+
+# Ban status is re-read at most this often per user; bans/unbans made through
+# AdminState bump _ban_version and take effect on the next check.
+BAN_CACHE_TTL_SECONDS = 15
+_ban_cache: dict[str, tuple[float, int, dict | None]] = {}
+_ban_version = 0
+
+ADMIN_CONFIG_PATH = "admin_config.json"
+# How often is_admin may stat admin_config.json for changes
+ADMIN_CONFIG_CHECK_SECONDS = 5
+_admin_cache = {"mtime": None, "checked_at": 0.0, "emails": None}
 
 
 def get_admin_emails():
     """Helper to load admin emails dynamically."""
-    admin_config_path = "admin_config.json"
+    admin_config_path = ADMIN_CONFIG_PATH
     emails = []
     
     # 1. Try Config File
@@ -36,38 +51,131 @@ def get_admin_emails():
              
     return emails
 
+def invalidate_ban_cache():
+    """Marks every cached ban status as stale (call after banning/unbanning)."""
+    global _ban_version
+    _ban_version += 1
+    _ban_cache.clear()
+
+
+def get_ban(client, email: str) -> dict | None:
+    """Returns the banned_users row for email (or None), cached for BAN_CACHE_TTL_SECONDS."""
+    now = time.monotonic()
+    cached = _ban_cache.get(email)
+    if cached and cached[1] == _ban_version and now - cached[0] < BAN_CACHE_TTL_SECONDS:
+        return cached[2]
+
+    version = _ban_version
+    res = client.table("banned_users").select("reason").eq("email", email).limit(1).execute()
+    ban = res.data[0] if res.data else None
+    _ban_cache[email] = (now, version, ban)
+    return ban
+
+
+def _admin_config_mtime():
+    try:
+        return os.stat(ADMIN_CONFIG_PATH).st_mtime_ns
+    except OSError:
+        return None
+
+
+def reload_admin_emails() -> frozenset:
+    """Re-reads the admin list from admin_config.json / env and caches it."""
+    _admin_cache["mtime"] = _admin_config_mtime()
+    _admin_cache["checked_at"] = time.monotonic()
+    _admin_cache["emails"] = frozenset(e.strip().lower() for e in get_admin_emails() if isinstance(e, str))
+    return _admin_cache["emails"]
+
+
+def get_admin_set() -> frozenset:
+    """Cached admin emails (lowercased); reloaded only when the config file's mtime changes."""
+    if _admin_cache["emails"] is None:
+        return reload_admin_emails()
+    now = time.monotonic()
+    if now - _admin_cache["checked_at"] >= ADMIN_CONFIG_CHECK_SECONDS:
+        _admin_cache["checked_at"] = now
+        if _admin_config_mtime() != _admin_cache["mtime"]:
+            return reload_admin_emails()
+    return _admin_cache["emails"]
+
+
 class BaseState(rx.State):
     user: dict = {}
-    
+
+    # Per-session Supabase tokens. Only the short-lived access token lives in a
+    # browser cookie (Reflex sets cookies from JavaScript, so page scripts can
+    # read them); the long-lived refresh token stays in backend-only state. A
+    # session without it (new tab, backend restart) must log in again once
+    # the access token expires.
+    access_token: str = rx.Cookie("", name="mp_access_token", same_site="strict")
+    token_expires_at: str = rx.Cookie("0", name="mp_token_expires_at", same_site="strict")
+    _refresh_token: str = ""
+
+    def _set_session(self, session):
+        """Stores the tokens of a Supabase auth session for this browser session."""
+        self.access_token = session.access_token
+        self._refresh_token = session.refresh_token
+        self.token_expires_at = str(session.expires_at or 0)
+        self.user = session.user.__dict__ # specific to supabase return type
+
+    def _clear_session(self):
+        self.access_token = ""
+        self._refresh_token = ""
+        self.token_expires_at = "0"
+        self.user = {}
+
+    def _refresh_if_expiring(self):
+        """Exchanges the refresh token for a new session shortly before the access token expires."""
+        if not self._refresh_token:
+            return
+        if int(self.token_expires_at or 0) - time.time() > TOKEN_REFRESH_MARGIN:
+            return
+        res = auth_client().refresh_session(self._refresh_token)
+        self._set_session(res.session)
+
+    def _db(self):
+        """Database client bound to this session's JWT (shares the pooled connections)."""
+        try:
+            self._refresh_if_expiring()
+        except Exception as e:
+            print(f"Error refreshing session: {e}")
+        return client_for_token(self.access_token)
+
     async def check_auth(self):
-        """Check if user is authenticated via Supabase."""
-        # In a real app, we might check an access token stored in local storage
-        # and validate it with Supabase.
-        # For this MVP, we will assume the session is handled via 'on_load' checks 
-        # or we will implement a simple session restoration if possible.
-        session = supabase.auth.get_session()
-        if session:
-            self.user = session.user.__dict__ # specific to supabase return type
+        """Validates this session's token with Supabase and loads the user."""
+        if not self.access_token:
+            self.user = {}
+            return
+
+        try:
+            self._refresh_if_expiring()
+            res = auth_client().get_user(self.access_token)
+        except Exception as e:
+            print(f"Session check failed: {e}")
+            res = None
+
+        if res and res.user:
+            self.user = res.user.__dict__ # specific to supabase return type
             
             # Check if user is banned
             try:
                 # Use supabase_admin if available to ensure we can read the ban list regardless of policies (though we set public read)
-                # Fallback to standard client
-                client = supabase
+                # Fallback to the session client
+                client = self._db()
                 # Import here to avoid circular dependency if needed, or rely on global import
                 from ..services.supabase import supabase_admin
                 if supabase_admin:
                     client = supabase_admin
                     
-                res = client.table("banned_users").select("reason").eq("email", self.user.get("email")).execute()
-                if res.data:
+                ban = get_ban(client, self.user.get("email"))
+                if ban:
                     # User is banned
-                    print(f"User {self.user.get('email')} is banned. Reason: {res.data[0]['reason']}")
+                    print(f"User {self.user.get('email')} is banned. Reason: {ban['reason']}")
                     return self.logout()
             except Exception as e:
                 print(f"Error checking ban status: {e}")
         else:
-            self.user = {}
+            self._clear_session()
 
     @rx.var
     def is_authenticated(self) -> bool:
@@ -79,11 +187,15 @@ class BaseState(rx.State):
         if not self.user or "email" not in self.user:
             return False
         
-        # Reload admins dynamically to allow runtime config changes
-        current_admins = get_admin_emails()
-        return self.user["email"] in current_admins
+        # Cached set; picks up admin_config.json edits via its mtime
+        return (self.user["email"] or "").lower() in get_admin_set()
         
     def logout(self):
-        supabase.auth.sign_out()
-        self.user = {}
-        return rx.redirect("/")
+        if self.access_token:
+            try:
+                # Revoke only this session's refresh token
+                auth_client().admin.sign_out(self.access_token, "local")
+            except Exception as e:
+                print(f"Error signing out: {e}")
+        self._clear_session()
+        return [rx.remove_cookie("mp_refresh_token"), rx.redirect("/")]
@@ -1,6 +1,6 @@
 import reflex as rx
 from ..services import drive_service
-from ..services.supabase import supabase
+from .base import BaseState
 
 
 class SettingsState(rx.State):
@@ -10,13 +10,13 @@ class SettingsState(rx.State):
     
     async def check_drive_connection(self):
         """Check if user has connected Google Drive"""
-        # Access parent state to get user info
-        parent = await self.get_state(type(self).__bases__[0])
+        # Access the auth state to get user info
+        parent = await self.get_state(BaseState)
         if not hasattr(parent, 'user') or not parent.user:
             return
         
         try:
-            res = supabase.table("user_settings").select("drive_refresh_token").eq(
+            res = parent._db().table("user_settings").select("drive_refresh_token").eq(
                 "user_id", parent.user.get("id")
             ).execute()
             
@@ -35,16 +35,17 @@ class SettingsState(rx.State):
     
     async def disconnect_drive(self):
         """Disconnect Google Drive integration"""
-        parent = await self.get_state(type(self).__bases__[0])
+        parent = await self.get_state(BaseState)
         if not hasattr(parent, 'user') or not parent.user:
             return
         
         try:
             # Clear tokens from DB
-            supabase.table("user_settings").update({
+            parent._db().table("user_settings").update({
                 "drive_refresh_token": None,
                 "drive_folder_id": None
             }).eq("user_id", parent.user.get("id")).execute()
+            drive_service.forget_user(parent.user.get("id"))
             
             self.is_drive_connected = False
             yield rx.toast("❌ Disconnected from Google Drive")
@@ -0,0 +1,138 @@
+"""
+Colour helpers shared by paint matching features.
+
+Hex strings are converted to CIELAB so that distances roughly follow
+perceived colour difference (CIE76 delta E). All conversions work on
+whole NumPy arrays, so matching thousands of paints is a single pass.
+"""
+import re
+
+import numpy as np
+
+HEX_PATTERN = re.compile(r"(?<![0-9A-Za-z])#?([0-9A-Fa-f]{6}|[0-9A-Fa-f]{3})\b")
+
+# D65 reference white
+_WHITE = np.array([0.95047, 1.0, 1.08883])
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+
+
+def normalize_hex(value: str | None) -> str | None:
+    """Returns '#RRGGBB' (uppercase) or None if value holds no hex colour."""
+    if not value:
+        return None
+    match = HEX_PATTERN.search(str(value).strip())
+    if not match:
+        return None
+    digits = match.group(1)
+    if len(digits) == 3:
+        digits = "".join(c * 2 for c in digits)
+    return f"#{digits.upper()}"
+
+
+def hex_to_rgb(value: str | None) -> tuple[int, int, int] | None:
+    """Parses a hex colour into an (r, g, b) tuple of 0-255 ints."""
+    hex_str = normalize_hex(value)
+    if not hex_str:
+        return None
+    return tuple(int(hex_str[i:i + 2], 16) for i in (1, 3, 5))
+
+
+def hex_list_to_rgb(values: list[str | None]) -> np.ndarray:
+    """Converts hex strings to an (N, 3) float array. Invalid entries are NaN."""
+    out = np.full((len(values), 3), np.nan)
+    for i, value in enumerate(values):
+        rgb = hex_to_rgb(value)
+        if rgb:
+            out[i] = rgb
+    return out
+
+
+def srgb_to_linear(rgb: np.ndarray) -> np.ndarray:
+    """Converts 0-255 sRGB values to linear-light 0-1 values."""
+    c = np.asarray(rgb, dtype=float) / 255.0
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Converts an (..., 3) array of 0-255 sRGB values to CIELAB."""
+    xyz = srgb_to_linear(rgb) @ _RGB_TO_XYZ.T / _WHITE
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    return np.stack([
+        116 * f[..., 1] - 16,
+        500 * (f[..., 0] - f[..., 1]),
+        200 * (f[..., 1] - f[..., 2]),
+    ], axis=-1)
+
+
+def hex_list_to_lab(values: list[str | None]) -> np.ndarray:
+    """Converts hex strings to an (N, 3) CIELAB array. Invalid entries are NaN."""
+    return rgb_to_lab(hex_list_to_rgb(values))
+
+
+def delta_e(lab_a: np.ndarray, lab_b: np.ndarray) -> np.ndarray:
+    """CIE76 colour difference between broadcastable Lab arrays."""
+    return np.sqrt(np.sum((np.asarray(lab_a) - np.asarray(lab_b)) ** 2, axis=-1))
+
+
+class ColorIndex:
+    """
+    Nearest-colour lookup over a fixed list of hex colours.
+
+    The Lab matrix is computed once; queries are answered in chunks with a
+    single matrix product per chunk instead of a Python loop per colour.
+    """
+
+    CHUNK_SIZE = 512
+
+    def __init__(self, hexes: list[str | None]):
+        self.lab = hex_list_to_lab(hexes)
+        self.valid = ~np.isnan(self.lab).any(axis=1)
+        self._lab = np.where(self.valid[:, None], self.lab, 0.0)
+        self._norms = np.where(self.valid, np.sum(self._lab ** 2, axis=1), np.inf)
+
+    def __len__(self) -> int:
+        return len(self.lab)
+
+    def distances(self, query_lab: np.ndarray) -> np.ndarray:
+        """Returns an (M, N) matrix of delta E from each query to each entry."""
+        query_lab = np.atleast_2d(query_lab)
+        q_norms = np.sum(query_lab ** 2, axis=1)[:, None]
+        squared = q_norms + self._norms[None, :] - 2.0 * query_lab @ self._lab.T
+        dist = np.sqrt(np.maximum(squared, 0.0))
+        dist[np.isnan(query_lab).any(axis=1)] = np.inf
+        return dist
+
+    def nearest(self, query_hexes: list[str | None], k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k closest entries for every query colour.
+
+        Returns:
+            (indices, distances), both shaped (M, k). Queries with an invalid
+            hex (or an empty index) get index -1 and distance inf.
+        """
+        m = len(query_hexes)
+        k = max(1, min(k, len(self))) if len(self) else 1
+        indices = np.full((m, k), -1, dtype=int)
+        dists = np.full((m, k), np.inf)
+        if not len(self) or not m:
+            return indices, dists
+
+        query_lab = hex_list_to_lab(query_hexes)
+        for start in range(0, m, self.CHUNK_SIZE):
+            block = self.distances(query_lab[start:start + self.CHUNK_SIZE])
+            if k < block.shape[1]:
+                part = np.argpartition(block, k - 1, axis=1)[:, :k]
+            else:
+                part = np.tile(np.arange(block.shape[1]), (block.shape[0], 1))
+            part_d = np.take_along_axis(block, part, axis=1)
+            order = np.argsort(part_d, axis=1)
+            idx = np.take_along_axis(part, order, axis=1)
+            d = np.take_along_axis(part_d, order, axis=1)
+            idx = np.where(np.isfinite(d), idx, -1)
+            indices[start:start + len(block)] = idx
+            dists[start:start + len(block)] = d
+        return indices, dists
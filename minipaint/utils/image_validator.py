@@ -5,6 +5,7 @@ Provides multi-layer security validation and automatic image optimization
 to ensure uploaded images are safe and fit within storage constraints.
 """
 import os
+import time
 from PIL import Image
 import io
 
@@ -13,11 +14,49 @@ ALLOWED_MIME_TYPES = {'image/jpeg', 'image/png', 'image/webp'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 MAX_DIMENSIONS = (2048, 2048)  # Target max dimensions (will resize to fit)
 MIN_QUALITY = 60  # Minimum JPEG quality before giving up
+RENDITION_WIDTHS = (160, 480, 1024)  # Max edge (px) of the downscaled copies served to views
+RENDITION_QUALITY = 80
 
 class ImageValidationError(Exception):
     """Custom exception for image validation failures"""
     pass
 
+# Approximate encoded size relative to quality 85, for libjpeg/libwebp
+# quantisation tables. Used to pick the next quality from one measured encode.
+_QUALITY_SIZE_RATIO = [
+    (85, 1.00), (80, 0.83), (75, 0.72), (70, 0.64), (65, 0.58), (60, 0.53),
+]
+START_QUALITY = 85
+DRAFT_TOLERANCE = 0.95  # JPEG draft may decode down to 95% of the target size
+
+def _estimate_quality(size_ratio_needed: float) -> int:
+    """Highest quality whose expected size (relative to START_QUALITY) fits the ratio."""
+    for quality, ratio in _QUALITY_SIZE_RATIO:
+        if ratio <= size_ratio_needed:
+            return quality
+    return MIN_QUALITY
+
+def _fit_size(size: tuple, bounds: tuple) -> tuple:
+    """Size after Image.thumbnail(bounds): aspect kept, never enlarged."""
+    scale = min(bounds[0] / size[0], bounds[1] / size[1], 1.0)
+    return (max(1, round(size[0] * scale)), max(1, round(size[1] * scale)))
+
+def _png_likely_too_large(input_bytes: int, original_size: tuple, final_size: tuple) -> bool:
+    """Predicts the re-encoded PNG size from the input's bytes per pixel."""
+    scale = (final_size[0] * final_size[1]) / (original_size[0] * original_size[1])
+    return input_bytes * scale > MAX_FILE_SIZE * 1.2
+
+def _encode(img, save_format: str, quality: int) -> bytes:
+    output = io.BytesIO()
+    if save_format == 'JPEG':
+        img.save(output, format=save_format, quality=quality, optimize=True)
+    elif save_format == 'PNG':
+        # zlib level 6: close to optimize=True in size at a fraction of the CPU
+        img.save(output, format=save_format, compress_level=6)
+    elif save_format == 'WEBP':
+        img.save(output, format=save_format, quality=quality, method=4)
+    return output.getvalue()
+
 def validate_and_optimize_image(file_data: bytes, filename: str) -> dict:
     """
     Validates and automatically optimizes images to fit requirements.
@@ -27,6 +66,11 @@ def validate_and_optimize_image(file_data: bytes, filename: str) -> dict:
     2. Resizes if dimensions exceed MAX_DIMENSIONS
     3. Compresses if file size exceeds MAX_FILE_SIZE
     4. Strips EXIF data for security
+
+    The image is decoded once; JPEGs far above MAX_DIMENSIONS are downscaled
+    by the decoder itself (Image.draft). When the first encode is too large,
+    the quality needed is estimated from its size instead of stepping down
+    blindly, so at most three encodes happen.
     
     Args:
         file_data: Raw file bytes
@@ -43,12 +87,21 @@ def validate_and_optimize_image(file_data: bytes, filename: str) -> dict:
             'file_size': int,  # Final file size in bytes
             'was_resized': bool,
             'was_compressed': bool,
-            'final_quality': int  # JPEG quality used
+            'final_quality': int,  # JPEG quality used
+            'timings': dict  # ms per stage: decode, resize, encode, total (+ encode_passes)
         }
     
     Raises:
         ImageValidationError: If image cannot be validated or optimized
     """
+    started = time.perf_counter()
+    timings = {}
+
+    def lap(stage, since):
+        now = time.perf_counter()
+        timings[stage] = round((now - since) * 1000, 1)
+        return now
+
     if len(file_data) == 0:
         raise ImageValidationError("Empty file")
     
@@ -59,98 +112,135 @@ def validate_and_optimize_image(file_data: bytes, filename: str) -> dict:
             f"Invalid file type. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
         )
     
-    # 2. Verify actual image format by opening with PIL
+    # 2. Verify actual image format from the header, then decode once
     # This replaces imghdr (removed in Python 3.13)
     try:
-        with Image.open(io.BytesIO(file_data)) as test_img:
-            img_format = test_img.format
-            if img_format is None or img_format.lower() not in ['jpeg', 'png', 'webp']:
-                raise ImageValidationError("File is not a valid image format (JPEG/PNG/WEBP)")
-            img_format = img_format.lower()
+        img = Image.open(io.BytesIO(file_data))
+        img_format = (img.format or "").lower()
+        if img_format not in ['jpeg', 'png', 'webp']:
+            raise ImageValidationError("File is not a valid image format (JPEG/PNG/WEBP)")
+        original_size = img.size
+        target_size = _fit_size(original_size, MAX_DIMENSIONS)
+        if img_format == 'jpeg' and target_size != original_size:
+            # Decoder-side downscale by 1/2, 1/4 or 1/8. MAX_DIMENSIONS is a cap,
+            # so landing a few percent under it beats a full-size LANCZOS pass.
+            img.draft(img.mode, tuple(int(d * DRAFT_TOLERANCE) for d in target_size))
+        img.load()
+    except ImageValidationError:
+        raise
     except Exception as e:
         raise ImageValidationError(f"Invalid image file: {str(e)}")
+    mark = lap('decode_ms', started)
     
-    # 3. Open and validate with PIL
+    # 3. Process the decoded image
     try:
-        with Image.open(io.BytesIO(file_data)) as img:
-            original_size = img.size
-            was_resized = False
-            was_compressed = False
-            
-            # Convert RGBA to RGB if saving as JPEG
-            if img.mode in ('RGBA', 'LA', 'P') and img_format == 'jpeg':
-                # Create white background
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            elif img.mode != 'RGB' and img_format == 'jpeg':
-                img = img.convert('RGB')
-            
-            # 4. Resize if dimensions exceed maximum
-            if img.size[0] > MAX_DIMENSIONS[0] or img.size[1] > MAX_DIMENSIONS[1]:
-                img.thumbnail(MAX_DIMENSIONS, Image.Resampling.LANCZOS)
-                was_resized = True
-            
-            # 5. Strip EXIF data and optimize size
-            save_format = 'JPEG' if img_format == 'jpeg' else img_format.upper()
-            quality = 85  # Start with good quality
-            
-            # Try to compress to under MAX_FILE_SIZE
-            for attempt in range(5):  # Max 5 compression attempts
-                output = io.BytesIO()
-                
-                if save_format == 'JPEG':
-                    img.save(output, format=save_format, quality=quality, optimize=True)
-                elif save_format == 'PNG':
-                    img.save(output, format=save_format, optimize=True)
-                elif save_format == 'WEBP':
-                    img.save(output, format=save_format, quality=quality, method=6)
-                
-                clean_data = output.getvalue()
-                
-                # Check if we're under the limit
-                if len(clean_data) <= MAX_FILE_SIZE:
-                    if attempt > 0:
-                        was_compressed = True
-                    break
-                
-                # If still too large, reduce quality or convert format
-                if save_format in ['JPEG', 'WEBP']:
-                    quality = max(MIN_QUALITY, quality - 10)
-                    if quality == MIN_QUALITY and attempt == 4:
-                        raise ImageValidationError(
-                            f"Could not compress image to under {MAX_FILE_SIZE/1024/1024}MB. "
-                            f"Current size: {len(clean_data)/1024/1024:.2f}MB. "
-                            f"Try reducing image dimensions before uploading."
-                        )
-                elif save_format == 'PNG':
-                    # PNG compression is limited, convert to JPEG instead
-                    save_format = 'JPEG'
-                    img = img.convert('RGB')
-                    quality = 85
-                    was_compressed = True
-            
-            # Prepare result with metadata
-            result = {
-                'valid': True,
-                'format': 'jpeg' if save_format == 'JPEG' else img_format,
-                'cleaned_data': clean_data,
-                'original_size': original_size,
-                'final_size': img.size,
-                'file_size': len(clean_data),
-                'was_resized': was_resized,
-                'was_compressed': was_compressed,
-                'final_quality': quality if save_format in ['JPEG', 'WEBP'] else 100
-            }
-            
-            return result
+        was_resized = False
+        was_compressed = False
+
+        # Convert RGBA to RGB if saving as JPEG
+        if img.mode in ('RGBA', 'LA', 'P') and img_format == 'jpeg':
+            # Create white background
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+            img = background
+        elif img.mode != 'RGB' and img_format == 'jpeg':
+            img = img.convert('RGB')
+        
+        # 4. Resize if dimensions exceed maximum
+        if img.size[0] > MAX_DIMENSIONS[0] or img.size[1] > MAX_DIMENSIONS[1]:
+            img.thumbnail(MAX_DIMENSIONS, Image.Resampling.LANCZOS)
+        was_resized = img.size != original_size
+        mark = lap('resize_ms', mark)
+        
+        # 5. Strip EXIF data and optimize size
+        save_format = 'JPEG' if img_format == 'jpeg' else img_format.upper()
+        quality = START_QUALITY  # Start with good quality
+        if save_format == 'PNG' and _png_likely_too_large(len(file_data), original_size, img.size):
+            # PNG compression is limited, convert to JPEG instead (without a wasted PNG encode)
+            save_format = 'JPEG'
+            img = img.convert('RGB')
+            was_compressed = True
+        clean_data = _encode(img, save_format, quality)
+        passes = 1
+
+        if len(clean_data) > MAX_FILE_SIZE and save_format == 'PNG':
+            # PNG compression is limited, convert to JPEG instead
+            save_format = 'JPEG'
+            img = img.convert('RGB')
+            clean_data = _encode(img, save_format, quality)
+            passes += 1
+            was_compressed = True
+
+        if len(clean_data) > MAX_FILE_SIZE:
+            # Aim slightly below the limit; the size model is approximate
+            quality = _estimate_quality(MAX_FILE_SIZE * 0.95 / len(clean_data))
+            clean_data = _encode(img, save_format, quality)
+            passes += 1
+            if len(clean_data) > MAX_FILE_SIZE and quality > MIN_QUALITY:
+                quality = MIN_QUALITY
+                clean_data = _encode(img, save_format, quality)
+                passes += 1
+            was_compressed = True
+            if len(clean_data) > MAX_FILE_SIZE:
+                raise ImageValidationError(
+                    f"Could not compress image to under {MAX_FILE_SIZE/1024/1024}MB. "
+                    f"Current size: {len(clean_data)/1024/1024:.2f}MB. "
+                    f"Try reducing image dimensions before uploading."
+                )
+        lap('encode_ms', mark)
+        timings['encode_passes'] = passes
+        timings['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        
+        # Prepare result with metadata
+        result = {
+            'valid': True,
+            'format': 'jpeg' if save_format == 'JPEG' else img_format,
+            'cleaned_data': clean_data,
+            'original_size': original_size,
+            'final_size': img.size,
+            'file_size': len(clean_data),
+            'was_resized': was_resized,
+            'was_compressed': was_compressed,
+            'final_quality': quality if save_format in ['JPEG', 'WEBP'] else 100,
+            'timings': timings
+        }
+        
+        return result
     
     except ImageValidationError:
         raise
     except Exception as e:
         raise ImageValidationError(f"Invalid image file: {str(e)}")
+    finally:
+        img.close()
+
+def make_renditions(file_data: bytes, widths: tuple = RENDITION_WIDTHS) -> dict[int, bytes]:
+    """
+    Creates downscaled WebP copies of an already validated image.
+
+    Returns {max_edge_px: webp_bytes}. Widths at or above the image's own
+    largest edge are skipped, the original serves those. Each size is
+    resized from the next larger one, so the full image is scaled only once.
+    """
+    renditions = {}
+    with Image.open(io.BytesIO(file_data)) as img:
+        largest = max(w for w in widths)
+        if img.format == 'JPEG':
+            # Let the decoder downscale by 2/4/8 while decoding
+            img.draft('RGB', (largest, largest))
+        img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        current = img
+        for width in sorted(widths, reverse=True):
+            if width >= max(img.size):
+                continue
+            current = current.copy()
+            current.thumbnail((width, width), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            current.save(output, format='WEBP', quality=RENDITION_QUALITY, method=4)
+            renditions[width] = output.getvalue()
+    return renditions
 
 def get_safe_mime_type(img_format: str) -> str:
     """Maps image format to MIME type"""
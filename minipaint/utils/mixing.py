@@ -0,0 +1,198 @@
+"""
+Predicted colour of paints mixed at their guide ratios.
+
+The default "km" model expands each colour to reflectances in four
+wavelength bands (violet-blue, blue-green, green-yellow, orange-red) and
+mixes each band with single-constant Kubelka-Munk: reflectance -> K/S,
+ratio-weighted mean, back to reflectance. Blue and green paints both
+half-reflect the blue-green band, so blue + yellow keeps that band and
+comes out green, where mixing RGB channels on their own gives grey. The
+band split is exact for every colour: a single paint, or identical
+paints, mixes to itself.
+
+K-M bends the bands of one colour by different amounts, which would shift
+hue when a paint is only lightened or darkened. So the result keeps its
+K-M lightness and chroma but takes the hue of the plain average, except
+to the extent a second chromatic paint is in the mix. Tints and shades
+(a colour with white, grey or black) keep their hue; the band model's
+hue only shows where two colours meet.
+
+"linear" is the ratio-weighted average in linear RGB, closer to glazes
+and light mixing.
+
+All mixes of a guide are computed in one array pass, and results are
+memoised per (paints, ratios) key.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .color import hex_list_to_rgb, normalize_hex, srgb_to_linear
+
+MIX_MODELS = ("km", "linear")
+MIX_CACHE_SIZE = 4096
+# Reflectance range band values are mapped into for K-M. Pure 0 would make
+# K/S infinite, and a higher floor keeps white from being overpowered by
+# every colour it is mixed with
+PAINT_REFLECTANCE = (0.15, 0.85)
+
+# Band reflectances of the primaries and secondaries
+_BLUE = np.array([1.0, 0.5, 0.0, 0.0])
+_GREEN = np.array([0.0, 0.5, 1.0, 0.0])
+_RED = np.array([0.0, 0.0, 0.0, 1.0])
+_CYAN, _MAGENTA, _YELLOW = _BLUE + _GREEN, _BLUE + _RED, _GREEN + _RED
+# Bands -> linear RGB. Maps all seven basis curves (and white) back exactly,
+# with the shared blue-green band counting as green
+_PROJECTION = np.array([
+    [0.0, 0.0, 0.0, 1.0],
+    [-0.5, 1.0, 0.5, 0.0],
+    [1.0, 0.0, 0.0, 0.0],
+])
+
+# Linear sRGB <-> OKLab (Ottosson 2020), used to compare and turn hues
+_LINEAR_TO_LMS = np.array([
+    [0.4122214708, 0.5363325363, 0.0514459929],
+    [0.2119034982, 0.6806995451, 0.1073969566],
+    [0.0883024619, 0.2817188376, 0.6299787005],
+])
+_LMS_TO_OKLAB = np.array([
+    [0.2104542553, 0.7936177850, -0.0040720468],
+    [1.9779984951, -2.4285922050, 0.4505937099],
+    [0.0259066245, 0.7827808990, -0.8086757400],
+])
+_OKLAB_TO_LMS = np.linalg.inv(_LMS_TO_OKLAB)
+_LMS_TO_LINEAR = np.linalg.inv(_LINEAR_TO_LMS)
+
+_cache: OrderedDict[tuple, str] = OrderedDict()
+_lock = threading.Lock()
+
+
+def linear_to_srgb(linear: np.ndarray) -> np.ndarray:
+    """Converts linear-light 0-1 values to 0-255 sRGB values."""
+    c = np.clip(linear, 0.0, 1.0)
+    return 255.0 * np.where(c <= 0.0031308, 12.92 * c, 1.055 * c ** (1 / 2.4) - 0.055)
+
+
+def spectral_curves(linear: np.ndarray) -> np.ndarray:
+    """
+    Reflectance curves (..., bands) for linear RGB colours (..., 3).
+
+    The grey part becomes a flat curve, what is left of two channels their
+    secondary's curve, and the rest its primary's curve.
+    """
+    white = linear.min(axis=-1, keepdims=True)
+    r, g, b = np.moveaxis(linear - white, -1, 0)
+    cyan, magenta, yellow = np.minimum(g, b), np.minimum(r, b), np.minimum(r, g)
+    r, g, b = r - magenta - yellow, g - cyan - yellow, b - cyan - magenta
+    return (white + cyan[..., None] * _CYAN + magenta[..., None] * _MAGENTA + yellow[..., None] * _YELLOW
+            + r[..., None] * _RED + g[..., None] * _GREEN + b[..., None] * _BLUE)
+
+
+def mix_key(paints: list[tuple[str | None, int]], model: str = "km") -> tuple | None:
+    """
+    Cache key of a mix: sorted (hex, ratio) pairs plus the model.
+
+    Paints without a valid colour or with a ratio below 1 are left out;
+    None when fewer than two paints remain (nothing to mix).
+    """
+    pairs = []
+    for hex_value, ratio in paints:
+        hex_str = normalize_hex(hex_value)
+        if hex_str and ratio and ratio > 0:
+            pairs.append((hex_str, int(ratio)))
+    if len(pairs) < 2:
+        return None
+    return (model, *sorted(pairs))
+
+
+def _kubelka_munk(weights: np.ndarray, curves: np.ndarray) -> np.ndarray:
+    """Ratio-weighted K-M mix of (mixes, paints, bands) curves into (mixes, bands)."""
+    low, high = PAINT_REFLECTANCE
+    reflectance = low + (high - low) * curves
+    k_over_s = np.einsum("mp,mpn->mn", weights, (1.0 - reflectance) ** 2 / (2.0 * reflectance))
+    return (1.0 + k_over_s - np.sqrt(k_over_s ** 2 + 2.0 * k_over_s) - low) / (high - low)
+
+
+def _interaction(weights: np.ndarray, linear: np.ndarray) -> np.ndarray:
+    """
+    How much two chromatic paints meet in each mix, 0-1.
+
+    Each paint counts by ratio times saturation, so whites, greys and
+    blacks count for nothing. 0 when one colour carries the mix, 1 from
+    two colours at equal share.
+    """
+    brightest = linear.max(axis=-1)
+    saturation = np.divide(brightest - linear.min(axis=-1), brightest,
+                           out=np.zeros_like(brightest), where=brightest > 0)
+    share = weights * saturation
+    total = share.sum(axis=1)
+    lead = np.divide(share.max(axis=1), total, out=np.ones_like(total), where=total > 0)
+    return np.minimum(1.0, 2.0 * (1.0 - lead))
+
+
+def _to_oklab(linear: np.ndarray) -> np.ndarray:
+    return np.cbrt(linear @ _LINEAR_TO_LMS.T) @ _LMS_TO_OKLAB.T
+
+
+def _from_oklab(lab: np.ndarray) -> np.ndarray:
+    return np.clip((lab @ _OKLAB_TO_LMS.T) ** 3 @ _LMS_TO_LINEAR.T, 0.0, 1.0)
+
+
+def _keep_hue(spectral: np.ndarray, target: np.ndarray, interaction: np.ndarray) -> np.ndarray:
+    """Turns the K-M result's OKLab hue toward the target's, fully when nothing interacts."""
+    lab, target_lab = _to_oklab(spectral), _to_oklab(target)
+    hue = np.arctan2(lab[:, 2], lab[:, 1])
+    target_hue = np.arctan2(target_lab[:, 2], target_lab[:, 1])
+    turn = np.angle(np.exp(1j * (target_hue - hue)))  # Shortest way round
+    hue += (1.0 - interaction) * turn
+    chroma = np.hypot(lab[:, 1], lab[:, 2])
+    return _from_oklab(np.stack([lab[:, 0], chroma * np.cos(hue), chroma * np.sin(hue)], axis=1))
+
+
+def _mix(keys: list[tuple]) -> list[str]:
+    """Mixes every key in one pass over a (mixes, paints, 3) array."""
+    width = max(len(key) - 1 for key in keys)
+    hexes = [None] * (len(keys) * width)
+    weights = np.zeros((len(keys), width))
+    for row, key in enumerate(keys):
+        for col, (hex_str, ratio) in enumerate(key[1:]):
+            hexes[row * width + col] = hex_str
+            weights[row, col] = ratio
+    weights /= weights.sum(axis=1, keepdims=True)
+    linear = srgb_to_linear(np.nan_to_num(hex_list_to_rgb(hexes))).reshape(len(keys), width, 3)
+
+    averaged = np.einsum("mp,mpc->mc", weights, linear)
+    spectral = np.clip(_kubelka_munk(weights, spectral_curves(linear)) @ _PROJECTION.T, 0.0, 1.0)
+    km = _keep_hue(spectral, averaged, _interaction(weights, linear))
+
+    is_km = np.array([key[0] == "km" for key in keys])[:, None]
+    rgb = np.rint(linear_to_srgb(np.where(is_km, km, averaged))).astype(int)
+    return [f"#{r:02X}{g:02X}{b:02X}" for r, g, b in rgb]
+
+
+def mix_colors(groups: list[list[tuple[str | None, int]]], model: str = "km") -> list[str | None]:
+    """
+    Predicted hex colour for each group of (hex, ratio) paints.
+
+    Groups with fewer than two usable paints give None. Uncached groups
+    are mixed together in one vectorised call.
+    """
+    if model not in MIX_MODELS:
+        raise ValueError(f"Unknown mix model '{model}' (use {', '.join(MIX_MODELS)})")
+    keys = [mix_key(group, model) for group in groups]
+    results: dict[tuple, str] = {}
+    with _lock:
+        for key in keys:
+            if key is not None and key in _cache:
+                _cache.move_to_end(key)
+                results[key] = _cache[key]
+    todo = list(dict.fromkeys(k for k in keys if k is not None and k not in results))
+    if todo:
+        results.update(zip(todo, _mix(todo)))
+        with _lock:
+            for key in todo:
+                _cache[key] = results[key]
+            while len(_cache) > MIX_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return [results[key] if key is not None else None for key in keys]
@@ -0,0 +1,163 @@
+"""
+Ranked paint search for the guide paint picker.
+
+An index is built once per paint list (the user's owned + custom paints,
+or the whole catalog) and answers two kinds of queries:
+
+  - text: exact name, name/word prefix, product code, substring, then
+    fuzzy matches via character trigrams (typos like "abbadon")
+  - colour: a hex query ("#3a5f8b") ranks paints by delta E
+
+Substring scans narrow the previous result when the query only grew by a
+few characters, so typing stays cheap on catalog-sized indexes.
+"""
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from .color import ColorIndex, hex_list_to_lab, normalize_hex
+
+HEX_QUERY = re.compile(r"^#?(?:[0-9a-fA-F]{3}|[0-9a-fA-F]{6})$")
+FUZZY_MIN_COVERAGE = 0.5  # Share of the query's trigrams a fuzzy match must contain
+COLOR_MAX_DELTA_E = 25.0  # Beyond this colours stop looking related
+NARROW_CACHE_SIZE = 128
+
+# Rank tiers (lower is better)
+TIER_EXACT, TIER_PREFIX, TIER_WORD_PREFIX, TIER_CODE, TIER_SUBSTRING, TIER_FUZZY, TIER_COLOR = range(7)
+
+
+def fold_text(value: str | None) -> str:
+    """Lowercase, accent-free words separated by single spaces."""
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKD", str(value))
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    return " ".join(re.findall(r"[0-9a-z]+", value.lower()))
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def is_color_query(query: str) -> bool:
+    """True for '#abc', '#aabbcc' and bare 6-digit hex; bare 3-letter words stay text."""
+    query = query.strip()
+    return bool(HEX_QUERY.match(query)) and (query.startswith("#") or len(query) == 6)
+
+
+class PaintSearchIndex:
+    """
+    Search index over a fixed list of paint entries.
+
+    Entries are dicts with at least 'name' and 'color'; 'code' and 'brand'
+    are optional. Results are (tier, score, position) tuples, smaller is
+    better, so results of several indexes can be merged with a plain sort.
+    """
+
+    def __init__(self, entries: list[dict]):
+        self.entries = entries
+        self.names = [fold_text(e.get("name")) for e in entries]
+        self.compact = [n.replace(" ", "") for n in self.names]
+        self.codes = [fold_text(e.get("code")).replace(" ", "") for e in entries]
+        self.colors = ColorIndex([e.get("color") for e in entries])
+
+        self._grams: list[set[str]] = []
+        self._postings: dict[str, list[int]] = {}
+        for i, name in enumerate(self.names):
+            grams = _trigrams(name)
+            self._grams.append(grams)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(i)
+
+        # query -> positions whose name contains it, for narrowing longer queries
+        self._narrow: OrderedDict[str, list[int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _substring_positions(self, query: str) -> list[int]:
+        with self._lock:
+            base = None
+            for cut in range(len(query) - 1, 0, -1):
+                base = self._narrow.get(query[:cut])
+                if base is not None:
+                    break
+        candidates = base if base is not None else range(len(self.names))
+        found = [i for i in candidates if query in self.names[i] or query in self.compact[i]]
+        with self._lock:
+            self._narrow[query] = found
+            self._narrow.move_to_end(query)
+            while len(self._narrow) > NARROW_CACHE_SIZE:
+                self._narrow.popitem(last=False)
+        return found
+
+    def _fuzzy(self, query: str, exclude: set[int], limit: int) -> list[tuple[int, float]]:
+        grams = _trigrams(query)
+        hits = Counter()
+        for gram in grams:
+            for i in self._postings.get(gram, ()):
+                hits[i] += 1
+        scored = []
+        for i, shared in hits.items():
+            if i in exclude:
+                continue
+            # Coverage of the query decides; Jaccard prefers names not much longer than it
+            coverage = shared / len(grams)
+            if coverage >= FUZZY_MIN_COVERAGE:
+                jaccard = shared / (len(grams) + len(self._grams[i]) - shared)
+                scored.append((i, (coverage + jaccard) / 2))
+        scored.sort(key=lambda item: -item[1])
+        return scored[:limit]
+
+    def search_text(self, query: str, limit: int = 50) -> list[tuple[int, float, int]]:
+        q = fold_text(query)
+        if not q:
+            return []
+        q_compact = q.replace(" ", "")
+        ranked = []
+        for i in self._substring_positions(q):
+            name = self.names[i]
+            if name == q:
+                tier = TIER_EXACT
+            elif name.startswith(q) or self.compact[i].startswith(q_compact):
+                tier = TIER_PREFIX
+            elif f" {q}" in f" {name}":
+                tier = TIER_WORD_PREFIX
+            else:
+                tier = TIER_SUBSTRING
+            # Shorter names first within a tier: "Blue" before "Blue Horror Armour"
+            ranked.append((tier, len(name), i))
+        if q_compact and len(q_compact) >= 2:
+            matched = {i for _, _, i in ranked}
+            for i, code in enumerate(self.codes):
+                if code and i not in matched and code.startswith(q_compact):
+                    ranked.append((TIER_CODE, len(code), i))
+        if len(ranked) < limit and len(q) >= 3:
+            matched = {i for _, _, i in ranked}
+            for i, similarity in self._fuzzy(q, matched, limit - len(ranked)):
+                ranked.append((TIER_FUZZY, 1.0 - similarity, i))
+        ranked.sort()
+        return ranked[:limit]
+
+    def search_color(self, query: str, limit: int = 50) -> list[tuple[int, float, int]]:
+        hex_str = normalize_hex(query)
+        if not hex_str or not len(self):
+            return []
+        dist = self.colors.distances(hex_list_to_lab([hex_str]))[0]
+        k = min(limit, len(dist))
+        nearest = np.argpartition(dist, k - 1)[:k] if k < len(dist) else np.arange(len(dist))
+        return sorted(
+            (TIER_COLOR, float(dist[i]), int(i)) for i in nearest
+            if np.isfinite(dist[i]) and dist[i] <= COLOR_MAX_DELTA_E
+        )
+
+    def search(self, query: str, limit: int = 50) -> list[tuple[int, float, int]]:
+        """Ranked (tier, score, position) results; colour queries return delta E as the score."""
+        if is_color_query(query):
+            return self.search_color(query, limit)
+        return self.search_text(query, limit)
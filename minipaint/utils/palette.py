@@ -0,0 +1,95 @@
+"""
+Dominant colours of a reference image.
+
+The image is decoded at a small size (JPEG draft mode, then a thumbnail of
+PALETTE_SAMPLE_EDGE px), its pixels are clustered with k-means in CIELAB,
+and clusters closer than PALETTE_MERGE_DELTA_E are merged. A few thousand
+pixels are plenty for a palette, so extraction costs milliseconds next to
+the upload itself.
+"""
+import io
+
+import numpy as np
+from PIL import Image
+
+from .color import rgb_to_lab
+
+PALETTE_SIZE = 6
+PALETTE_SAMPLE_EDGE = 64  # px, longest edge of the sampled image
+PALETTE_ITERATIONS = 12
+PALETTE_MERGE_DELTA_E = 10.0  # Clusters closer than this show as one colour
+PALETTE_MIN_SHARE = 0.02  # Colours covering less of the image are dropped
+
+
+def _sample_pixels(image_data: bytes) -> np.ndarray:
+    """(N, 3) sRGB pixels of a downsampled copy; transparent pixels are left out."""
+    img = Image.open(io.BytesIO(image_data))
+    img.draft("RGB", (PALETTE_SAMPLE_EDGE * 2, PALETTE_SAMPLE_EDGE * 2))
+    img.thumbnail((PALETTE_SAMPLE_EDGE, PALETTE_SAMPLE_EDGE))
+    if img.mode in ("RGBA", "LA", "P"):
+        rgba = np.asarray(img.convert("RGBA"), dtype=float).reshape(-1, 4)
+        return rgba[rgba[:, 3] >= 128, :3]
+    return np.asarray(img.convert("RGB"), dtype=float).reshape(-1, 3)
+
+
+def _kmeans(points: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """Cluster label per point (k-means++ start, fixed iteration count)."""
+    centres = [points[rng.integers(len(points))]]
+    for _ in range(1, k):
+        d2 = np.min(((points[:, None, :] - np.array(centres)[None]) ** 2).sum(axis=2), axis=1)
+        if not d2.sum():
+            break
+        centres.append(points[rng.choice(len(points), p=d2 / d2.sum())])
+    centres = np.array(centres)
+
+    labels = None
+    for _ in range(PALETTE_ITERATIONS):
+        d2 = ((points[:, None, :] - centres[None]) ** 2).sum(axis=2)
+        new_labels = d2.argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(len(centres)):
+            members = points[labels == c]
+            if len(members):
+                centres[c] = members.mean(axis=0)
+    return labels
+
+
+def extract_palette(image_data: bytes, size: int = PALETTE_SIZE) -> list[str]:
+    """
+    Dominant colours of an image as '#RRGGBB', most common first.
+
+    Deterministic for the same image (seeded initialisation).
+    """
+    pixels = _sample_pixels(image_data)
+    if not len(pixels):
+        return []
+    lab = rgb_to_lab(pixels)
+    labels = _kmeans(lab, min(size, len(pixels)), np.random.default_rng(0))
+
+    clusters = []
+    for c in np.unique(labels):
+        mask = labels == c
+        clusters.append([mask.sum(), lab[mask].mean(axis=0), pixels[mask].sum(axis=0)])
+    clusters.sort(key=lambda cluster: -cluster[0])
+
+    # Merge near-identical clusters into the larger one
+    merged = []
+    for count, centre, rgb_sum in clusters:
+        for other in merged:
+            if np.linalg.norm(other[1] - centre) < PALETTE_MERGE_DELTA_E:
+                other[0] += count
+                other[2] = other[2] + rgb_sum
+                break
+        else:
+            merged.append([count, centre, rgb_sum])
+    merged.sort(key=lambda cluster: -cluster[0])
+
+    palette = []
+    for count, _, rgb_sum in merged:
+        if count / len(pixels) < PALETTE_MIN_SHARE:
+            continue
+        r, g, b = np.rint(rgb_sum / count).astype(int)
+        palette.append(f"#{r:02X}{g:02X}{b:02X}")
+    return palette
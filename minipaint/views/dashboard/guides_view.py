@@ -4,12 +4,16 @@ import reflex as rx
 def painting_guides_tab():
     """Painting guides list and management view"""
     # Import dependencies locally to avoid circular imports  
-    from ...pages.dashboard import DashboardState, render_create_guide_modal, render_guide_detail_modal, render_cancel_confirmation_modal, render_delete_confirmation_modal
+    from ...pages.dashboard import DashboardState, guide_image_url, render_create_guide_modal, render_guide_detail_modal, render_shopping_list_modal, render_template_library_modal, render_brand_swap_modal, render_share_modal, render_cancel_confirmation_modal, render_delete_confirmation_modal
     state_class = DashboardState
     
     return rx.vstack(
         render_create_guide_modal(),
         render_guide_detail_modal(),
+        render_shopping_list_modal(),
+        render_template_library_modal(),
+        render_brand_swap_modal(),
+        render_share_modal(),
         render_cancel_confirmation_modal(),
         render_delete_confirmation_modal(),
         rx.hstack(
@@ -33,6 +37,19 @@ def painting_guides_tab():
                     "Switch to Grid View"
                 )
             ),
+            rx.button(
+                rx.icon("library", size=16),
+                "Templates",
+                on_click=state_class.open_template_library,
+                variant="soft"
+            ),
+            rx.button(
+                rx.icon("shopping-cart", size=16),
+                "Missing Paints",
+                on_click=state_class.check_missing_paints(""),
+                variant="soft",
+                disabled=state_class.painting_guides.length() == 0
+            ),
             rx.button("New Guide", on_click=state_class.toggle_guide_modal)
         ),
         
@@ -43,10 +60,21 @@ def painting_guides_tab():
                     state_class.painting_guides,
                     lambda guide: rx.card(
                         rx.vstack(
+                            rx.cond(
+                                guide.image_drive_id,
+                                rx.image(
+                                    src=guide_image_url(guide.image_drive_id, 480),
+                                    width="100%",
+                                    height="120px",
+                                    object_fit="cover",
+                                    border_radius="6px",
+                                    loading="lazy"
+                                )
+                            ),
                             rx.hstack(
                                 rx.vstack(
                                     rx.text(guide.name, weight="bold", size="2", max_width="120px", overflow="hidden", text_overflow="ellipsis", white_space="nowrap"),
-                                    rx.text(f"{guide.guide_details.length()} Sections", size="1", color="violet"),
+                                    rx.text(f"{guide.detail_count} Sections", size="1", color="violet"),
                                     align_items="start",
                                     spacing="1"
                                 ),
@@ -65,6 +93,15 @@ def painting_guides_tab():
                                     ),
                                     content="Edit"
                                 ),
+                                rx.tooltip(
+                                    rx.button(
+                                        rx.icon("copy", size=14),
+                                        on_click=lambda e: [rx.stop_propagation, state_class.duplicate_guide(guide.id, "")],
+                                        variant="ghost",
+                                        size="1"
+                                    ),
+                                    content="Duplicate"
+                                ),
                                 rx.tooltip(
                                     rx.button(
                                         rx.icon("trash-2", size=14),
@@ -115,14 +152,31 @@ def painting_guides_tab():
                     rx.foreach(
                         state_class.painting_guides,
                         lambda guide: rx.table.row(
-                            rx.table.cell(rx.text(guide.name, weight="bold", color="violet")),
+                            rx.table.cell(
+                                rx.hstack(
+                                    rx.cond(
+                                        guide.image_drive_id,
+                                        rx.image(
+                                            src=guide_image_url(guide.image_drive_id, 160),
+                                            width="32px",
+                                            height="32px",
+                                            object_fit="cover",
+                                            border_radius="4px",
+                                            loading="lazy"
+                                        )
+                                    ),
+                                    rx.text(guide.name, weight="bold", color="violet"),
+                                    align_items="center"
+                                )
+                            ),
                             rx.table.cell(rx.text(guide.guide_type.capitalize(), size="2")),
-                            rx.table.cell(rx.text(guide.guide_details.length().to_string(), size="2")),
+                            rx.table.cell(rx.text(guide.detail_count.to_string(), size="2")),
                             rx.table.cell(rx.text(guide.created_at, size="1", color="gray")),
                             rx.table.cell(
                                 rx.hstack(
                                     rx.icon_button(rx.icon("eye", size=16), size="1", variant="ghost", on_click=lambda e: [rx.stop_propagation, state_class.open_guide_detail(guide)]),
                                     rx.icon_button(rx.icon("pencil", size=16), size="1", variant="ghost", color_scheme="violet", on_click=lambda e: [rx.stop_propagation, state_class.open_guide_for_edit(guide)]),
+                                    rx.icon_button(rx.icon("copy", size=16), size="1", variant="ghost", on_click=lambda e: [rx.stop_propagation, state_class.duplicate_guide(guide.id, "")]),
                                     rx.icon_button(rx.icon("trash-2", size=16), size="1", variant="ghost", color_scheme="red", on_click=lambda e: [rx.stop_propagation, state_class.handle_delete_click(guide.id)]),
                                     spacing="2"
                                 )
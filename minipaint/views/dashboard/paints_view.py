@@ -4,10 +4,11 @@ import reflex as rx
 def paints_tab():
     """Paints library, owned, and wishlist views"""
     # Import dependencies locally to avoid circular imports
-    from ...pages.dashboard import DashboardState, render_create_custom_modal, render_owned_view, render_library_view, render_wishlist_view
+    from ...pages.dashboard import DashboardState, render_create_custom_modal, render_import_modal, render_owned_view, render_library_view, render_wishlist_view
     
     return rx.vstack(
         render_create_custom_modal(),
+        render_import_modal(),
         
         # Conditional heading based on active tab
         rx.cond(
@@ -4,7 +4,7 @@ import reflex as rx
 def render_settings_view():
     """User settings and integrations view"""
     # Import dependencies locally to avoid circular imports
-    from ...pages.dashboard import DashboardState
+    from ...pages.dashboard import DashboardState, render_export_card
     
     return rx.vstack(
         rx.heading("User Settings", size="5"),
@@ -28,7 +28,16 @@ def render_settings_view():
                 rx.text("Connect your Google Drive to upload and manage reference images for your painting guides.", color="gray", size="2"),
                 rx.cond(
                     DashboardState.is_drive_connected,
-                    rx.button("Disconnect Drive", on_click=DashboardState.disconnect_drive, color_scheme="red", variant="outline"),
+                    rx.hstack(
+                        rx.button("Disconnect Drive", on_click=DashboardState.disconnect_drive, color_scheme="red", variant="outline"),
+                        rx.button(
+                            "Republish Guide Images",
+                            on_click=DashboardState.republish_guide_images,
+                            loading=DashboardState.is_republishing_images,
+                            variant="soft"
+                        ),
+                        spacing="2"
+                    ),
                     rx.button("Connect Google Drive", on_click=DashboardState.connect_drive, variant="solid")
                 ),
                 spacing="4",
@@ -37,7 +46,9 @@ def render_settings_view():
             width="100%",
             max_width="600px"
         ),
-        
+
+        render_export_card(),
+
         width="100%",
         spacing="4"
     )
@@ -0,0 +1,172 @@
+"""
+Benchmark for building dashboard model trees from database rows.
+
+Generates rows shaped like the PostgREST responses of fetch_batches,
+fetch_painting_guides and _load_guide for a large account and times each
+construction strategy, plus opening a guide in the editor.
+
+model_construct is listed for comparison: it runs in Python and is slower
+than pydantic-core validation for these models, so the app does not use it.
+
+Usage: python scripts/bench_models.py [--batches 200] [--guides 300] [--repeat 5]
+"""
+import argparse
+import copy
+import gc
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from minipaint.models import (  # noqa: E402
+    Batch, PrintJob, PrintJobItem, BatchReprint, PaintingGuide, BATCH_LIST, GUIDE_LIST
+)
+
+
+def _id():
+    return str(uuid.uuid4())
+
+
+def make_batch_rows(count: int, jobs: int = 10, items: int = 5) -> list[dict]:
+    rows = []
+    for b in range(count):
+        batch_id = _id()
+        rows.append({
+            "id": batch_id, "user_id": "u", "name": f"Batch {b}", "tag": "Resin", "due_date": None,
+            "is_archived": False, "created_at": "2026-01-01T00:00:00+00:00",
+            "print_jobs": [{
+                "id": (job_id := _id()), "batch_id": batch_id, "name": f"Plate {j}",
+                "status": "printed" if j % 2 else "queued", "progress_percent": 0, "started_at": None,
+                "print_job_items": [{
+                    "id": _id(), "print_job_id": job_id, "name": f"Mini {i}",
+                    "link_url": None if i % 3 else "https://example.com", "quantity": 1,
+                } for i in range(items)],
+            } for j in range(jobs)],
+            "batch_reprints": [{
+                "id": _id(), "batch_id": batch_id, "name": "Arm", "quantity": 1,
+                "created_at": "2026-01-02T00:00:00+00:00",
+            }],
+        })
+    return rows
+
+
+def make_guide_rows(count: int, details: int = 8, paints: int = 6) -> list[dict]:
+    rows = []
+    for g in range(count):
+        guide_id = _id()
+        rows.append({
+            "id": guide_id, "user_id": "u", "name": f"Guide {g}", "note": "Some notes", "guide_type": "layering",
+            "primer_paint_id": None, "is_airbrush": False, "is_slapchop": False, "slapchop_note": None,
+            "image_drive_id": None, "image_drive_ids": [], "created_at": "2026-01-01T00:00:00+00:00",
+            "guide_details": [{
+                "id": (detail_id := _id()), "guide_id": guide_id, "name": f"Part {d}", "description": None,
+                "category": "Layer", "order_index": d, "layer_count": 3, "created_at": "2026-01-01T00:00:00+00:00",
+                "guide_paints": [{
+                    "id": _id(), "detail_id": detail_id, "paint_name": f"Paint {p}", "paint_color_hex": "#A1B2C3",
+                    "paint_id": None, "role": f"layer_{p % 3}", "ratio": 1, "note": None, "order_index": p,
+                    "created_at": "2026-01-01T00:00:00+00:00",
+                } for p in range(paints)],
+            } for d in range(details)],
+        })
+    return rows
+
+
+def prepare_batches(rows: list[dict]) -> list[dict]:
+    """The dict pre-pass fetch_batches does before either construction path."""
+    for b in rows:
+        jobs = b.get("print_jobs", [])
+        done = sum(1 for j in jobs if j.get("status") == "printed")
+        b["progress"] = int(done * 100 / len(jobs)) if jobs else 0
+        for idx, job in enumerate(jobs):
+            job["display_number"] = idx + 1
+    return rows
+
+
+def _legacy_batches(rows):
+    for b in rows:
+        for job in b["print_jobs"]:
+            for item in job["print_job_items"]:
+                if item.get("link_url") is None:
+                    item["link_url"] = ""
+    return [Batch(**b) for b in rows]
+
+
+def _constructed_batches(rows):
+    return [Batch.model_construct(**{
+        **b,
+        "print_jobs": [PrintJob.model_construct(**{
+            **j, "print_job_items": [PrintJobItem.model_construct(**i) for i in j["print_job_items"]]
+        }) for j in b["print_jobs"]],
+        "batch_reprints": [BatchReprint.model_construct(**r) for r in b["batch_reprints"]],
+    }) for b in rows]
+
+
+def _summary_rows(rows):
+    return [{**{k: v for k, v in g.items() if k != "guide_details"}, "guide_details": [{"count": 8}]} for g in rows]
+
+
+def timed(label: str, fn, make_input, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        data = make_input()
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - start)
+        gc.enable()
+    print(f"  {label:<44} {best * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, default=200)
+    parser.add_argument("--guides", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    batch_rows = prepare_batches(make_batch_rows(args.batches))
+    guide_rows = make_guide_rows(args.guides)
+    summary_rows = _summary_rows(guide_rows)
+
+    print(f"Batches: {args.batches} x 10 jobs x 5 items")
+    timed("Batch(**row) per batch (previous)", _legacy_batches, lambda: copy.deepcopy(batch_rows), args.repeat)
+    timed("BATCH_LIST.validate_python(rows)", BATCH_LIST.validate_python, lambda: copy.deepcopy(batch_rows), args.repeat)
+    timed("model_construct (nested by hand)", _constructed_batches, lambda: copy.deepcopy(batch_rows), args.repeat)
+
+    print(f"Guide list: {args.guides} summaries")
+    timed("PaintingGuide(**row) per guide", lambda rows: [PaintingGuide(**g) for g in rows],
+          lambda: [build_guide_summary_input(g) for g in summary_rows], args.repeat)
+    timed("GUIDE_LIST.validate_python(rows)", GUIDE_LIST.validate_python,
+          lambda: [build_guide_summary_input(g) for g in summary_rows], args.repeat)
+    timed("PaintingGuide.model_construct per guide", lambda rows: [PaintingGuide.model_construct(**g) for g in rows],
+          lambda: [build_guide_summary_input(g) for g in summary_rows], args.repeat)
+
+    print(f"Full guide trees: {args.guides} x 8 details x 6 paints")
+    timed("PaintingGuide(**row) (previous, per guide)", lambda rows: [PaintingGuide(**g) for g in rows],
+          lambda: copy.deepcopy(guide_rows), args.repeat)
+    timed("PaintingGuide.model_validate(row)", lambda rows: [PaintingGuide.model_validate(g) for g in rows],
+          lambda: copy.deepcopy(guide_rows), args.repeat)
+
+    guides = [PaintingGuide.model_validate(g) for g in guide_rows]
+    print(f"Open in editor: {args.guides} guides")
+    timed("[d.copy(deep=True) for d in details] (previous)",
+          lambda gs: [[d.copy(deep=True) for d in g.guide_details] for g in gs], lambda: guides, args.repeat)
+    timed("list(details) (structural sharing)",
+          lambda gs: [list(g.guide_details) for g in gs], lambda: guides, args.repeat)
+
+
+def build_guide_summary_input(row: dict) -> dict:
+    """Summary row after the detail count is pulled out, as the validated paths receive it."""
+    g = dict(row)
+    counts = g.pop("guide_details", None) or [{}]
+    g["detail_count"] = counts[0].get("count", 0)
+    return g
+
+
+if __name__ == "__main__":
+    import warnings
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    main()